@@ -7,6 +7,8 @@ PythonStreams.
 from Stream import Stream, StreamArray, StreamSeries, StreamTimed
 from collections import namedtuple
 import math
+import time
+import Metrics
 
 # EPSILON is a small number used to prevent division by 0
 # and other numerical problems
@@ -43,6 +45,9 @@ class Agent(object):
         list, start, stop
         An InList defines the list slice:
                    list[start:stop]
+        list is the list recent of the input stream. For a
+        StreamArray it is a numpy array (or a RingBuffer over
+        one), and its slices are views rather than copies.
     
     Parameters
     ----------
@@ -128,6 +133,10 @@ class Agent(object):
         self._in_lists_start_values = [0 for s in self.in_streams]
         # Initially each element of _out_lists is the empty list.
         self._out_lists = [[] for s in self.out_streams]
+        # The values of the last state transition that could not
+        # be written to full output streams (see _write_out_lists),
+        # or None.
+        self._pending_out_lists = None
         ###############################
         self.next()
 
@@ -151,6 +160,19 @@ class Agent(object):
             executes a state transition.
 
         """
+        # PART 0
+        # Defer the transition while an output stream that
+        # blocks its writers is full. The stream calls next()
+        # again when its readers have caught up. First write the
+        # values of the last transition that did not fit.
+        if self._pending_out_lists is not None:
+            if not self._write_out_lists(self._pending_out_lists):
+                return
+        for s in self.out_streams:
+            if s.full:
+                s.wait(self)
+                return
+
         # PART 1
         # Set up data structures, _in_lists, _out_lists, for
         # the state transition.
@@ -166,8 +188,14 @@ class Agent(object):
         # (2) the next state which is assigned to self.state,
         # and (3)  new values of stream.start for each stream
         # in input streams assigned to self._in_lists_start_values
-        self._out_lists, self.state, self._in_lists_start_values  = \
-          self.transition(self._in_lists, self.state)
+        if Metrics.enabled:
+            transition_start_time = time.time()
+            self._out_lists, self.state, self._in_lists_start_values  = \
+              self.transition(self._in_lists, self.state)
+            Metrics.record_transition(self, time.time() - transition_start_time)
+        else:
+            self._out_lists, self.state, self._in_lists_start_values  = \
+              self.transition(self._in_lists, self.state)
 
         # PART 3
         # Update data structures after the state transition.
@@ -181,15 +209,49 @@ class Agent(object):
             raise ValueError(
                 'number of output lists, {0}, not equal to number of output streams, {1}'.\
                 format(len(self._out_lists),len(self.out_streams)))
-        for j in range(len(self.out_streams)):
-            self.out_streams[j].extend(self._out_lists[j])
+        self._write_out_lists(self._out_lists)
         # Inform streams that the agent will no longer read some of
         # the earlier elements of the input streams by updating start
         # indexes for the input streams to new values
         # (_in_lists[key].start).
         for j in range(len(self.in_streams)):
             self.in_streams[j].set_start(self, self._in_lists_start_values[j])
+        # Resume agents that were deferred because the
+        # input streams were full.
+        for s in self.in_streams:
+            s.release_writers()
         # Update stream management variables. 
         if self.stream_manager is not None:
             self.stream_manager(self.out_streams,
                                        self._in_lists, self._out_lists, self.state)
+
+    def _write_out_lists(self, out_lists):
+        """
+        Extend the output streams with out_lists. An output
+        stream that blocks its writers gets at most room
+        values (see Stream.room) at a time; its readers may
+        read them and make room for more, before the next
+        values are written. The values that do not fit are
+        kept in _pending_out_lists, and the agent waits for
+        the streams that are full.
+
+        Returns True if all the values were written.
+
+        """
+        pending_out_lists = [[] for s in self.out_streams]
+        is_pending = False
+        for j, s in enumerate(self.out_streams):
+            values = out_lists[j]
+            room = s.room
+            while room is not None and 0 < room < len(values):
+                s.extend(values[:room])
+                values = values[room:]
+                room = s.room
+            if room is None or room >= len(values):
+                s.extend(values)
+            else:
+                pending_out_lists[j] = values
+                is_pending = True
+                s.wait(self)
+        self._pending_out_lists = pending_out_lists if is_pending else None
+        return not is_pending
@@ -21,8 +21,6 @@ from Agent import Agent
 
 from helper import *
 from MakeNetwork import *
-import components
-from components import *
 
 
 def make_graph(agent_descriptor_dict, stream_names_tuple):
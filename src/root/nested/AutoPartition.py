@@ -0,0 +1,238 @@
+""" This module chooses the groups of a network, i.e. which
+agents run in which process, from measurements of the network.
+
+profile_network runs the network in a single process for a
+number of steps with Metrics enabled, and measures the CPU time
+of each agent and the number of values appended to each stream.
+partition_agents then assigns the agents to num_workers groups
+so that the CPU time of the groups is balanced and the number
+of values sent between groups (the weight of the cut edges) is
+small: agents are placed greedily, in topological order, in the
+group to which they have the heaviest edges among the groups
+that have room, and the placement is then refined by moving
+single agents between groups while that reduces the cut weight
+without unbalancing the groups.
+
+The groups are returned in the format of the 'groups' entry of
+the JSON description (key: group name, value: list of agent
+names), which GroupPlanner.plan_from_json consumes.
+
+"""
+
+import Metrics
+from Scheduler import topological_ranks
+from ComponentRegistry import resolve_functions
+from GroupPlanner import normalize_descriptor
+from SystemParameters import DEFAULT_PROFILE_STEPS
+
+# Time, in seconds, given to an agent that was not called
+# while the network was profiled.
+MIN_AGENT_COST = 1E-6
+
+# Maximum number of passes of the refinement.
+MAX_REFINEMENT_PASSES = 10
+
+
+def profile_network(stream_names_tuple, agent_descriptor_dict, num_steps):
+    """
+    Run the network in this process for num_steps steps and
+    return the measured costs.
+
+    Every agent is called by its own timer stream, and the
+    timers are appended to in topological order at each step
+    (as in GraphToProgram.benchmark).
+
+    Returns
+    -------
+    agent_costs: dict
+          key: agent name
+          value: total time, in seconds, of its transitions
+    stream_counts: dict
+          key: stream name
+          value: number of values appended to the stream
+
+    """
+    from MakeNetworkParallel import make_network
+
+    # Descriptors read from JSON have unicode names and f_types.
+    descriptors = dict()
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        descriptors[str(agent_name)] = \
+          list(normalize_descriptor(descriptor)[:6]) + [[str(agent_name) + ':timer']]
+    resolve_functions(descriptors)
+    timer_names = tuple(agent_name + ':timer' for agent_name in descriptors)
+    ranks = topological_ranks(descriptors)
+    order = sorted(descriptors, key=lambda name: ranks[name])
+
+    was_enabled = Metrics.enabled
+    Metrics.enable()
+    try:
+        stream_dict, agent_dict = make_network(
+            tuple(stream_names_tuple) + timer_names, descriptors)
+        timers = [stream_dict[agent_name + ':timer'] for agent_name in order]
+        for step in xrange(num_steps):
+            for timer in timers:
+                timer.append(step)
+    finally:
+        if not was_enabled:
+            Metrics.disable()
+
+    agent_costs = dict()
+    for agent_name, agent in agent_dict.iteritems():
+        metrics = Metrics.agent_metrics(agent)
+        agent_costs[agent_name] = \
+          MIN_AGENT_COST if metrics is None else metrics.total_time
+    stream_counts = dict()
+    for stream_name in stream_names_tuple:
+        metrics = Metrics.stream_metrics(stream_dict[stream_name])
+        stream_counts[stream_name] = 0 if metrics is None else metrics.num_appended
+    return agent_costs, stream_counts
+
+
+def _edge_weights(agent_descriptor_dict, stream_counts):
+    """ Return a dict: key = agent name, value = dict of
+    neighbour agent name -> number of values on the streams
+    between the two agents (in either direction).
+    """
+    producer_of_stream = dict()
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        for stream_name in descriptor[1]:
+            producer_of_stream[stream_name] = agent_name
+    weights = dict((agent_name, dict()) for agent_name in agent_descriptor_dict)
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        for stream_name in descriptor[0]:
+            producer = producer_of_stream.get(stream_name)
+            if producer is None or producer == agent_name:
+                continue
+            w = stream_counts.get(stream_name, 0)
+            weights[agent_name][producer] = weights[agent_name].get(producer, 0) + w
+            weights[producer][agent_name] = weights[producer].get(agent_name, 0) + w
+    return weights
+
+
+def cut_weight(groups, agent_descriptor_dict, stream_counts):
+    """ The number of values sent between different groups. """
+    group_of_agent = dict()
+    for group_name, agent_names in groups.iteritems():
+        for agent_name in agent_names:
+            group_of_agent[agent_name] = group_name
+    weights = _edge_weights(agent_descriptor_dict, stream_counts)
+    total = 0
+    for agent_name, neighbours in weights.iteritems():
+        for neighbour, w in neighbours.iteritems():
+            if group_of_agent[agent_name] != group_of_agent[neighbour]:
+                total += w
+    # Each edge is counted from both of its ends.
+    return total / 2
+
+
+def partition_agents(agent_descriptor_dict, agent_costs, stream_counts,
+                     num_workers, imbalance=0.1):
+    """
+    Assign the agents to at most num_workers groups.
+
+    Parameters
+    ----------
+    agent_descriptor_dict: dict
+          The description of the network (see make_network).
+    agent_costs, stream_counts: dict
+          As returned by profile_network.
+    num_workers: positive integer
+    imbalance: nonnegative float (optional)
+          The cost of a group may exceed the average cost of
+          a group by this fraction (or by the cost of the
+          largest agent, if that is more).
+
+    Returns
+    -------
+    groups: dict
+          key: group name, 'group_0', 'group_1', ..
+          value: list of agent names
+
+    """
+    agent_names = [str(name) for name in agent_descriptor_dict]
+    costs = dict((name, max(agent_costs.get(name, 0.0), MIN_AGENT_COST))
+                 for name in agent_names)
+    weights = _edge_weights(
+        dict((str(name), d) for name, d in agent_descriptor_dict.iteritems()),
+        stream_counts)
+    average = sum(costs.itervalues()) / num_workers
+    capacity = max(average * (1 + imbalance), max(costs.itervalues()))
+
+    loads = [0.0] * num_workers
+    group_of_agent = dict()
+
+    def weight_to_groups(agent_name):
+        """ List: element g is the weight of the edges from
+        agent_name to the agents in group g.
+        """
+        to_groups = [0] * num_workers
+        for neighbour, w in weights[agent_name].iteritems():
+            if neighbour in group_of_agent:
+                to_groups[group_of_agent[neighbour]] += w
+        return to_groups
+
+    # Greedy placement in topological order, so that an agent
+    # is placed after the agents that send it values.
+    ranks = topological_ranks(agent_descriptor_dict)
+    for agent_name in sorted(agent_names, key=lambda name: (ranks[name], name)):
+        to_groups = weight_to_groups(agent_name)
+        cost = costs[agent_name]
+        candidates = [g for g in range(num_workers) if loads[g] + cost <= capacity]
+        if not candidates:
+            candidates = range(num_workers)
+        g = max(candidates, key=lambda g: (to_groups[g], -loads[g]))
+        group_of_agent[agent_name] = g
+        loads[g] += cost
+
+    # Refinement: move an agent to the group to which it has
+    # the heaviest edges if that reduces the cut weight and
+    # the group has room.
+    for _ in range(MAX_REFINEMENT_PASSES):
+        moved = False
+        for agent_name in agent_names:
+            current = group_of_agent[agent_name]
+            to_groups = weight_to_groups(agent_name)
+            cost = costs[agent_name]
+            best, best_gain = current, 0
+            for g in range(num_workers):
+                gain = to_groups[g] - to_groups[current]
+                if g != current and gain > best_gain and \
+                  loads[g] + cost <= capacity:
+                    best, best_gain = g, gain
+            if best != current:
+                group_of_agent[agent_name] = best
+                loads[current] -= cost
+                loads[best] += cost
+                moved = True
+        if not moved:
+            break
+
+    groups = dict()
+    for agent_name, g in group_of_agent.iteritems():
+        groups.setdefault('group_{0}'.format(g), []).append(agent_name)
+    for agent_names in groups.itervalues():
+        agent_names.sort()
+    return groups
+
+
+def auto_groups(json_data, num_workers, num_steps=DEFAULT_PROFILE_STEPS,
+                imbalance=0.1):
+    """
+    Profile the network of json_data (in the format written by
+    MakeNetwork.make_my_JSON) for num_steps steps and return
+    its groups for num_workers processes.
+    """
+    agent_descriptor_dict = dict(
+        (str(name), normalize_descriptor(descriptor))
+        for name, descriptor in json_data['agent_descriptor_dict'].iteritems())
+    stream_names = [str(name) for name in json_data.get('stream_names_tuple', ())]
+    for descriptor in agent_descriptor_dict.itervalues():
+        for name in list(descriptor[0]) + list(descriptor[1]):
+            if str(name) not in stream_names:
+                stream_names.append(str(name))
+    stream_names_tuple = tuple(stream_names)
+    agent_costs, stream_counts = profile_network(
+        stream_names_tuple, agent_descriptor_dict, num_steps)
+    return partition_agents(agent_descriptor_dict, agent_costs,
+                            stream_counts, num_workers, imbalance)
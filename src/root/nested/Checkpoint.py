@@ -0,0 +1,152 @@
+""" This module saves the state of a running network to a
+file and restores a network from the file.
+
+A checkpoint contains, for each stream, the values that
+some reader has not yet read, the offset of those values,
+the start of each reader, the capacity of the stream and
+the files of its history, if any; and, for each agent, its
+state and its start values. Values that every reader has
+passed are not saved, except in streams that keep a
+history: the history holds only the values before offset,
+so the values from offset on are saved. So the size of a checkpoint, and the time to
+restore it, depend on the live state of the network and not
+on the length of its input history.
+
+A network is restored by building it again from the same
+description, e.g. with make_network, and then calling
+restore_network with the streams and agents that were built.
+Readers are matched by agent name; so every agent of the
+network must have a unique name. A reader that is not in
+the checkpoint starts at the first restored value.
+
+"""
+
+import cPickle
+import os
+
+from RingBuffer import RingBuffer
+from StreamHistory import SegmentedHistory
+
+CHECKPOINT_VERSION = 2
+
+
+def save_network(file_name, stream_dict, agent_dict):
+    """
+    Save the state of a network to a file.
+
+    Parameters
+    ----------
+    file_name: str
+          The checkpoint is written to file_name + '.tmp'
+          which then replaces file_name; so an interrupted
+          save does not destroy an earlier checkpoint.
+    stream_dict: dict
+          key: stream name
+          value: Stream
+    agent_dict: dict
+          key: agent name
+          value: Agent
+          Readers of the streams that are not in agent_dict
+          are not saved.
+
+    """
+    agent_names = dict((agent, name) for name, agent in agent_dict.iteritems())
+    streams = dict()
+    for stream_name, stream in stream_dict.iteritems():
+        if stream.history is None:
+            begin = stream._slowest_start()
+            history = None
+        else:
+            # The history holds the values before offset.
+            begin = 0
+            stream.history.flush()
+            history = (stream.history.directory, stream.history.name,
+                       stream.history.segment_size)
+        starts = dict()
+        for reader, start in stream.start.iteritems():
+            if reader in agent_names:
+                starts[agent_names[reader]] = start - begin
+        capacity = (stream.max_elements, stream.max_bytes,
+                    stream.overflow_policy)
+        streams[stream_name] = (stream.recent[begin:stream.stop],
+                                stream.offset + begin, starts,
+                                capacity, history)
+    agents = dict()
+    for agent_name, agent in agent_dict.iteritems():
+        agents[agent_name] = (agent.state, agent._in_lists_start_values)
+
+    checkpoint = {'version': CHECKPOINT_VERSION,
+                  'streams': streams, 'agents': agents}
+    temp_file_name = file_name + '.tmp'
+    with open(temp_file_name, 'wb') as checkpoint_file:
+        cPickle.dump(checkpoint, checkpoint_file, cPickle.HIGHEST_PROTOCOL)
+    os.rename(temp_file_name, file_name)
+
+
+def restore_network(file_name, stream_dict, agent_dict):
+    """
+    Restore the state of a network from a file written
+    by save_network.
+
+    Parameters
+    ----------
+    file_name: str
+    stream_dict: dict
+          key: stream name
+          value: Stream
+    agent_dict: dict
+          key: agent name
+          value: Agent
+          The streams and agents of a network built from the
+          description of the network that was saved. Their
+          state is replaced by the saved state.
+
+    """
+    with open(file_name, 'rb') as checkpoint_file:
+        checkpoint = cPickle.load(checkpoint_file)
+    if checkpoint['version'] != CHECKPOINT_VERSION:
+        raise ValueError('Checkpoint {0} has version {1}, expected {2}'.\
+                         format(file_name, checkpoint['version'],
+                                CHECKPOINT_VERSION))
+
+    for stream_name, (window, offset, starts, capacity, history) in \
+      checkpoint['streams'].iteritems():
+        stream = stream_dict[stream_name]
+        size = len(stream.recent)
+        while size < len(window) + stream._buffer_size:
+            size *= 2
+        stream.recent = stream._create_recent(size)
+        if stream.storage == 'ring':
+            stream.recent = RingBuffer(stream.recent)
+        stream.recent[:len(window)] = window
+        stream.offset = offset
+        stream.stop = len(window)
+        for reader in stream.start.keys():
+            stream.reader(reader, 0)
+        for agent_name, start in starts.iteritems():
+            stream.reader(agent_dict[agent_name], start)
+        stream.set_capacity(*capacity)
+        if history is not None:
+            stream.history = _restore_history(stream, offset, *history)
+
+    for agent_name, (state, start_values) in checkpoint['agents'].iteritems():
+        agent = agent_dict[agent_name]
+        agent.state = state
+        agent._in_lists_start_values = start_values
+
+
+def _restore_history(stream, offset, directory, name, segment_size):
+    """
+    Open the history of a restored stream; the values of the
+    history with indexes offset or more are in recent, so they
+    are discarded.
+    """
+    shape = () if stream.num_columns is None else (stream.num_columns,)
+    history = SegmentedHistory(directory, name, stream.dtype,
+                               segment_size, shape)
+    if history.length < offset:
+        raise ValueError(
+            'The history of stream {0} has {1} values, but the checkpoint starts at {2}'.\
+            format(stream.name, history.length, offset))
+    history.truncate(offset)
+    return history
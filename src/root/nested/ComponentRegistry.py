@@ -0,0 +1,127 @@
+""" This module contains the registry of components: the
+functions that agents in a JSON description of a network
+refer to by name.
+
+A component is registered by name with the name of the
+module that defines it. The module is imported when the
+component is first used, not when the registry is imported;
+so a network that only does arithmetic never imports the
+plotting components and matplotlib.
+
+A name that is not registered is looked up in the module
+DEFAULT_COMPONENT_MODULE (components.py), so that functions
+added to components.py can be used without registering them.
+Only functions defined in that module are components; names
+that it imports, e.g. randint, _no_value and _multivalue, are
+not.
+
+"""
+
+import importlib
+
+DEFAULT_COMPONENT_MODULE = 'components'
+
+# key: component name
+# value: (module name, name of the function in the module)
+_registry = dict()
+# key: component name
+# value: the function, once its module has been imported
+_loaded = dict()
+
+
+def register(name, module_name, function_name=None):
+    """
+    Register the component called name.
+
+    Parameters
+    ----------
+    name: str
+          The name of the component in network descriptions.
+    module_name: str
+          The name of the module that defines the component.
+          It is imported when the component is first used.
+    function_name: str (optional)
+          The name of the function in the module; by
+          default, name.
+
+    """
+    _registry[name] = (module_name, function_name or name)
+    _loaded.pop(name, None)
+
+
+def register_function(name, f):
+    """ Register the function f, which is already loaded, as
+    the component called name.
+    """
+    _registry[name] = (getattr(f, '__module__', None), f.__name__)
+    _loaded[name] = f
+
+
+def _default_component(name):
+    """ Return the function called name that is defined in the
+    default component module, or None if there is none.
+    """
+    f = getattr(importlib.import_module(DEFAULT_COMPONENT_MODULE), name, None)
+    if not callable(f) or \
+      getattr(f, '__module__', None) != DEFAULT_COMPONENT_MODULE:
+        return None
+    return f
+
+
+def is_registered(name):
+    """ True if name is a component: registered, or a function
+    defined in the default component module.
+    """
+    return name in _registry or _default_component(name) is not None
+
+
+def registered_location(name):
+    """ Return (module name, function name) of the registered
+    component called name, or None if name is not registered.
+    """
+    return _registry.get(name)
+
+
+def registered_names():
+    """ The names of the registered components. """
+    return sorted(_registry)
+
+
+def get_component(name):
+    """
+    Return the function of the component called name,
+    importing its module if it has not been imported.
+    Raises KeyError if there is no such component.
+    """
+    f = _loaded.get(name)
+    if f is not None:
+        return f
+    if name in _registry:
+        module_name, function_name = _registry[name]
+        f = getattr(importlib.import_module(module_name), function_name)
+    else:
+        f = _default_component(name)
+        if f is None:
+            raise KeyError('No component called {0}'.format(name))
+    _loaded[name] = f
+    return f
+
+
+def resolve_functions(agent_descriptor_dict):
+    """ Replace, in place, every function name in the
+    descriptors of agent_descriptor_dict (see make_network) by
+    the function of the component with that name.
+    """
+    for descriptor in agent_descriptor_dict.itervalues():
+        if isinstance(descriptor[2], basestring):
+            descriptor[2] = get_component(str(descriptor[2]))
+    return agent_descriptor_dict
+
+
+for _name in ('consecutive_ints', 'generate_of_random_integers',
+              'print_value', 'split_into_even_odd', 'split',
+              'multiply_elements'):
+    register(_name, 'components')
+
+for _name in ('show', 'make_circles', 'make_rectangles', 'make_triangles'):
+    register(_name, 'plot_components')
@@ -0,0 +1,224 @@
+""" This module contains the operator-fusion pass used by
+make_network (MakeNetwork.py and MakeNetworkParallel.py).
+
+In a chain of element agents
+     A -> s1 -> B -> s2 -> C
+every value goes through stream s1 (its list recent, the
+notification of B, B's transition) before it reaches B, and
+again through s2 before it reaches C. If s1 and s2 are read by
+no other agent and are not used outside the network, the chain
+computes the same values as a single agent that applies A's,
+B's and C's functions to each value in turn. fuse_element_chains
+rewrites the description of a network so that each such chain
+is a single agent and the streams inside the chain are not
+created.
+
+"""
+
+from Stream import _no_value, _multivalue
+from Operators import remove_novalue_and_open_multivalue
+
+
+class _FusedState(object):
+    """
+    The state of a fused agent.
+
+    Attributes
+    ----------
+    states: list
+          states[i] is the state of the i-th agent of the
+          chain (None for an agent without state).
+
+    """
+    def __init__(self, states):
+        self.states = states
+
+    def __repr__(self):
+        return '_FusedState({0!r})'.format(self.states)
+
+
+def _call_element_function(f, f_args, value, state):
+    """ Call the function f of an element agent with a single
+    input stream and a single output stream, as op_agent does.
+    Returns (output value, state).
+    """
+    if state is None:
+        return (f(value, f_args) if f_args else f(value)), None
+    return f(value, state, f_args) if f_args else f(value, state)
+
+
+def make_fused_function(descriptors, num_outputs):
+    """
+    Return the function, for f_type 'list', of the agent that
+    replaces a chain of element agents.
+
+    Parameters
+    ----------
+    descriptors: list
+          The descriptors (see make_network) of the agents of
+          the chain, in order.
+    num_outputs: nonnegative integer
+          The number of output streams of the last agent.
+
+    """
+    functions = [(descriptor[2], descriptor[4]) for descriptor in descriptors]
+
+    def fused(values, fused_state):
+        states = fused_state.states
+        # All agents but the last have a single output stream.
+        for i, (f, f_args) in enumerate(functions[:-1]):
+            next_values = []
+            for value in values:
+                output, states[i] = \
+                  _call_element_function(f, f_args, value, states[i])
+                if output is _no_value:
+                    continue
+                elif isinstance(output, _multivalue):
+                    next_values.extend(output.lst)
+                else:
+                    next_values.append(output)
+            values = next_values
+
+        f, f_args = functions[-1]
+        last = len(functions) - 1
+        if num_outputs == 1:
+            output_list = []
+            for value in values:
+                output, states[last] = \
+                  _call_element_function(f, f_args, value, states[last])
+                output_list.append(output)
+            return (remove_novalue_and_open_multivalue(output_list), fused_state)
+
+        # The last agent is a sink or a split. Its function
+        # returns nothing or a list with a value for each output
+        # stream, with the next state if the agent has a state.
+        output_lists = [[] for _ in range(num_outputs)]
+        for value in values:
+            if states[last] is None:
+                v = f(value, f_args) if f_args else f(value)
+            else:
+                v = f(value, states[last], f_args) if f_args else \
+                  f(value, states[last])
+                if isinstance(v, tuple) or isinstance(v, list):
+                    v, states[last] = v
+                else:
+                    states[last], v = v, None
+            if num_outputs and v:
+                for j in range(num_outputs):
+                    output_lists[j].append(v[j])
+        return ([remove_novalue_and_open_multivalue(l) for l in output_lists],
+                fused_state)
+
+    return fused
+
+
+def fuse_element_chains(stream_names_tuple, agent_descriptor_dict,
+                        exposed_stream_names=(), timer_driven=False):
+    """
+    Replace chains of element agents by single agents.
+
+    An agent B is fused into the agent A before it if:
+    A and B are element agents with one input stream each,
+    A has a single output stream s which is B's input stream,
+    no other agent reads s, s is not in exposed_stream_names,
+    and B is called when its input stream is modified. The
+    last agent of a chain may have any number of output streams.
+
+    Parameters
+    ----------
+    stream_names_tuple: tuple of str
+    agent_descriptor_dict: dict
+          The description of the network (see make_network).
+    exposed_stream_names: sequence of str (optional)
+          Names of streams that are read outside the network,
+          e.g. by another process or by the caller. They are
+          not fused away.
+    timer_driven: boolean (optional)
+          True if every agent is called by its own timer stream
+          rather than by the call streams of its descriptor, as
+          in MakeNetwork.make_network. A fused agent is then
+          called by the timer of the first agent of the chain.
+
+    Returns
+    -------
+    stream_names_tuple: tuple of str
+          The names of the streams that are not inside a chain.
+    agent_descriptor_dict: dict
+          The new description. A fused agent is named by the
+          names of the agents of its chain joined by '+'. Its
+          f_type is 'list' and its state is a _FusedState.
+    fused_names: dict
+          key: name of an agent that was fused
+          value: name of the fused agent that replaces it
+
+    """
+    exposed_stream_names = set(exposed_stream_names)
+    stream_to_readers = dict()
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        for stream_name in descriptor[0]:
+            stream_to_readers.setdefault(stream_name, []).append(agent_name)
+
+    def is_element_agent(descriptor):
+        return descriptor[3] == 'element' and len(descriptor[0]) == 1
+
+    def is_called_by_input(descriptor):
+        # An agent without a call list is not called when its
+        # input stream is modified (see make_network).
+        call_list = descriptor[6]
+        return timer_driven or \
+          (call_list is not None and list(call_list) == list(descriptor[0]))
+
+    # next_agent[a] is the agent fused after agent a.
+    next_agent = dict()
+    previous_agent = dict()
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        if not is_element_agent(descriptor) or len(descriptor[1]) != 1:
+            continue
+        stream_name = descriptor[1][0]
+        readers = stream_to_readers.get(stream_name, [])
+        if stream_name in exposed_stream_names or len(readers) != 1:
+            continue
+        reader_name = readers[0]
+        reader = agent_descriptor_dict[reader_name]
+        if reader_name == agent_name or not is_element_agent(reader) or \
+          not is_called_by_input(reader):
+            continue
+        next_agent[agent_name] = reader_name
+        previous_agent[reader_name] = agent_name
+
+    new_agent_descriptor_dict = dict()
+    fused_names = dict()
+    internal_stream_names = set()
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        if agent_name in previous_agent:
+            # Not the first agent of a chain (or on a cycle).
+            continue
+        chain = [agent_name]
+        while chain[-1] in next_agent:
+            chain.append(next_agent[chain[-1]])
+        if len(chain) == 1:
+            new_agent_descriptor_dict[agent_name] = descriptor
+            continue
+        descriptors = [agent_descriptor_dict[name] for name in chain]
+        for d in descriptors[:-1]:
+            internal_stream_names.add(d[1][0])
+        fused_name = '+'.join(chain)
+        out_list = descriptors[-1][1]
+        new_agent_descriptor_dict[fused_name] = [
+            descriptor[0], out_list,
+            make_fused_function(descriptors, len(out_list)),
+            'list', None, _FusedState([d[5] for d in descriptors]),
+            descriptor[6]]
+        for name in chain:
+            fused_names[name] = fused_name
+
+    # Agents on a cycle of fusable agents have a previous agent
+    # but are not in a chain; keep them as they are.
+    for agent_name in previous_agent:
+        if agent_name not in fused_names:
+            new_agent_descriptor_dict[agent_name] = \
+              agent_descriptor_dict[agent_name]
+
+    new_stream_names_tuple = tuple(
+        name for name in stream_names_tuple if name not in internal_stream_names)
+    return new_stream_names_tuple, new_agent_descriptor_dict, fused_names
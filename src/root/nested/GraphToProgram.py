@@ -0,0 +1,322 @@
+""" This module compiles the description of a network of
+element agents into the text of a standalone Python module.
+
+The description is the one used by make_network, e.g. as
+produced by MakeNetwork.JSON_to_descriptor_dict_and_stream_names.
+A network made by make_network is driven in steps: at each
+step every source appends a value to its output streams, and
+the values flow through the streams to the other agents.
+The compiled module does the same computation without streams
+or agents: its function run(num_steps) executes the agents in
+topological order, once per step, and each stream is a local
+list of the values appended to it in the current step. The
+component functions are called directly with the conventions
+of element_agent and the op, split, merge, sink and source
+wrappers in Operators.py, so that the compiled program and the
+network compute the same values. Only the order in which
+different sinks are called within a step may differ, and an
+agent made by make_network takes a step when it is created,
+so a source of the network produces one value more than the
+source of the compiled program.
+
+Only networks without cycles whose agents all have f_type
+'element' can be compiled. Functions are referred to by name:
+a component registered in ComponentRegistry.py is taken from
+the module in which it is registered, e.g. plot_components.py,
+and another name from the module of components (by default,
+components.py), which must also define _no_value and
+_multivalue. The compiled module imports only these modules.
+
+Usage:
+    python GraphToProgram.py network.json program.py
+    python GraphToProgram.py --benchmark network.json [num_steps]
+
+"""
+
+import importlib
+import sys
+import time
+
+from Scheduler import topological_ranks
+from GroupPlanner import normalize_descriptor
+from ComponentRegistry import registered_location
+
+
+def _function_name(f):
+    if isinstance(f, basestring):
+        return str(f)
+    name = getattr(f, '__name__', '<lambda>')
+    if name == '<lambda>':
+        raise ValueError('Cannot compile a call to an anonymous function')
+    return name
+
+
+def _component_location(f, component_module):
+    """ Return (module name, function name) of f, a function
+    or the name of a component.
+    """
+    if isinstance(f, basestring):
+        return registered_location(str(f)) or (component_module, str(f))
+    module_name = getattr(f, '__module__', None)
+    if module_name in (None, '__main__'):
+        module_name = component_module
+    return module_name, _function_name(f)
+
+
+def _append_value(lines, indent, stream_variable, value):
+    """ Emit code that appends value to a stream as element_agent
+    does: _no_value is dropped and _multivalue is opened.
+    """
+    lines.append(indent + 'if {0} is _no_value: pass'.format(value))
+    lines.append(indent + 'elif isinstance({0}, _multivalue): {1}.extend({0}.lst)'.\
+                 format(value, stream_variable))
+    lines.append(indent + 'else: {0}.append({1})'.format(stream_variable, value))
+
+
+def compile_network(stream_names_tuple, agent_descriptor_dict,
+                    component_module='components'):
+    """
+    Return the text of a Python module that runs the network.
+
+    Parameters
+    ----------
+    stream_names_tuple: sequence of str
+    agent_descriptor_dict: dict
+          The description of the network (see make_network).
+          f is a function or the name of a function in
+          component_module.
+    component_module: str (optional)
+          The name of the module with the component functions
+          that are not registered.
+
+    Returns
+    -------
+    program: str
+          The module defines run(num_steps, collect=()) which
+          executes num_steps steps of the network and returns
+          a dict: key = name of a stream in collect, value =
+          list of all the values appended to the stream.
+
+    """
+    stream_variable = dict(
+        (name, 's_{0}'.format(i)) for i, name in enumerate(stream_names_tuple))
+    writers = dict()
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        if descriptor[3] != 'element':
+            raise ValueError(
+                "Agent {0} has f_type '{1}'; only 'element' agents can be compiled".\
+                format(agent_name, descriptor[3]))
+        for stream_name in list(descriptor[0]) + list(descriptor[1]):
+            if stream_name not in stream_variable:
+                raise ValueError('Stream {0} of agent {1} is not in stream_names_tuple'.\
+                                 format(stream_name, agent_name))
+        for stream_name in descriptor[1]:
+            writers[stream_name] = agent_name
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        for stream_name in descriptor[0]:
+            if stream_name not in writers:
+                raise ValueError('Stream {0} read by agent {1} has no writer'.\
+                                 format(stream_name, agent_name))
+
+    ranks = topological_ranks(agent_descriptor_dict)
+    order = sorted(agent_descriptor_dict, key=lambda name: ranks[name])
+    position = dict((name, i) for i, name in enumerate(order))
+    for agent_name in order:
+        for stream_name in agent_descriptor_dict[agent_name][0]:
+            if position[writers[stream_name]] >= position[agent_name]:
+                raise ValueError('Cannot compile a network with a cycle through agent {0}'.\
+                                 format(agent_name))
+
+    header = [
+        '""" Generated by GraphToProgram.compile_network. Do not edit.',
+        '',
+        'Agents, in the order in which they run at each step:',
+    ] + ['    ' + name for name in order] + [
+        '',
+        '"""',
+        '',
+        'import {0} as components'.format(component_module),
+        'from {0} import _no_value, _multivalue'.format(component_module),
+    ]
+    # key: module name, value: the name of the module in the program
+    module_variables = {component_module: 'components'}
+    setup = []
+    body = []
+    indent = ' ' * 8
+    for i, agent_name in enumerate(order):
+        in_list, out_list, f, f_type, f_args, state = \
+          agent_descriptor_dict[agent_name][:6]
+        function = 'f_{0}'.format(i)
+        setup.append('    # {0}'.format(agent_name))
+        module_name, function_name = _component_location(f, component_module)
+        if module_name not in module_variables:
+            module_variables[module_name] = 'module_{0}'.format(len(module_variables))
+            header.append('import {0} as {1}'.format(
+                module_name, module_variables[module_name]))
+        setup.append('    {0} = {1}.{2}'.format(
+            function, module_variables[module_name], function_name))
+        arguments = ''
+        if f_args:
+            setup.append('    args_{0} = {1!r}'.format(i, f_args))
+            arguments = ', args_{0}'.format(i)
+        state_variable = None
+        # element_agent calls a source with its state only if
+        # the state is true, e.g. not 0.
+        if state is not None and (in_list or state):
+            state_variable = 'state_{0}'.format(i)
+            setup.append('    {0} = {1!r}'.format(state_variable, state))
+        outputs = [stream_variable[name] for name in out_list]
+
+        body.append(indent + '# {0}'.format(agent_name))
+        for output in outputs:
+            body.append(indent + '{0} = []'.format(output))
+
+        if not in_list:
+            # A source: element_agent does not change its state
+            # and appends its values as they are.
+            if state_variable is None:
+                body.append(indent + 'r = {0}({1})'.format(function, arguments[2:]))
+            else:
+                body.append(indent + 'r = {0}({1}{2})'.format(
+                    function, state_variable, arguments))
+            if len(outputs) == 1:
+                body.append(indent + '{0}.append(r)'.format(outputs[0]))
+            else:
+                for j, output in enumerate(outputs):
+                    body.append(indent + '{0}.append(r[{1}])'.format(output, j))
+            continue
+
+        if len(in_list) == 1:
+            body.append(indent + 'for x in {0}:'.format(stream_variable[in_list[0]]))
+        else:
+            # Values of the input streams are paired by position;
+            # values without a partner wait for the next step.
+            pending = ['pending_{0}_{1}'.format(i, j) for j in range(len(in_list))]
+            for p in pending:
+                setup.append('    {0} = []'.format(p))
+            for p, name in zip(pending, in_list):
+                body.append(indent + '{0}.extend({1})'.format(p, stream_variable[name]))
+            body.append(indent + 'n = min({0})'.format(
+                ', '.join('len({0})'.format(p) for p in pending)))
+            body.append(indent + 'xs = zip({0})'.format(
+                ', '.join('{0}[:n]'.format(p) for p in pending)))
+            for p in pending:
+                body.append(indent + 'del {0}[:n]'.format(p))
+            body.append(indent + 'for x in xs:')
+        loop_indent = indent + ' ' * 4
+
+        if state_variable is None:
+            body.append(loop_indent + 'r = {0}(x{1})'.format(function, arguments))
+        elif outputs:
+            body.append(loop_indent + 'r, {0} = {1}(x, {0}{2})'.format(
+                state_variable, function, arguments))
+        else:
+            body.append(loop_indent + 'r = {0}(x, {1}{2})'.format(
+                function, state_variable, arguments))
+            body.append(loop_indent + 'if isinstance(r, tuple) or isinstance(r, list): {0} = r[1]'.\
+                        format(state_variable))
+            body.append(loop_indent + 'else: {0} = r'.format(state_variable))
+
+        if len(outputs) == 1:
+            _append_value(body, loop_indent, outputs[0], 'r')
+        elif outputs:
+            body.append(loop_indent + 'if r:')
+            for j, output in enumerate(outputs):
+                body.append(loop_indent + '    v = r[{0}]'.format(j))
+                _append_value(body, loop_indent + '    ', output, 'v')
+
+    collect_lines = ['    collected = dict((name, []) for name in collect)']
+    collect_body = []
+    for name in stream_names_tuple:
+        variable = stream_variable[name]
+        collect_lines.append('    collect_{0} = {1!r} in collected'.format(variable, name))
+        collect_body.append(indent + "if collect_{0}: collected[{1!r}].extend({0})".\
+                            format(variable, name))
+    collect_lines.append('    for step in xrange(num_steps):')
+    header.extend(['', '', 'def run(num_steps, collect=()):'])
+    return '\n'.join(header + setup + collect_lines + body + collect_body +
+                     ['    return collected', '']) + '\n'
+
+
+def write_program(file_name, stream_names_tuple, agent_descriptor_dict,
+                  component_module='components'):
+    """ Compile the network and write the module to file_name. """
+    with open(file_name, 'w') as program_file:
+        program_file.write(compile_network(
+            stream_names_tuple, agent_descriptor_dict, component_module))
+
+
+def load_program(program, module_name='compiled_network'):
+    """ Return a module made from the text of a compiled network. """
+    import imp
+    module = imp.new_module(module_name)
+    exec compile(program, module_name, 'exec') in module.__dict__
+    return module
+
+
+def benchmark(stream_names_tuple, agent_descriptor_dict, num_steps,
+              component_module='components'):
+    """
+    Run num_steps steps of the network made by make_network
+    and of the compiled program, and return the times in
+    seconds, (network_time, program_time).
+    """
+    from MakeNetworkParallel import make_network
+    from Stream import Stream
+
+    # Every agent is called by its own timer stream, as in
+    # MakeNetwork.make_network; the timers are appended to in
+    # topological order so that values reach the sinks in the
+    # step in which they are produced.
+    # Descriptors read from JSON have unicode names and f_types.
+    descriptors = dict()
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        agent_name = str(agent_name)
+        descriptor = list(normalize_descriptor(descriptor)[:6]) + \
+          [[agent_name + ':timer']]
+        if isinstance(descriptor[2], basestring):
+            module_name, function_name = \
+              _component_location(descriptor[2], component_module)
+            descriptor[2] = getattr(importlib.import_module(module_name),
+                                    function_name)
+        descriptors[agent_name] = descriptor
+    timer_names = tuple(agent_name + ':timer' for agent_name in descriptors)
+    ranks = topological_ranks(descriptors)
+    order = sorted(descriptors, key=lambda name: ranks[name])
+
+    start_time = time.time()
+    stream_dict, agent_dict = make_network(
+        tuple(stream_names_tuple) + timer_names, descriptors)
+    timers = [stream_dict[agent_name + ':timer'] for agent_name in order]
+    for step in xrange(num_steps):
+        for timer in timers:
+            timer.append(step)
+    network_time = time.time() - start_time
+
+    module = load_program(compile_network(
+        stream_names_tuple, agent_descriptor_dict, component_module))
+    start_time = time.time()
+    module.run(num_steps)
+    program_time = time.time() - start_time
+    return network_time, program_time
+
+
+def main():
+    from MakeNetwork import JSON_to_descriptor_dict_and_stream_names
+    if len(sys.argv) >= 3 and sys.argv[1] == '--benchmark':
+        agent_descriptor_dict, stream_names_tuple = \
+          JSON_to_descriptor_dict_and_stream_names(sys.argv[2])
+        num_steps = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+        network_time, program_time = benchmark(
+            stream_names_tuple, agent_descriptor_dict, num_steps)
+        print 'network: {0:.3f} s, compiled program: {1:.3f} s, speedup: {2:.1f}'.\
+          format(network_time, program_time, network_time / program_time)
+    elif len(sys.argv) == 3:
+        agent_descriptor_dict, stream_names_tuple = \
+          JSON_to_descriptor_dict_and_stream_names(sys.argv[1])
+        write_program(sys.argv[2], stream_names_tuple, agent_descriptor_dict)
+    else:
+        print __doc__
+
+if __name__ == '__main__':
+    main()
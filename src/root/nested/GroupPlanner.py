@@ -0,0 +1,430 @@
+""" This module plans the processes of a network whose
+agents are partitioned into groups, one process per group.
+
+make_plan builds, in a single pass over the agents and their
+streams, the index stream -> producing agent and the index
+stream -> consuming agents (as network_data_structures does in
+MakeNetworkParallel.py). From these indexes it computes, for
+each group, the streams that it receives from other groups,
+the streams that it sends to other groups and the groups that
+receive them. The time and space are proportional to the
+number of agents plus the number of (agent, stream) edges.
+
+The plan is immutable: it is made of namedtuples, tuples and
+FrozenDicts, so that the processes that are started from it
+cannot change it, and it can be used again, e.g. to start the
+processes again or to animate the network.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from Serializers import is_codec
+
+LEFTOVER_GROUP_NAME = 'leftover'
+
+# The external input stream that calls the sources of a planned
+# network: a source without call streams is called when values
+# are put on it (see make_plan and Multiprocessing.run_parallel).
+SOURCE_TRIGGER_STREAM_NAME = 'trigger'
+
+
+class FrozenDict(dict):
+    """ A dict that cannot be modified after it is made. """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('A FrozenDict cannot be modified')
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __repr__(self):
+        return 'FrozenDict({0})'.format(dict.__repr__(self))
+
+
+# The plan of the process of one group.
+# name: str
+# agent_descriptor_dict: FrozenDict
+#       The descriptors (see make_network) of the agents of the
+#       group; each descriptor is a tuple of 7 elements.
+# all_stream_names_tuple: tuple of str
+#       The streams read or written by agents of the group.
+# input_stream_names_tuple: tuple of str
+#       The streams read by agents of the group that are written
+#       by agents of other groups, or by no agent.
+# output_stream_names_dict: FrozenDict
+#       key: name of a stream written by an agent of the group
+#            and read by agents of other groups
+#       value: tuple of the names of those groups
+GroupPlan = namedtuple(
+    'GroupPlan',
+    ['name', 'agent_descriptor_dict', 'all_stream_names_tuple',
+     'input_stream_names_tuple', 'output_stream_names_dict'])
+
+# The plan of the network.
+# groups: FrozenDict
+#       key: group name
+#       value: GroupPlan
+# group_of_agent: FrozenDict
+#       key: agent name
+#       value: group name
+# producer_of_stream: FrozenDict
+#       key: stream name
+#       value: name of the agent that writes the stream
+# consumers_of_stream: FrozenDict
+#       key: stream name
+#       value: tuple of the names of the agents that read it,
+#       as an input stream or as a call stream
+# external_input_stream_names: tuple of str
+#       Streams that are read and are written by no agent;
+#       values are put on them from outside the network.
+# stream_dtypes: FrozenDict
+#       key: name of a stream of numbers
+#       value: numpy dtype of the numbers
+# replicas: FrozenDict
+#       key: name of a group that runs in several processes
+#       value: ReplicaSpec
+# stream_ids: FrozenDict
+#       key: name of a stream that is sent from one process to
+#            another, or from outside the network
+#       value: integer id of the stream in messages
+# codecs: FrozenDict
+#       key: name of a stream in stream_ids
+#       value: name of the codec of its messages (see Serializers.py)
+GroupNetworkPlan = namedtuple(
+    'GroupNetworkPlan',
+    ['groups', 'group_of_agent', 'producer_of_stream',
+     'consumers_of_stream', 'external_input_stream_names',
+     'stream_dtypes', 'replicas', 'stream_ids', 'codecs'])
+
+# How a group is replicated (see MakeParallelNetworkParallel.ReplicaRouter).
+# num_replicas: integer > 1
+# partition: 'round_robin' or 'hash'
+# key: None, or the name of the key function for 'hash'
+# ordered: True if the outputs of the replicas are put back
+#       in the order of their inputs
+ReplicaSpec = namedtuple(
+    'ReplicaSpec', ['num_replicas', 'partition', 'key', 'ordered'])
+
+
+def _null_to_none(value):
+    if value == 'null' or value == 'None':
+        return None
+    return value
+
+
+def normalize_descriptor(descriptor):
+    """
+    Return a descriptor (see make_network) as a tuple of 7
+    elements, converting the values read from JSON: names of
+    streams and functions to str, f_args from a list to a tuple,
+    'null' and 'None' to None, and a missing list of call
+    streams to None.
+    """
+    in_list, out_list, f, f_type, f_args, state = descriptor[:6]
+    call_list = descriptor[6] if len(descriptor) > 6 else None
+    f_args = _null_to_none(f_args)
+    if isinstance(f_args, list):
+        f_args = tuple(f_args)
+    if call_list is not None:
+        call_list = tuple(str(name) for name in call_list)
+    return (
+        tuple(str(name) for name in in_list),
+        tuple(str(name) for name in out_list),
+        str(f) if isinstance(f, basestring) else f,
+        # Some operators compare f_type with 'is'.
+        intern(str(f_type)),
+        f_args,
+        _null_to_none(state),
+        call_list)
+
+
+def _read_stream_names(descriptor):
+    """ The input streams and the call streams of an agent. """
+    in_list, call_list = descriptor[0], descriptor[6]
+    if not call_list:
+        return in_list
+    return in_list + tuple(name for name in call_list if name not in in_list)
+
+
+def reachable_groups(groups):
+    """
+    Return a dict; key: group name, value: the set of names
+    of the groups to which the group sends values, directly or
+    through other groups. A group that sends values to a group
+    that reaches it is in a cycle.
+
+    Parameters
+    ----------
+    groups: dict
+          key: group name
+          value: GroupPlan
+    """
+    reachable = dict()
+    for group_name in groups:
+        reached = set()
+        pending = [group_name]
+        while pending:
+            for receiver_names in \
+              groups[pending.pop()].output_stream_names_dict.itervalues():
+                for receiver_name in receiver_names:
+                    if receiver_name not in reached:
+                        reached.add(receiver_name)
+                        pending.append(receiver_name)
+        reachable[group_name] = reached
+    return reachable
+
+
+def make_replica_spec(spec):
+    """ Return a ReplicaSpec given a number of replicas
+    (round robin, not ordered) or a dict with the keys
+    'replicas' and optionally 'partition', 'key' and 'ordered'.
+    """
+    if isinstance(spec, ReplicaSpec):
+        return spec
+    if not isinstance(spec, dict):
+        return ReplicaSpec(int(spec), 'round_robin', None, False)
+    key = spec.get('key')
+    return ReplicaSpec(
+        int(spec['replicas']), str(spec.get('partition', 'round_robin')),
+        None if key is None else str(key), bool(spec.get('ordered', False)))
+
+
+def _check_replicas(group_name, spec, group_plan, producer_of_stream,
+                    group_of_agent, replicas):
+    """ Raise ValueError if the group cannot be replicated as
+    specified.
+    """
+    if spec.partition not in ('round_robin', 'hash'):
+        raise ValueError('Group {0} has unknown partition {1}'.\
+                         format(group_name, spec.partition))
+    if len(group_plan.input_stream_names_tuple) != 1:
+        raise ValueError(
+            'Group {0} is replicated and must have exactly one input stream'.\
+            format(group_name))
+    stream_name = group_plan.input_stream_names_tuple[0]
+    if stream_name not in producer_of_stream:
+        raise ValueError('The input stream {0} of replicated group {1} has no writer'.\
+                         format(stream_name, group_name))
+    for agent_name, descriptor in group_plan.agent_descriptor_dict.iteritems():
+        if not descriptor[0]:
+            # Every replica would produce the values of a source.
+            raise ValueError('Replicated group {0} has source agent {1}'.\
+                             format(group_name, agent_name))
+        if spec.partition == 'round_robin' and descriptor[5] is not None:
+            raise ValueError(
+                'Group {0} is replicated round robin and must be stateless, '
+                'but agent {1} has a state'.format(group_name, agent_name))
+    if spec.ordered:
+        if spec.partition != 'round_robin':
+            raise ValueError('Only round_robin replicas of {0} can be ordered'.\
+                             format(group_name))
+        if group_of_agent[producer_of_stream[stream_name]] in replicas:
+            raise ValueError(
+                'Ordered group {0} cannot receive its input from a replicated group'.\
+                format(group_name))
+        for receiver_names in group_plan.output_stream_names_dict.itervalues():
+            for receiver_name in receiver_names:
+                if receiver_name in replicas:
+                    raise ValueError(
+                        'Ordered group {0} cannot send its outputs to replicated group {1}'.\
+                        format(group_name, receiver_name))
+
+
+def make_plan(stream_names_tuple, agent_descriptor_dict, groups,
+              stream_dtypes=None, replicas=None, codecs=None):
+    """
+    Plan the processes of a network.
+
+    Parameters
+    ----------
+    stream_names_tuple: sequence of str
+    agent_descriptor_dict: dict
+          The description of the network (see make_network).
+    groups: dict
+          key: group name
+          value: list of the names of the agents of the group.
+          Agents that are in no group are put in a group called
+          LEFTOVER_GROUP_NAME.
+    stream_dtypes: dict (optional)
+          key: name of a stream of numbers
+          value: numpy dtype. These streams can be sent from
+          one group to another through shared memory.
+    replicas: dict (optional)
+          key: group name
+          value: number of replicas, or dict (see
+          make_replica_spec). A replicated group runs in several
+          processes, which share its input stream; it must have
+          exactly one input stream and no source agents, and it
+          must be stateless unless it is partitioned by 'hash'.
+    codecs: dict (optional)
+          key: name of a stream that is sent between processes
+          value: name of the codec of its messages (see
+          Serializers.py). By default, streams in stream_dtypes
+          use 'numeric' and other streams use 'pickle'.
+
+    In the processes of the plan, an agent without call streams
+    is called when its input streams are modified, and a source
+    without call streams is called when values are put on the
+    external input stream SOURCE_TRIGGER_STREAM_NAME.
+
+    Returns
+    -------
+    plan: GroupNetworkPlan
+
+    """
+    group_of_agent = dict()
+    for group_name, agent_names in groups.iteritems():
+        for agent_name in agent_names:
+            agent_name = str(agent_name)
+            if agent_name not in agent_descriptor_dict:
+                raise ValueError('Group {0} has agent {1} which is not in the network'.\
+                                 format(group_name, agent_name))
+            if agent_name in group_of_agent:
+                raise ValueError('Agent {0} is in groups {1} and {2}'.\
+                                 format(agent_name, group_of_agent[agent_name],
+                                        group_name))
+            group_of_agent[agent_name] = str(group_name)
+    for agent_name in agent_descriptor_dict:
+        if str(agent_name) not in group_of_agent:
+            group_of_agent[str(agent_name)] = LEFTOVER_GROUP_NAME
+
+    # Build the indexes of the edges.
+    descriptors = dict()
+    producer_of_stream = dict()
+    consumers_of_stream = dict()
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        agent_name = str(agent_name)
+        descriptor = normalize_descriptor(descriptor)
+        if descriptor[6] is None:
+            call_list = descriptor[0] or (SOURCE_TRIGGER_STREAM_NAME,)
+            descriptor = descriptor[:6] + (call_list,)
+        descriptors[agent_name] = descriptor
+        for stream_name in _read_stream_names(descriptor):
+            consumers_of_stream.setdefault(stream_name, []).append(agent_name)
+        for stream_name in descriptor[1]:
+            if stream_name in producer_of_stream:
+                raise ValueError('Stream {0} is output by {1} and {2}'.\
+                                 format(stream_name, producer_of_stream[stream_name],
+                                        agent_name))
+            producer_of_stream[stream_name] = agent_name
+
+    # Make the group plans.
+    group_agents = dict()
+    group_streams = dict()
+    group_inputs = dict()
+    group_outputs = dict()
+    for agent_name, group_name in group_of_agent.iteritems():
+        group_agents.setdefault(group_name, dict())[agent_name] = \
+          descriptors[agent_name]
+        group_streams.setdefault(group_name, set())
+        group_inputs.setdefault(group_name, set())
+        group_outputs.setdefault(group_name, dict())
+    for agent_name, descriptor in descriptors.iteritems():
+        group_name = group_of_agent[agent_name]
+        for stream_name in _read_stream_names(descriptor):
+            group_streams[group_name].add(stream_name)
+            producer = producer_of_stream.get(stream_name)
+            if producer is None or group_of_agent[producer] != group_name:
+                group_inputs[group_name].add(stream_name)
+        for stream_name in descriptor[1]:
+            group_streams[group_name].add(stream_name)
+            receivers = set(
+                group_of_agent[consumer]
+                for consumer in consumers_of_stream.get(stream_name, ()))
+            receivers.discard(group_name)
+            if receivers:
+                group_outputs[group_name][stream_name] = tuple(sorted(receivers))
+
+    # Streams are listed in the order of stream_names_tuple,
+    # followed by streams that are not in it.
+    order = dict((name, i) for i, name in enumerate(stream_names_tuple))
+
+    def ordered(names):
+        return tuple(sorted(names, key=lambda name: (order.get(name, len(order)), name)))
+
+    plans = dict()
+    for group_name in group_agents:
+        plans[group_name] = GroupPlan(
+            name=group_name,
+            agent_descriptor_dict=FrozenDict(group_agents[group_name]),
+            all_stream_names_tuple=ordered(group_streams[group_name]),
+            input_stream_names_tuple=ordered(group_inputs[group_name]),
+            output_stream_names_dict=FrozenDict(group_outputs[group_name]))
+
+    replica_specs = dict()
+    for group_name, spec in (replicas or dict()).iteritems():
+        group_name = str(group_name)
+        if group_name not in plans:
+            raise ValueError('Replicated group {0} is not in the network'.\
+                             format(group_name))
+        spec = make_replica_spec(spec)
+        if spec.num_replicas > 1:
+            replica_specs[group_name] = spec
+    for group_name, spec in replica_specs.iteritems():
+        _check_replicas(group_name, spec, plans[group_name],
+                        producer_of_stream, group_of_agent, replica_specs)
+
+    # Streams that are sent in messages get ids, and codecs.
+    external_input_stream_names = ordered(
+        name for name in consumers_of_stream if name not in producer_of_stream)
+    sent_stream_names = set(external_input_stream_names)
+    for outputs in group_outputs.itervalues():
+        sent_stream_names.update(outputs)
+    stream_ids = dict(
+        (name, i) for i, name in enumerate(ordered(sent_stream_names)))
+    stream_codecs = dict(
+        (name, 'numeric' if name in (stream_dtypes or ()) else 'pickle')
+        for name in stream_ids)
+    for stream_name, codec_name in (codecs or dict()).iteritems():
+        stream_name, codec_name = str(stream_name), str(codec_name)
+        if stream_name not in stream_ids:
+            raise ValueError('Stream {0} has a codec but is not sent between processes'.\
+                             format(stream_name))
+        if not is_codec(codec_name):
+            raise ValueError('Stream {0} has unknown codec {1}'.\
+                             format(stream_name, codec_name))
+        stream_codecs[stream_name] = codec_name
+
+    return GroupNetworkPlan(
+        groups=FrozenDict(plans),
+        group_of_agent=FrozenDict(group_of_agent),
+        producer_of_stream=FrozenDict(producer_of_stream),
+        consumers_of_stream=FrozenDict(
+            (name, tuple(agents)) for name, agents in consumers_of_stream.iteritems()),
+        external_input_stream_names=external_input_stream_names,
+        stream_dtypes=FrozenDict(stream_dtypes or ()),
+        replicas=FrozenDict(replica_specs),
+        stream_ids=FrozenDict(stream_ids),
+        codecs=FrozenDict(stream_codecs))
+
+
+def plan_from_json(json_data, stream_dtypes=None):
+    """
+    Plan the processes of a network given as JSON data in
+    the format written by MakeNetwork.make_my_JSON, with a
+    'groups' entry: key = group name, value = list of agent names,
+    and optionally a 'replicas' entry: key = group name, value =
+    number of replicas or dict (see make_replica_spec), a
+    'codecs' entry: key = stream name, value = codec name, and a
+    'stream_dtypes' entry: key = stream name, value = name of a
+    numpy dtype, e.g. "float64" (see make_plan). The dtypes in
+    stream_dtypes are added to those of the JSON data.
+    """
+    agent_descriptor_dict = json_data['agent_descriptor_dict']
+    stream_names_tuple = json_data.get('stream_names_tuple', ())
+    dtypes = dict()
+    for stream_name, dtype in json_data.get('stream_dtypes', dict()).iteritems():
+        try:
+            dtypes[str(stream_name)] = np.dtype(str(dtype))
+        except TypeError:
+            raise ValueError('Stream {0} has unknown dtype {1}'.\
+                             format(stream_name, dtype))
+    dtypes.update(stream_dtypes or dict())
+    return make_plan([str(name) for name in stream_names_tuple],
+                     agent_descriptor_dict, json_data['groups'], dtypes,
+                     json_data.get('replicas'), json_data.get('codecs'))
@@ -6,16 +6,19 @@ import re
 import json
 from pprint import pprint
 
-from Stream import Stream
+from Stream import Stream, StreamArray
 from Stream import _no_value, _multivalue
 from Agent import Agent
 from Operators import stream_agent
+from Scheduler import topological_ranks
+from Fusion import fuse_element_chains
 
 from helper import *
-from components import *
+from ComponentRegistry import get_component
 
 
-def make_network(stream_names_tuple, agent_descriptor_dict):
+def make_network(stream_names_tuple, agent_descriptor_dict, scheduler=None,
+                 fuse=False, exposed_stream_names=(), stream_dtypes=None):
     """ This function makes a network of agents given the names
     of the streams in the network and a description of the
     agents in the network.
@@ -36,6 +39,24 @@ def make_network(stream_names_tuple, agent_descriptor_dict):
              f_type: 'element', 'list', 'window', etc
              f_args: tuple of arguments for functions f
              state: the state associated with this agent.
+    scheduler: Scheduler or None (optional)
+        If not None, the scheduler is installed in every stream
+        of the network (see Scheduler.py). For the 'topological'
+        policy, agents are ranked in topological order.
+    fuse: boolean (optional)
+        If True, chains of element agents are replaced by single
+        agents (see Fusion.py). The streams inside a chain are not
+        created, and the names of the fused agents are mapped to
+        the agent that replaces them.
+    exposed_stream_names: sequence of str (optional)
+        Names of streams that are read outside the network;
+        used only if fuse is True. These streams are kept.
+    stream_dtypes: dict (optional)
+        key: stream name
+        value: numpy dtype
+        The streams with these names are StreamArrays of these
+        dtypes; so list agents that write them append arrays
+        without converting them to lists.
 
     Local Variables
     ---------------
@@ -57,10 +78,26 @@ def make_network(stream_names_tuple, agent_descriptor_dict):
           agent is made to execute a step.
 
     """
+    if fuse:
+        stream_names_tuple, agent_descriptor_dict, fused_names = \
+          fuse_element_chains(stream_names_tuple, agent_descriptor_dict,
+                              exposed_stream_names, timer_driven=True)
+    else:
+        fused_names = dict()
+
     # Create streams and insert streams into stream_dict.
     stream_dict = dict()
+    if stream_dtypes is None:
+        stream_dtypes = dict()
     for stream_name in stream_names_tuple:
-        stream_dict[stream_name] = Stream(stream_name)
+        if stream_name in stream_dtypes:
+            stream_dict[stream_name] = StreamArray(
+                stream_name, dtype=stream_dtypes[stream_name])
+        else:
+            stream_dict[stream_name] = Stream(stream_name)
+        stream_dict[stream_name].scheduler = scheduler
+    if scheduler is not None:
+        ranks = topological_ranks(agent_descriptor_dict)
 
     agent_dict = dict()
     agent_timer_dict = dict()
@@ -94,6 +131,7 @@ def make_network(stream_names_tuple, agent_descriptor_dict):
         # Create timer streams and insert them into agent_timer_dict 
         agent_timer_dict[agent_name] = Stream(
             agent_name + ':timer')
+        agent_timer_dict[agent_name].scheduler = scheduler
 
         # Create agents and insert them into agent_dict
         agent_dict[agent_name] = stream_agent(
@@ -102,6 +140,12 @@ def make_network(stream_names_tuple, agent_descriptor_dict):
 
         # Set the name for this agent.
         agent_dict[agent_name].name = agent_name
+        if scheduler is not None:
+            scheduler.set_rank(agent_dict[agent_name], ranks[agent_name])
+
+    for agent_name, fused_name in fused_names.iteritems():
+        agent_dict[agent_name] = agent_dict[fused_name]
+        agent_timer_dict[agent_name] = agent_timer_dict[fused_name]
 
     return (stream_dict, agent_dict, agent_timer_dict)
 
@@ -115,19 +159,6 @@ def make_network(stream_names_tuple, agent_descriptor_dict):
 def make_agent_descriptor_dict(instance_dict, comp_list):
     dic = {}
     json_dic = {}
-    # TODO: find a better way to do this
-    # Currently a hard-coded string-to-function_object dict 
-    f_dict = {'generate_of_random_integers': generate_of_random_integers, 
-              'split_into_even_odd': split_into_even_odd, 
-              'print_value': print_value, 
-              'multiply_elements': multiply_elements,
-              'split': split,
-              'make_rectangles': make_rectangles,
-              'make_circles': make_circles,
-              'make_triangles': make_triangles,
-              'consecutive_ints': consecutive_ints,
-              'show': show
-              }
 
     for stream in instance_dict:
         s_name, s_id = clean_id(stream.split('/')[1])
@@ -243,25 +274,11 @@ def JSON_to_descriptor_dict_and_stream_names(my_json_file_name):
     agent_descriptor_dict = json_data['agent_descriptor_dict']
     copy = json_data['agent_descriptor_dict']
     
-    # TODO: find a better way to do this
-    # Currently a hard-coded string-to-function_object dict 
-    f_dict = f_dict = {'generate_of_random_integers': generate_of_random_integers, 
-              'split_into_even_odd': split_into_even_odd, 
-              'print_value': print_value, 
-              'multiply_elements': multiply_elements,
-              'split': split,
-              'make_rectangles': make_rectangles,
-              'make_circles': make_circles,
-              'make_triangles': make_triangles,
-              'consecutive_ints': consecutive_ints,
-              'show': show
-              }
-    
     for agent in agent_descriptor_dict:
         
-        ## func: str to function object
-        func_str = agent_descriptor_dict[agent][2] 
-        agent_descriptor_dict[agent][2] = f_dict[func_str]
+        ## func: str to function object, imported on first use
+        func_str = str(agent_descriptor_dict[agent][2])
+        agent_descriptor_dict[agent][2] = get_component(func_str)
         
         ## type: from unicode to str
         agent_descriptor_dict[agent][3] = str(agent_descriptor_dict[agent][3])
@@ -1,12 +1,16 @@
-from Stream import Stream
+from Stream import Stream, StreamArray
 from Stream import _no_value, _multivalue
 from Agent import Agent
 #from OperatorsTestParallel import stream_agent
 import OperatorsTestParallel
 from Operators import stream_agent
 import OperatorsTestParallel
+from Scheduler import topological_ranks
+from Fusion import fuse_element_chains
 
-def make_network(stream_names_tuple, agent_descriptor_dict):
+def make_network(stream_names_tuple, agent_descriptor_dict, scheduler=None,
+                 fuse=False, exposed_stream_names=(), streams=None,
+                 stream_dtypes=None):
     """ This function makes a network of agents given the names
     of the streams in the network and a description of the
     agents in the network.
@@ -29,6 +33,30 @@ def make_network(stream_names_tuple, agent_descriptor_dict):
              f_args: tuple of arguments for functions f
              state: the state associated with this agent
              call_streams: list of names of call streams.
+    scheduler: Scheduler or None (optional)
+        If not None, the scheduler is installed in every stream
+        of the network (see Scheduler.py). For the 'topological'
+        policy, agents are ranked in topological order.
+    fuse: boolean (optional)
+        If True, chains of element agents are replaced by single
+        agents (see Fusion.py). The streams inside a chain are not
+        created, and the names of the fused agents are mapped to
+        the agent that replaces them.
+    exposed_stream_names: sequence of str (optional)
+        Names of streams that are read outside the network;
+        used only if fuse is True. These streams are kept.
+    streams: dict (optional)
+        key: stream name
+        value: Stream
+        Streams made by the caller, e.g. StreamArrays, that are
+        used instead of new Streams with these names.
+    stream_dtypes: dict (optional)
+        key: stream name
+        value: numpy dtype
+        The streams with these names, other than those in
+        streams, are StreamArrays of these dtypes; so list
+        agents that write them append arrays without converting
+        them to lists.
 
     Returns
     ---------------
@@ -44,10 +72,30 @@ def make_network(stream_names_tuple, agent_descriptor_dict):
                  each agent.
 
     """
+    if fuse:
+        stream_names_tuple, agent_descriptor_dict, fused_names = \
+          fuse_element_chains(stream_names_tuple, agent_descriptor_dict,
+                              exposed_stream_names)
+    else:
+        fused_names = dict()
+
     # Create streams and insert streams into stream_dict.
     stream_dict = dict()
+    if streams is None:
+        streams = dict()
+    if stream_dtypes is None:
+        stream_dtypes = dict()
     for stream_name in stream_names_tuple:
-        stream_dict[stream_name] = Stream(stream_name)
+        if stream_name in streams:
+            stream_dict[stream_name] = streams[stream_name]
+        elif stream_name in stream_dtypes:
+            stream_dict[stream_name] = StreamArray(
+                stream_name, dtype=stream_dtypes[stream_name])
+        else:
+            stream_dict[stream_name] = Stream(stream_name)
+        stream_dict[stream_name].scheduler = scheduler
+    if scheduler is not None:
+        ranks = topological_ranks(agent_descriptor_dict)
 
     ## # Only for debugging
     ## for key, value in stream_dict.items():
@@ -113,6 +161,11 @@ def make_network(stream_names_tuple, agent_descriptor_dict):
         
         # Set the name for this agent.
         agent_dict[agent_name].name = agent_name
+        if scheduler is not None:
+            scheduler.set_rank(agent_dict[agent_name], ranks[agent_name])
+
+    for agent_name, fused_name in fused_names.iteritems():
+        agent_dict[agent_name] = agent_dict[fused_name]
 
     return (stream_dict, agent_dict)
 
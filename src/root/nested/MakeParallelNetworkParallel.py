@@ -1,60 +1,717 @@
-from Stream import Stream
+from Stream import Stream, StreamArray
 from Stream import _no_value, _multivalue
 from Agent import Agent
 from OperatorsTestParallel import stream_agent
 from MakeNetworkParallel import make_network, network_data_structures
-from multiprocessing import Process, Queue
+from ComponentRegistry import resolve_functions, get_component
+from SystemParameters import DEFAULT_MESSAGE_BATCH_SIZE, DEFAULT_MESSAGE_BATCH_DELAY
+from SystemParameters import DEFAULT_INPUT_DRAIN_SIZE
+from SharedRing import SharedRing
+import Metrics
+from multiprocessing import Process, Queue, Semaphore
+from Queue import Empty
+from collections import deque, namedtuple
+import time
+import numpy as np
 
 
-def make_input_manager(input_queue, input_stream_dict):
-    """ Make an object that waits continuously for a
-    message on input_queue and then sends the message
-    on the stream with the specified name.
+# The message by which the process receiving stream_name (the
+# group receiver_name) gives its sender num_values more credits.
+CreditGrant = namedtuple(
+    'CreditGrant', ['stream_name', 'receiver_name', 'num_values'])
 
+# The optional third element of a message (stream name, values).
+# sequence: the number of the batch in a stream that is split
+#       among the replicas of a group in order (see ReplicaRouter),
+#       or None.
+# sender: the index of the replica that sent the message, or
+#       None; credits for the message are granted to that replica.
+MessageTag = namedtuple('MessageTag', ['sequence', 'sender'])
+
+# The name of the channel of an Inbox on which the main process
+# puts the values of external input streams.
+MAIN_CHANNEL_NAME = '__main__'
+
+# Seconds that Inbox.get_many waits for a message that has been
+# announced by the doorbell but is still being written to its queue.
+_IN_FLIGHT_SLEEP = 1E-5
+
+
+def _concatenate(chunks):
+    """ Return the values of a list of chunks (lists or
+    arrays of values) as one list or array.
+    """
+    if not chunks:
+        return []
+    if len(chunks) == 1:
+        return chunks[0]
+    if all(isinstance(chunk, np.ndarray) for chunk in chunks):
+        return np.concatenate(chunks)
+    return [v for chunk in chunks for v in chunk]
+
+
+def _message_size(message):
+    """ The number of values of a message; a doorbell or a
+    CreditGrant counts as one.
+    """
+    if isinstance(message, CreditGrant) or message[1] is None:
+        return 1
+    return max(len(message[1]), 1)
+
+
+class InputChannel(object):
+    """
+    The sending end of one channel of an Inbox. It is used
+    wherever a receiver queue is used (in output_stream_names_dict,
+    as the doorbell of a SharedRing, in a ReplicaRouter, for
+    credit grants): put(message) puts message on the queue of
+    the channel and then rings the doorbell of the Inbox.
+
+    Parameters
+    ----------
+    queue: multiprocessing.Queue
+    doorbell: multiprocessing.Semaphore
+    serializer: Serializers.MessageSerializer (optional)
+          If not None, messages other than CreditGrants are
+          encoded by serializer before they are put on queue.
+
+    """
+    def __init__(self, queue, doorbell, serializer=None):
+        self.queue = queue
+        self.doorbell = doorbell
+        self.serializer = serializer
+
+    def put(self, message):
+        if self.serializer is not None and not isinstance(message, CreditGrant):
+            message = self.serializer.encode(message)
+        self.queue.put(message)
+        self.doorbell.release()
+
+
+class Inbox(object):
+    """
+    The input channels of a process: one queue for each process
+    group that sends messages to it, and one for the main process.
+    A group that sends many messages fills its own queue and
+    does not delay the messages of other groups.
+
+    Parameters
+    ----------
+    channel_names: sequence of str
+          The names of the channels: the names of the groups
+          that send to the process, and MAIN_CHANNEL_NAME.
+    serializer: Serializers.MessageSerializer (optional)
+          If not None, the messages are encoded by the
+          InputChannels and decoded by get_many.
+
+    Attributes
+    ----------
+    queues: list of multiprocessing.Queue
+          queues[i] is the queue of channel_names[i].
+    doorbell: multiprocessing.Semaphore
+          Released once for every message put on a queue, so
+          that the process waits on all the queues together.
+    _pending: nonnegative integer
+          The number of messages announced by the doorbell
+          that have not been taken from the queues.
+    _next_channel: nonnegative integer
+          The index of the queue that get_many reads first;
+          it rotates so that the channels are read in turn.
+
+    """
+    def __init__(self, channel_names, serializer=None):
+        self.channel_names = list(channel_names)
+        self.serializer = serializer
+        self.queues = [Queue() for _ in self.channel_names]
+        self.doorbell = Semaphore(0)
+        self._pending = 0
+        self._next_channel = 0
+
+    def channel(self, channel_name):
+        """ The InputChannel on which channel_name sends. """
+        return InputChannel(
+            self.queues[self.channel_names.index(channel_name)], self.doorbell,
+            self.serializer)
+
+    def qsize(self):
+        """ The number of messages in the queues. Raises
+        NotImplementedError on platforms without Queue.qsize.
+        """
+        return sum(queue.qsize() for queue in self.queues)
+
+    def get_many(self, max_size, timeout=None):
+        """
+        Wait until there is a message on some channel, or until
+        timeout seconds have passed, and return the messages that
+        are available, taking one message from each channel in
+        turn until the messages have max_size values (see
+        _message_size). Returns an empty list on timeout.
+        The messages of each channel are returned in the order
+        in which they were sent.
+        """
+        if self._pending == 0:
+            if not self.doorbell.acquire(True, timeout):
+                return []
+            self._pending = 1
+        while self.doorbell.acquire(False):
+            self._pending += 1
+        messages = []
+        size = 0
+        num_channels = len(self.queues)
+        first_channel = self._next_channel
+        self._next_channel = (self._next_channel + 1) % num_channels
+        while self._pending and size < max_size:
+            received = False
+            for i in range(num_channels):
+                queue = self.queues[(first_channel + i) % num_channels]
+                try:
+                    message = queue.get_nowait()
+                except Empty:
+                    continue
+                if self.serializer is not None and \
+                  not isinstance(message, CreditGrant):
+                    message = self.serializer.decode(message)
+                received = True
+                messages.append(message)
+                size += _message_size(message)
+                self._pending -= 1
+                if not self._pending or size >= max_size:
+                    break
+            if not received:
+                if messages:
+                    break
+                # The message is still on its way to the queue.
+                time.sleep(_IN_FLIGHT_SLEEP)
+        return messages
+
+
+class ReplicaRouter(object):
+    """
+    Sends the batches of a stream to the replicas of a group.
+    A ReplicaRouter is used in output_stream_names_dict in place
+    of the input channel of a group that is replicated.
+
+    Parameters
+    ----------
+    queues: list of InputChannel
+          The input channels of the replicas.
+    partition: {'round_robin', 'hash'} (optional)
+          'round_robin': each batch goes to the next replica.
+          'hash': each value v goes to the replica
+          hash(key(v)) % len(queues), so that the values with
+          the same key are processed by the same replica, in
+          the order in which they were sent.
+    key: function or str (optional)
+          The key function for 'hash', or its name in the
+          component registry. The default is the value itself.
+    ordered: boolean (optional)
+          Only for 'round_robin'. If True, the batches are tagged
+          with consecutive sequence numbers, so that the outputs
+          of the replicas can be put back in order downstream.
+
+    """
+    def __init__(self, queues, partition='round_robin', key=None,
+                 ordered=False):
+        if partition not in ('round_robin', 'hash'):
+            raise ValueError('Unknown partition {0}'.format(partition))
+        if ordered and partition != 'round_robin':
+            raise ValueError('Only round_robin partitions can be ordered')
+        self.queues = queues
+        self.partition = partition
+        self.key = key
+        self.ordered = ordered
+        self.next_replica = 0
+        self.sequence = 0
+
+    def put(self, message):
+        stream_name, values = message[0], message[1]
+        tag = message[2] if len(message) > 2 else None
+        num_replicas = len(self.queues)
+        if self.partition == 'round_robin':
+            if self.ordered:
+                sender = None if tag is None else tag.sender
+                message = (stream_name, values, MessageTag(self.sequence, sender))
+                self.sequence += 1
+            self.queues[self.next_replica].put(message)
+            self.next_replica = (self.next_replica + 1) % num_replicas
+            return
+        if isinstance(self.key, basestring):
+            # Resolved in the process that sends the values.
+            self.key = get_component(self.key)
+        parts = [[] for _ in range(num_replicas)]
+        for v in values:
+            k = v if self.key is None else self.key(v)
+            parts[hash(k) % num_replicas].append(v)
+        for queue, part in zip(self.queues, parts):
+            if part:
+                queue.put(message[:1] + (part,) + message[2:])
+
+
+class OutputBatcher(object):
     """
+    Collects the values appended to the streams that go to
+    other processes and sends them in batches: a message is
+    (stream name, list of values) rather than a single value.
+
+    Parameters
+    ----------
+    output_stream_names_dict: dict
+          key: name of a stream that goes to other processes
+          value: the receivers of the stream: the input channels
+          of those processes, or SharedRings
+    batch_size: positive integer (optional)
+          The batch of a stream is sent as soon as it has
+          batch_size values.
+    max_delay: float (optional)
+          All batches are sent when the oldest value in them
+          has waited max_delay seconds.
+    credit_window: None or positive integer (optional)
+          If not None, the number of values that may be sent
+          on a stream to a receiving channel and not yet be
+          applied by the receiver. Values beyond the window are
+          held until the receiver grants more credits. Streams
+          sent through SharedRings are not credited: a full
+          ring makes the sender wait.
+    receiver_names: dict (optional)
+          key: stream name
+          value: the names of the receivers in
+          output_stream_names_dict[stream name], in the same
+          order. Only streams in receiver_names are credited, and
+          only to receivers whose names are not None.
+    sender: None or nonnegative integer (optional)
+          The index of this process among the replicas of its
+          group; messages are tagged with it.
+    sequenced: boolean (optional)
+          True in a replica of an ordered group. Values are then
+          sent only by flush(sequence), after the replica has
+          applied the input batch with that sequence number.
+
+    Attributes
+    ----------
+    batches: dict
+          key: stream name
+          value: list of chunks (lists or arrays) of values
+          that have not been sent
+    batch_lengths: dict
+          key: stream name
+          value: the number of values in batches[stream name]
+    deadline: float or None
+          The time by which all batches must be sent; None
+          if there is nothing to send.
+    credits: dict
+          key: (stream name, receiver name)
+          value: the number of values that may be sent
+    held: dict
+          key: (stream name, receiver name)
+          value: deque of messages waiting for credits
+    num_held: nonnegative integer
+          The number of values in held.
+
+    """
+    def __init__(self, output_stream_names_dict,
+                 batch_size=DEFAULT_MESSAGE_BATCH_SIZE,
+                 max_delay=DEFAULT_MESSAGE_BATCH_DELAY,
+                 credit_window=None, receiver_names=None,
+                 sender=None, sequenced=False):
+        self.output_stream_names_dict = output_stream_names_dict
+        self.sender = sender
+        self.sequenced = sequenced
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.batches = dict((name, []) for name in output_stream_names_dict)
+        self.batch_lengths = dict((name, 0) for name in output_stream_names_dict)
+        self.deadline = None
+        self.credits = dict()
+        self.held = dict()
+        self.num_held = 0
+        # key: stream name; value: list of (receiver name or
+        # None if the receiver is not credited)
+        self._credit_keys = dict()
+        if receiver_names is None:
+            receiver_names = dict()
+        for stream_name, receivers in output_stream_names_dict.iteritems():
+            names = receiver_names.get(stream_name)
+            keys = []
+            for i, receiver in enumerate(receivers):
+                if credit_window is None or names is None or \
+                  names[i] is None or isinstance(receiver, SharedRing):
+                    keys.append(None)
+                    continue
+                key = (stream_name, names[i])
+                self.credits[key] = credit_window
+                self.held[key] = deque()
+                keys.append(key)
+            self._credit_keys[stream_name] = keys
+
+    @property
+    def blocked(self):
+        """ True if some values are waiting for credits. """
+        return self.num_held > 0
+
+    def add(self, stream_name, values):
+        """ Add the list (or array) values to the batch of
+        the stream called stream_name. The values are copied:
+        values may be a view of the recent list of a stream
+        with 'ring' storage, which is overwritten after it has
+        been read, while the batch may wait, or be held for
+        credits.
+        """
+        if len(values) == 0:
+            return
+        if isinstance(values, np.ndarray):
+            values = np.array(values)
+        else:
+            values = list(values)
+        self.batches[stream_name].append(values)
+        self.batch_lengths[stream_name] += len(values)
+        if self.sequenced:
+            return
+        if self.deadline is None:
+            self.deadline = time.time() + self.max_delay
+        if self.batch_lengths[stream_name] >= self.batch_size:
+            self.send(stream_name)
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.flush()
+
+    def send(self, stream_name, sequence=None):
+        """ Send the batch of one stream to its receivers.
+        A batch with a sequence number is sent even if it is
+        empty, so that the receiver knows that it is complete.
+        """
+        chunks = self.batches[stream_name]
+        if not chunks and sequence is None:
+            return
+        values = _concatenate(chunks)
+        self.batches[stream_name] = []
+        self.batch_lengths[stream_name] = 0
+        if sequence is None and self.sender is None:
+            message = (stream_name, values)
+        else:
+            message = (stream_name, values, MessageTag(sequence, self.sender))
+        for receiver, key in zip(self.output_stream_names_dict[stream_name],
+                                 self._credit_keys[stream_name]):
+            if key is None:
+                receiver.put(message)
+            else:
+                self.held[key].append(message)
+                self.num_held += len(values)
+                self._send_held(key, receiver)
+        if not any(self.batch_lengths.itervalues()):
+            self.deadline = None
+
+    def _send_held(self, key, receiver):
+        """ Send as many held values of an edge as its credits
+        allow, oldest first. A message with a sequence number is
+        not split; it is sent whole if there are any credits.
+        """
+        held = self.held[key]
+        while held and self.credits[key] > 0:
+            message = held.popleft()
+            values = message[1]
+            n = min(len(values), self.credits[key])
+            if n < len(values):
+                if len(message) > 2 and message[2].sequence is not None:
+                    n = len(values)
+                else:
+                    held.appendleft(message[:1] + (values[n:],) + message[2:])
+                    message = message[:1] + (values[:n],) + message[2:]
+            receiver.put(message)
+            self.credits[key] -= n
+            self.num_held -= n
+        if held and Metrics.enabled:
+            Metrics.increment(
+                'credit_stalls_total{{stream="{0}",receiver="{1}"}}'.format(*key))
+        if Metrics.enabled:
+            Metrics.set_gauge(
+                'credit_held_values{{stream="{0}",receiver="{1}"}}'.format(*key),
+                sum(len(message[1]) for message in held))
+
+    def grant(self, credit_grant):
+        """ Add the credits of a CreditGrant and send the
+        values that they allow.
+        """
+        key = (credit_grant.stream_name, credit_grant.receiver_name)
+        if key not in self.credits:
+            # Flow control is off for this edge.
+            return
+        self.credits[key] += credit_grant.num_values
+        stream_name = credit_grant.stream_name
+        receiver = self.output_stream_names_dict[stream_name][
+            self._credit_keys[stream_name].index(key)]
+        self._send_held(key, receiver)
+
+    def flush(self, sequence=None):
+        """ Send the batches of all streams, tagged with
+        sequence if it is not None.
+        """
+        for stream_name in self.batches:
+            self.send(stream_name, sequence)
+        self.deadline = None
+
+    def time_to_deadline(self):
+        """ Seconds until the batches must be sent, or None
+        if there is nothing to send.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+
+def make_input_manager(inbox, input_stream_dict, output_batcher=None,
+                       input_rings=None, credit_queues=None, group_name=None,
+                       sequenced_stream_names=(),
+                       drain_size=DEFAULT_INPUT_DRAIN_SIZE):
+    """ Make an object that waits continuously for messages
+    on the channels of inbox (see Inbox) and then extends the
+    streams with the specified names by the values in the
+    messages. All the messages that are available, up to
+    drain_size values, are taken at once, and each stream is
+    extended once by the values of all its messages, so that
+    the agents that read the stream take one step for the
+    batch rather than one for each message.
+    A message (stream name, None) is the doorbell of the
+    SharedRing input_rings[stream name]: the stream is extended
+    by the values in the ring.
+    After a stream in credit_queues is extended by n values,
+    CreditGrant(stream name, group_name, n) is put on
+    credit_queues[stream name], the input channel of its sender
+    (or, if the sender is replicated, a list of the input channels
+    of its replicas, indexed by the sender in the MessageTag).
+    Messages with sequence numbers are applied one at a time;
+    those of a stream in sequenced_stream_names are applied in
+    sequence order. After a message with a sequence number is applied,
+    the outputs are flushed with the same number if
+    output_batcher is sequenced.
+    A CreditGrant received on inbox is given to output_batcher.
+    While output_batcher is blocked waiting for credits, other
+    messages are deferred: they are not applied, and so no
+    credits are granted for them, which holds back the senders
+    of this process in turn.
+    While it waits, it sends the batches of output_batcher
+    when they are due.
+
+    """
+    if input_rings is None:
+        input_rings = dict()
+    if credit_queues is None:
+        credit_queues = dict()
+    # key: name of a sequenced stream
+    # value: [next sequence number, dict: sequence number -> message]
+    reorder_buffers = dict(
+        (stream_name, [0, dict()]) for stream_name in sequenced_stream_names)
+
+    def grant_credits(stream_name, sender, num_values):
+        if stream_name in credit_queues and num_values:
+            credit_queue = credit_queues[stream_name]
+            if isinstance(credit_queue, list):
+                credit_queue = credit_queue[sender]
+            credit_queue.put(CreditGrant(stream_name, group_name, num_values))
+
+    def apply_sequenced_message(message):
+        stream_name, values, tag = message
+        input_stream_dict[stream_name].extend(values)
+        grant_credits(stream_name, tag.sender, len(values))
+        if output_batcher is not None and output_batcher.sequenced:
+            output_batcher.flush(tag.sequence)
+
+    def apply_messages(messages):
+        # key: stream name
+        # value: list of the messages of the stream, in the
+        # order in which they were received
+        messages_of_stream = dict()
+        stream_names = []
+        for message in messages:
+            stream_name = message[0]
+            if len(message) > 2 and message[2].sequence is not None:
+                reorder_buffer = reorder_buffers.get(stream_name)
+                if reorder_buffer is None:
+                    apply_sequenced_message(message)
+                    continue
+                # Apply the messages that are next in sequence.
+                reorder_buffer[1][message[2].sequence] = message
+                while reorder_buffer[0] in reorder_buffer[1]:
+                    apply_sequenced_message(
+                        reorder_buffer[1].pop(reorder_buffer[0]))
+                    reorder_buffer[0] += 1
+                continue
+            if stream_name not in messages_of_stream:
+                messages_of_stream[stream_name] = []
+                stream_names.append(stream_name)
+            messages_of_stream[stream_name].append(message)
+        for stream_name in stream_names:
+            stream = input_stream_dict[stream_name]
+            if stream_name in input_rings:
+                # Any number of doorbells: read the ring once.
+                input_rings[stream_name].drain_into(stream)
+                continue
+            stream_messages = messages_of_stream[stream_name]
+            stream.extend(_concatenate(
+                [message[1] for message in stream_messages]))
+            # key: sender; value: number of values
+            num_values = dict()
+            for message in stream_messages:
+                sender = message[2].sender if len(message) > 2 else None
+                num_values[sender] = num_values.get(sender, 0) + len(message[1])
+            for sender, n in num_values.iteritems():
+                grant_credits(stream_name, sender, n)
+
+    deferred = deque()
     while True:
-        message = input_queue.get()
-        stream_name, message_content = message
-        input_stream_dict[stream_name].append(message_content)
-        #input_stream_dict[stream_name].print_recent()
+        if deferred and not (output_batcher is not None and output_batcher.blocked):
+            messages = []
+            size = 0
+            while deferred and size < drain_size:
+                messages.append(deferred.popleft())
+                size += _message_size(messages[-1])
+            apply_messages(messages)
+            continue
+        timeout = None if output_batcher is None else \
+          output_batcher.time_to_deadline()
+        messages = inbox.get_many(drain_size, timeout)
+        if not messages:
+            if output_batcher is not None:
+                output_batcher.flush()
+            continue
+        data_messages = []
+        for message in messages:
+            if isinstance(message, CreditGrant):
+                output_batcher.grant(message)
+            else:
+                data_messages.append(message)
+        if output_batcher is not None and output_batcher.blocked:
+            deferred.extend(data_messages)
+            if Metrics.enabled:
+                Metrics.set_gauge(
+                    'input_deferred_messages{{group="{0}"}}'.format(group_name),
+                    len(deferred))
+            continue
+        apply_messages(data_messages)
+        if Metrics.enabled:
+            Metrics.set_gauge(
+                'input_batch_messages{{group="{0}"}}'.format(group_name),
+                len(messages))
+            try:
+                Metrics.set_gauge(
+                    'input_queue_depth{{group="{0}"}}'.format(group_name),
+                    inbox.qsize())
+            except NotImplementedError:
+                # qsize is not available on some platforms.
+                pass
 
 
-def make_output_manager(stream_dict, output_stream_names_dict):
+def make_output_manager(stream_dict, output_stream_names_dict,
+                        batch_size=DEFAULT_MESSAGE_BATCH_SIZE,
+                        max_delay=DEFAULT_MESSAGE_BATCH_DELAY,
+                        credit_window=None, receiver_names=None,
+                        sender=None, sequenced=False):
+    """ Make an agent that reads the streams that go to other
+    processes and adds their new values to an OutputBatcher.
+    Returns the OutputBatcher.
+
+    """
     output_stream_names_list = output_stream_names_dict.keys()
     output_stream_list = \
       [stream_dict[stream_name] for stream_name in output_stream_names_list]
-    
-    def send_message_to_queue(value_and_index_tuple):
-        """ Append the message on the stream with the specified index
-        to each of the queues to which that stream is connected.
+    output_batcher = OutputBatcher(
+        output_stream_names_dict, batch_size, max_delay,
+        credit_window, receiver_names, sender, sequenced)
 
-        """
-        message_content, stream_index = value_and_index_tuple
-        output_stream_name = output_stream_names_list[stream_index]
-        receiver_queue_list = output_stream_names_dict[output_stream_name]
-        #print 'send message to q. message_content = ', message_content
-        #print 'send message to q. output_stream_name = ', output_stream_name
-        message = (output_stream_name, message_content)
-        for receiver_queue in receiver_queue_list:
-            receiver_queue.put(message)
-
-    stream_agent(
-        inputs=output_stream_list,
-        outputs=None,
-        f_type='asynch_element',
-        f=send_message_to_queue,
-        f_args=None)
-
-def make_process(input_queue,
+    def transition(in_lists, state):
+        for stream_name, v in zip(output_stream_names_list, in_lists):
+            if v.stop > v.start:
+                output_batcher.add(stream_name, v.list[v.start:v.stop])
+        return ([], state, [v.stop for v in in_lists])
+
+    Agent(output_stream_list, [], transition, name='output_manager')
+    return output_batcher
+
+def make_process(inbox,
                  all_stream_names_tuple,
                  input_stream_names_tuple,
                  output_stream_names_dict,
-                 agent_descriptor_dict):
+                 agent_descriptor_dict,
+                 batch_size=DEFAULT_MESSAGE_BATCH_SIZE,
+                 max_delay=DEFAULT_MESSAGE_BATCH_DELAY,
+                 input_rings=None, group_name=None, credit_window=None,
+                 receiver_names=None, credit_queues=None,
+                 metrics_port=None, replica_index=None, sequenced=False,
+                 sequenced_stream_names=(), stream_dtypes=None):
+    """ Make and run the network of a process.
+
+    Parameters
+    ----------
+    inbox: Inbox
+          The channels on which the process receives messages
+          (stream name, list of values) from other processes.
+    all_stream_names_tuple: tuple of str
+    input_stream_names_tuple: tuple of str
+          The names of the streams that are received from
+          other processes.
+    output_stream_names_dict: dict
+          key: name of a stream that is sent to other processes
+          value: list of receivers: the InputChannels of the
+          processes, SharedRings (see SharedRing.py), or
+          ReplicaRouters for groups that are replicated
+    agent_descriptor_dict: dict
+          See make_network.
+    batch_size, max_delay: (optional)
+          See OutputBatcher.
+    input_rings: dict (optional)
+          key: name of an input stream
+          value: the SharedRing on which the stream is received;
+          the stream is a StreamArray with the dtype of the ring.
+    group_name: str (optional)
+          The name of the process in credit grants and metrics.
+    credit_window, receiver_names: (optional)
+          The flow control of the output streams; see
+          OutputBatcher.
+    credit_queues: dict (optional)
+          key: name of an input stream
+          value: the input channel of the process that sends it,
+          to which credits are granted; see make_input_manager.
+    replica_index: None or nonnegative integer (optional)
+          The index of the process among the replicas of its
+          group, if the group is replicated.
+    sequenced: boolean (optional)
+          True for a replica of a group whose outputs are put
+          back in order; see OutputBatcher.
+    sequenced_stream_names: sequence of str (optional)
+          The input streams whose messages are applied in
+          sequence order; see make_input_manager.
+    metrics_port: None or int (optional)
+          If not None, metrics are enabled in the process and
+          served on this port (see Metrics.py).
+    stream_dtypes: dict (optional)
+          key: stream name
+          value: numpy dtype
+          The streams of numbers in the process; they are
+          StreamArrays (see make_network).
+
+    """
+    if input_rings is None:
+        input_rings = dict()
+    if metrics_port is not None:
+        Metrics.enable()
+        Metrics.start_http_server(metrics_port)
+
+    # Functions given by name (e.g. in a JSON description) are
+    # imported here, in the process that runs them. The
+    # descriptors are copied, since they may be part of a plan.
+    agent_descriptor_dict = resolve_functions(dict(
+        (agent_name, list(descriptor))
+        for agent_name, descriptor in agent_descriptor_dict.iteritems()))
+
+    # Streams received on shared rings are numeric.
+    ring_streams = dict()
+    for stream_name, ring in input_rings.iteritems():
+        ring_streams[stream_name] = StreamArray(
+            stream_name, dtype=ring.dtype, num_columns=ring.num_columns)
 
     # Create the network
     # Create all the agents and make the streams connecting them
     stream_dict, agent_dict = \
-      make_network(all_stream_names_tuple, agent_descriptor_dict)
+      make_network(all_stream_names_tuple, agent_descriptor_dict,
+                   streams=ring_streams, stream_dtypes=stream_dtypes)
 
 
     input_stream_dict = dict()
@@ -62,17 +719,20 @@ def make_process(input_queue,
         input_stream_dict[stream_name] = stream_dict[stream_name]
 
     # Create the output stream manager which subscribes
-    # to messages on streams going outside the process.
-    # The output stream manger takes each message m it receives
-    # on a stream s and puts m in the input queues of each process
-    # that receives s.
-    output_manager = make_output_manager(
-        stream_dict, output_stream_names_dict)
+    # to the streams going outside the process.
+    # The output stream manager collects the values appended
+    # to each such stream s into batches, and puts each batch
+    # in the input queues of each process that receives s.
+    output_batcher = make_output_manager(
+        stream_dict, output_stream_names_dict, batch_size, max_delay,
+        credit_window, receiver_names, replica_index, sequenced)
 
     # Create the input stream manager which takes
-    # messages from the input queue and appends each message
-    # to the specified input stream.
-    make_input_manager(input_queue, input_stream_dict)
+    # messages from the input queue and extends the specified
+    # input stream by the values in each message.
+    make_input_manager(inbox, input_stream_dict, output_batcher,
+                       input_rings, credit_queues, group_name,
+                       sequenced_stream_names)
 
 def main():
     
@@ -90,7 +750,7 @@ def main():
     # STEP 2
     # SPECIFY THE NETWORK.
 
-    queue_0 = Queue()
+    inbox_0 = Inbox([MAIN_CHANNEL_NAME])
     queue_1 = Queue()
     
     # Specify names of all the streams.
@@ -115,14 +775,14 @@ def main():
     ## queue_0 = Queue()
     ## queue_1 = Queue()
     process_0 = Process(target=make_process,
-                        args= (queue_0,
+                        args= (inbox_0,
                                all_stream_names_tuple,
                                input_stream_names_tuple,
                                output_stream_names_dict,
                                agent_descriptor_dict)
                                )
     process_0.start()
-    queue_0.put(('trigger', 0))
+    inbox_0.channel(MAIN_CHANNEL_NAME).put(('trigger', [0]))
     #while not queue_1.empty():
     while True:
         v = queue_1.get()
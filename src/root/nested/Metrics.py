@@ -0,0 +1,316 @@
+""" This module contains the metrics registry of a
+process: counts and timings of the streams and agents
+of the networks that run in the process.
+
+Metrics are off by default and are switched on for the
+whole process by enable(). While metrics are off, a write
+to a stream or a state transition of an agent only tests
+the flag Metrics.enabled.
+
+Recorded while enabled:
+(1) for each stream: the number of values appended and
+    the times of the first and last appends, from which
+    the append rate is computed;
+(2) for each agent: the number of state transitions and
+    a histogram of the wall-clock times of its transition
+    function;
+(3) named counters and gauges set by other modules.
+Computed when a snapshot is taken:
+(4) for each stream: the lag of each reader,
+    stop - start[reader], and the allocated size of recent.
+
+snapshot() returns the metrics as a dict, format_text()
+formats a snapshot as lines of text of the form
+    name{label="value"} number
+and start_http_server() serves that text so that a running
+network can be scraped.
+
+"""
+
+import bisect
+import threading
+import time
+import weakref
+
+enabled = False
+
+# Upper bounds, in seconds, of the buckets of the histograms
+# of transition times: 1 microsecond, 2, 4, .., about 8 seconds.
+# The last bucket counts the longer times.
+TIME_BUCKET_BOUNDS = [1E-6 * 2**k for k in range(24)]
+
+_lock = threading.Lock()
+# key = stream, value = StreamMetrics
+_stream_metrics = weakref.WeakKeyDictionary()
+# key = agent, value = AgentMetrics
+_agent_metrics = weakref.WeakKeyDictionary()
+_counters = dict()
+_gauges = dict()
+# key = stream, agent or reader, value = its name in snapshots
+_labels = weakref.WeakKeyDictionary()
+# key = (kind, name), value = number of objects of the kind
+# ('stream' or 'agent') labelled with the name
+_label_counts = dict()
+
+
+class StreamMetrics(object):
+    """
+    The counts recorded for a stream.
+
+    Attributes
+    ----------
+    num_appended: nonnegative integer
+          The number of values appended while metrics
+          were enabled.
+    first_append_time, last_append_time: float or None
+          The times (time.time()) of the first and last
+          appends while metrics were enabled.
+
+    """
+    def __init__(self):
+        self.num_appended = 0
+        self.first_append_time = None
+        self.last_append_time = None
+
+
+class AgentMetrics(object):
+    """
+    The counts recorded for an agent.
+
+    Attributes
+    ----------
+    num_calls: nonnegative integer
+          The number of state transitions.
+    total_time: float
+          The total wall-clock time, in seconds, of the
+          state transitions.
+    time_buckets: list of nonnegative integers
+          time_buckets[k] is the number of transitions that
+          took at most TIME_BUCKET_BOUNDS[k] seconds and more
+          than TIME_BUCKET_BOUNDS[k-1] seconds. The last
+          element counts the transitions that took longer
+          than TIME_BUCKET_BOUNDS[-1].
+
+    """
+    def __init__(self):
+        self.num_calls = 0
+        self.total_time = 0.0
+        self.time_buckets = [0] * (len(TIME_BUCKET_BOUNDS) + 1)
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    """ Discard all recorded metrics. """
+    with _lock:
+        _stream_metrics.clear()
+        _agent_metrics.clear()
+        _counters.clear()
+        _gauges.clear()
+        _labels.clear()
+        _label_counts.clear()
+
+
+def record_append(stream, num_values):
+    """ Called by a stream when num_values values are appended. """
+    metrics = _stream_metrics.get(stream)
+    if metrics is None:
+        metrics = _stream_metrics[stream] = StreamMetrics()
+        with _lock:
+            _label(stream, 'stream')
+    now = time.time()
+    if metrics.first_append_time is None:
+        metrics.first_append_time = now
+    metrics.last_append_time = now
+    metrics.num_appended += num_values
+
+
+def record_transition(agent, seconds):
+    """ Called by an agent after a state transition that
+    took seconds of wall-clock time.
+
+    """
+    metrics = _agent_metrics.get(agent)
+    if metrics is None:
+        metrics = _agent_metrics[agent] = AgentMetrics()
+        with _lock:
+            _label(agent, 'agent')
+    metrics.num_calls += 1
+    metrics.total_time += seconds
+    metrics.time_buckets[bisect.bisect_left(TIME_BUCKET_BOUNDS, seconds)] += 1
+
+
+def stream_metrics(stream):
+    """ The StreamMetrics of stream, or None if nothing has
+    been recorded for it.
+    """
+    return _stream_metrics.get(stream)
+
+
+def agent_metrics(agent):
+    """ The AgentMetrics of agent, or None if nothing has
+    been recorded for it.
+    """
+    return _agent_metrics.get(agent)
+
+
+def increment(name, amount=1):
+    """ Add amount to the counter called name. """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name, value):
+    """ Set the gauge called name to value. """
+    _gauges[name] = value
+
+
+def _label(obj, kind):
+    """
+    The name of obj in snapshots: its name, or the name of its
+    class if it has none, followed by #2, #3, .. for the second,
+    third, .. object of the same kind, 'stream' or 'agent'
+    (agents and other readers), that is labelled with the same
+    name. The label of an object is chosen once, so that it is
+    the same in every snapshot.
+    """
+    try:
+        return _labels[obj]
+    except KeyError:
+        pass
+    except TypeError:
+        # obj cannot be weakly referenced; it is not counted.
+        return _name(obj)
+    name = _name(obj)
+    count = _label_counts.get((kind, name), 0) + 1
+    _label_counts[(kind, name)] = count
+    label = name if count == 1 else '{0}#{1}'.format(name, count)
+    _labels[obj] = label
+    return label
+
+
+def _name(obj):
+    name = getattr(obj, 'name', None)
+    return type(obj).__name__ if name is None else str(name)
+
+
+def snapshot():
+    """
+    Return the current metrics.
+
+    Returns
+    -------
+    metrics: dict with keys 'streams', 'agents', 'counters'
+          and 'gauges'.
+          metrics['streams'][stream name] is a dict with keys
+          'num_appended', 'append_rate' (values per second),
+          'reader_lag' (dict: reader name -> lag),
+          'recent_length' and 'recent_bytes'.
+          metrics['agents'][agent name] is a dict with keys
+          'num_calls', 'total_time' and 'time_buckets' (list
+          of (upper bound in seconds, count)).
+          Streams, agents and readers are named by _label.
+
+    """
+    with _lock:
+        streams = dict()
+        for stream, m in _stream_metrics.items():
+            if m.first_append_time is None or \
+              m.last_append_time == m.first_append_time:
+                rate = 0.0
+            else:
+                rate = m.num_appended / (m.last_append_time - m.first_append_time)
+            reader_lag = dict()
+            for reader, start in stream.start.items():
+                reader_lag[_label(reader, 'agent')] = stream.stop - start
+            streams[_label(stream, 'stream')] = {
+                'num_appended': m.num_appended,
+                'append_rate': rate,
+                'reader_lag': reader_lag,
+                'recent_length': len(stream.recent),
+                'recent_bytes': len(stream.recent) * stream._element_nbytes()}
+        agents = dict()
+        for agent, m in _agent_metrics.items():
+            agents[_label(agent, 'agent')] = {
+                'num_calls': m.num_calls,
+                'total_time': m.total_time,
+                'time_buckets': zip(TIME_BUCKET_BOUNDS + [float('inf')],
+                                    m.time_buckets)}
+        return {'streams': streams, 'agents': agents,
+                'counters': dict(_counters), 'gauges': dict(_gauges)}
+
+
+def format_text(metrics=None):
+    """
+    Format a snapshot (by default, a new one) as text,
+    one metric per line. The time histograms are cumulative,
+    i.e., the count of bucket le="b" is the number of
+    transitions that took at most b seconds.
+    """
+    if metrics is None:
+        metrics = snapshot()
+    lines = []
+    for name, m in sorted(metrics['streams'].items()):
+        lines.append('stream_appended_total{{stream="{0}"}} {1}'.\
+                     format(name, m['num_appended']))
+        lines.append('stream_append_rate{{stream="{0}"}} {1}'.\
+                     format(name, m['append_rate']))
+        lines.append('stream_recent_length{{stream="{0}"}} {1}'.\
+                     format(name, m['recent_length']))
+        lines.append('stream_recent_bytes{{stream="{0}"}} {1}'.\
+                     format(name, m['recent_bytes']))
+        for reader, lag in sorted(m['reader_lag'].items()):
+            lines.append('stream_reader_lag{{stream="{0}",reader="{1}"}} {2}'.\
+                         format(name, reader, lag))
+    for name, m in sorted(metrics['agents'].items()):
+        lines.append('agent_calls_total{{agent="{0}"}} {1}'.\
+                     format(name, m['num_calls']))
+        lines.append('agent_time_seconds_total{{agent="{0}"}} {1}'.\
+                     format(name, m['total_time']))
+        cumulative = 0
+        for bound, count in m['time_buckets']:
+            cumulative += count
+            lines.append('agent_time_seconds_bucket{{agent="{0}",le="{1}"}} {2}'.\
+                         format(name, bound, cumulative))
+    for name, value in sorted(metrics['counters'].items()):
+        lines.append('{0} {1}'.format(name, value))
+    for name, value in sorted(metrics['gauges'].items()):
+        lines.append('{0} {1}'.format(name, value))
+    return '\n'.join(lines) + '\n'
+
+
+def start_http_server(port, host=''):
+    """
+    Serve format_text() over HTTP on port from a daemon
+    thread. Returns the server; call its shutdown() method
+    to stop it.
+    """
+    # Imported here so that processes that do not serve
+    # metrics do not load the HTTP server modules.
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            text = format_text()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(text)))
+            self.end_headers()
+            self.wfile.write(text)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
@@ -1,244 +1,226 @@
-from copy import deepcopy
-from pprint import pprint
-
-from MakeParallelNetworkParallel import *
-# UNCOMMENT FOR PARALLELLLL and get back MakeParallelNet2
-# from MakeParallelNetwork import *
-
-
-# Make data structure for parallel processing
-# Key: name of group
-# Value: {agent_desc dict, input_stream_names_tuple, output_stream_names_tuple,
-#          all_stream_names_tuple}
-def parallel_dict(json_data):
-    # Get the mini JSON files for each group
-    # with agent_desc_dict and stream_names_tuple
-    big_dict = {}
-    for group_name in json_data['groups'].keys():
-        #print '====' + group_name + '======='
-        big_dict[group_name] = {}
-
-        # Fill out these:
-        big_dict[group_name]['agent_descriptor_dict'] = {}
-        big_dict[group_name]['input_stream_names_tuple'] = []
-        big_dict[group_name]['output_stream_names_dict'] = {}
-
-        for node in json_data['groups'][group_name]:
-            #print '-----' + node + '-----'
-            for process in json_data['agent_descriptor_dict'].keys():
-                if node == process:
-                    # Add agent_desc to group
-                    big_dict[group_name]['agent_descriptor_dict'][process]=\
-                    json_data['agent_descriptor_dict'][process]
-
-                    # Grab input streams
-                    big_dict[group_name]['input_stream_names_tuple'] +=\
-                    json_data['agent_descriptor_dict'][process][0]
-
-                    # Grab output streams and put in dict as keys
-                    # with empty str as value
-                    for i in json_data['agent_descriptor_dict'][process][1]:
-                        big_dict[group_name]['output_stream_names_dict'][i] =\
-                        str()
-
-                    # Remove this node from original
-                    json_data = deepcopy(json_data)
-                    del json_data['agent_descriptor_dict'][process]
-
-        # Start with all input streams
-        big_dict[group_name]['all_stream_names_tuple'] =\
-         list(big_dict[group_name]['input_stream_names_tuple'])
-
-        # Add each output stream that isn't an input stream
-        for i in big_dict[group_name]['output_stream_names_dict'].keys():
-            if i not in big_dict[group_name]['all_stream_names_tuple']:
-                big_dict[group_name]['all_stream_names_tuple'].append(i)
-
-
-
-    ## Process leftover components (not in group), unwrap
-    ## and add to big_dict as a group called "main"
-    #pprint(json_data)
-
-    # Fill out group called 'leftover':
-    # Add agent_desc to group 'leftover'
-    big_dict['leftover'] = {}
-    big_dict['leftover']['agent_descriptor_dict']=\
-    json_data['agent_descriptor_dict']
-    big_dict['leftover']['input_stream_names_tuple'] = []
-    big_dict['leftover']['output_stream_names_dict'] = {}
-
-
-    for process in json_data['agent_descriptor_dict']:
-        # Grab input streams
-        big_dict['leftover']['input_stream_names_tuple'] +=\
-        json_data['agent_descriptor_dict'][process][0]
-
-        # Grab output streams and put in dict as keys
-        # with empty str as value
-        print '=====agent_descriptor_dict'
-        pprint(json_data['agent_descriptor_dict'])
-        for i in json_data['agent_descriptor_dict'][process][1]:
-            print '----', json_data['agent_descriptor_dict'][process][1]
-            big_dict['leftover']['output_stream_names_dict'][i] =\
-            str()
-            pprint(big_dict['leftover']['output_stream_names_dict'])
-        # Remove it from original
-        json_data = deepcopy(json_data)
-        del json_data['agent_descriptor_dict'][process]
-
-    # Make 'all_stream_names_tuple'
-    # Start with all input streams
-    big_dict['leftover']['all_stream_names_tuple'] =\
-     list(big_dict[group_name]['input_stream_names_tuple'])
-
-    # Add each output stream that isn't an input stream
-    for i in big_dict['leftover']['output_stream_names_dict'].keys():
-        if i not in big_dict['leftover']['all_stream_names_tuple']:
-            big_dict['leftover']['all_stream_names_tuple'].append(i)
-
-
-    ## Now that all groups are made:
-    ## go through each and distinguish exposed input & output streams
-
-    for group_name in big_dict.keys():
-        ## -----------Unwrap subgraphs----------------
-        #big_dict = unwrap(big_dict)
-        ## -------------------------------------------
-
-        ## Identify exposed output streams for this group
-        # If an output is an input to a component in this
-        # group, then delete it
-        A = big_dict[group_name]['input_stream_names_tuple']
-        B = big_dict[group_name]['output_stream_names_dict'].keys()
-        # C is the list of streams we want to delete from output streams
-        C =\
-        [x for x in B if x in A]
-
-        # Delete each in C from output streams
-        copy = deepcopy(big_dict[group_name]['output_stream_names_dict'])
-        for i in C:
-            del copy[i]
-        big_dict[group_name]['output_stream_names_dict'] = copy
-
-        ## Identify exposed input streams for this group
-        # From all input streams,
-        # delete the ones that come from a component
-        # in this group
-        A = big_dict[group_name]['agent_descriptor_dict'].keys()
-        B = big_dict[group_name]['input_stream_names_tuple']
-        C =\
-        [x for x in B if x.split('_PORT_')[0] not in A]
-        big_dict[group_name]['input_stream_names_tuple'] = C
-
-    pprint(big_dict)
-
-    output_stream_names_tuple_to_dict(big_dict)
-    pprint(big_dict)
-
-    return big_dict
-
-## Replaces the output stream tup to dict with queue names
-## Also adds last element to processes in agent_desc_dict,
-## "call_streams"
-def output_stream_names_tuple_to_dict(big_dict):
-    counter = 1
-    connecting_streams = []
-    groups_left = big_dict.keys()
-
-    # Start by looking for source groups
-    for group in groups_left:
-        # If a group has no exposed input stream:
-        input_streams = big_dict[group]['input_stream_names_tuple']
-        if input_streams == []:
-            output_dict = {}
-            # Make the corresponding dict with 'queue_1' as value
-            for s_name in big_dict[group]['output_stream_names_dict']:
-                big_dict[group]['output_stream_names_dict'][s_name] = 'queue_1'
-
-            # Make a new key/value pair in big dict for this group
-            big_dict[group]['queue'] = 'queue_1'
-
-            # Keep track of this group
-            for i in big_dict[group]['output_stream_names_dict'].keys():
-                connecting_streams.append(i)
-            print 'connecting_streams!: ', connecting_streams
-            groups_left.remove(group)
-
-            for group in big_dict:
-                print 'group in big dict:'
-                pprint(group)
-                for comp in big_dict[group]['agent_descriptor_dict']:
-                    if big_dict[group]['agent_descriptor_dict'][comp][0] == []:
-                        big_dict[group]['agent_descriptor_dict'][comp].append(None)
+'''
+This module runs a network whose agents are partitioned
+into groups, with one process for each group.
+
+The processes are planned by GroupPlanner.plan_from_json
+(or GroupPlanner.make_plan). Each process has an Inbox with
+an input channel (a queue) for each group that sends to it and
+one for the main process; it waits on all of them together and
+takes all the messages that are available at once. A stream
+of numbers (a stream in plan.stream_dtypes) is sent through a
+SharedRing for each receiving process; other streams are sent
+through the input channels, with credit-based flow control: a
+process sends at most credit_window values of a stream that the
+receiver has not yet applied, and a process that is waiting for
+credits stops applying its own inputs, so a slow process holds
+back the processes upstream of it instead of letting their
+values pile up in the queues. Messages on the channels carry
+the ids of their streams in plan.stream_ids, and their values
+are encoded by the codecs in plan.codecs (see Serializers.py).
+
+A group can be replicated (see GroupPlanner.make_plan): it then
+runs in several processes, and the batches of its input stream
+are routed to them by a ReplicaRouter, round robin or by the
+hash of a key. The outputs of the replicas go to the same
+downstream processes; if the group is ordered, they are put back
+in the order of the input batches by the receiving processes.
+
+'''
+
+from multiprocessing import Process
+
+from MakeParallelNetworkParallel import make_process, ReplicaRouter
+from MakeParallelNetworkParallel import Inbox, MAIN_CHANNEL_NAME
+from Serializers import MessageSerializer
+from SharedRing import SharedRing
+from GroupPlanner import plan_from_json, reachable_groups, SOURCE_TRIGGER_STREAM_NAME
+from SystemParameters import DEFAULT_MESSAGE_BATCH_SIZE, DEFAULT_MESSAGE_BATCH_DELAY
+from SystemParameters import DEFAULT_SHARED_RING_CAPACITY, DEFAULT_CREDIT_WINDOW
+
+
+def run_parallel(plan, batch_size=DEFAULT_MESSAGE_BATCH_SIZE,
+                 max_delay=DEFAULT_MESSAGE_BATCH_DELAY,
+                 ring_capacity=DEFAULT_SHARED_RING_CAPACITY,
+                 credit_window=DEFAULT_CREDIT_WINDOW, metrics_ports=None):
+    """
+    Start a process for each group of the plan, or a process
+    for each replica of a group that is replicated, and call
+    the sources of the network once by putting a value on
+    SOURCE_TRIGGER_STREAM_NAME (see GroupPlanner.make_plan).
+
+    Parameters
+    ----------
+    plan: GroupPlanner.GroupNetworkPlan
+    batch_size, max_delay: (optional)
+          See MakeParallelNetworkParallel.OutputBatcher.
+    ring_capacity: positive integer (optional)
+          The number of elements of each SharedRing. Streams
+          sent by or to a replicated group are sent through
+          queues, since a ring has a single writer and reader.
+    credit_window: None or positive integer (optional)
+          The flow-control window of each stream sent through a
+          queue (see OutputBatcher). None turns flow control
+          off. Streams sent between groups that are in a cycle
+          (see GroupPlanner.reachable_groups) are never credited,
+          since processes that wait for each other's credits
+          would wait forever.
+    metrics_ports: dict (optional)
+          key: group name
+          value: port on which the process of the group
+          serves its metrics (see Metrics.py); replica j of a
+          group serves them on port + j.
+
+    Returns
+    -------
+    processes: dict
+          key: group name
+          value: list of the started Processes, one for each
+          replica of the group
+    queues: dict
+          key: group name
+          value: list of the input channels of the processes
+          for the main process (see Inbox). Values of the
+          streams in plan.external_input_stream_names are sent
+          to a process by putting (stream name, list of values)
+          on its channel; e.g. putting
+          (SOURCE_TRIGGER_STREAM_NAME, [0]) calls the sources
+          of the group again.
+
+    """
+    def num_replicas(group_name):
+        spec = plan.replicas.get(group_name)
+        return 1 if spec is None else spec.num_replicas
+
+    reachable = reachable_groups(plan.groups)
+
+    def credited(sender_name, receiver_name):
+        """ True if the streams from sender_name to receiver_name
+        have flow control. """
+        return credit_window is not None and \
+          sender_name not in reachable[receiver_name]
+
+    # The groups that send messages to each group: the groups
+    # that send it streams and, with flow control, the groups to
+    # which it sends streams, which grant it credits.
+    peers = dict((group_name, set()) for group_name in plan.groups)
+    for group_name, group in plan.groups.iteritems():
+        for receiver_names in group.output_stream_names_dict.itervalues():
+            for receiver_name in receiver_names:
+                peers[receiver_name].add(group_name)
+                if credited(group_name, receiver_name):
+                    peers[group_name].add(receiver_name)
+    # Messages carry stream ids in place of stream names, and
+    # values encoded by the codec of each stream.
+    serializer = MessageSerializer(plan.stream_ids, plan.codecs, plan.stream_dtypes)
+    inboxes = dict()
+    for group_name in plan.groups:
+        for j in range(num_replicas(group_name)):
+            inboxes[(group_name, j)] = Inbox(
+                [MAIN_CHANNEL_NAME] + sorted(peers[group_name]), serializer)
+
+    def channels(receiver_name, sender_name):
+        """ The input channels of the processes of receiver_name
+        on which sender_name sends. """
+        return [inboxes[(receiver_name, k)].channel(sender_name)
+                for k in range(num_replicas(receiver_name))]
+
+    # Settings of each process; key: (group name, replica index).
+    output_stream_names_dicts = dict()
+    # key: group name
+    credited_receiver_names = dict()
+    input_rings = dict()
+    credit_queues = dict()
+    sequenced_stream_names = dict()
+    for group_name in plan.groups:
+        for j in range(num_replicas(group_name)):
+            input_rings[(group_name, j)] = dict()
+            credit_queues[(group_name, j)] = dict()
+            sequenced_stream_names[(group_name, j)] = []
+
+    # Wire each stream that leaves a group to the groups
+    # that read it.
+    for group_name, group in plan.groups.iteritems():
+        replicated = group_name in plan.replicas
+        ordered = replicated and plan.replicas[group_name].ordered
+        credited_receiver_names[group_name] = dict(
+            (stream_name, tuple(
+                receiver_name if credited(group_name, receiver_name) else None
+                for receiver_name in receiver_names))
+            for stream_name, receiver_names in
+            group.output_stream_names_dict.iteritems())
+        for j in range(num_replicas(group_name)):
+            output_stream_names_dict = dict()
+            for stream_name, receiver_names in \
+              group.output_stream_names_dict.iteritems():
+                receivers = []
+                for receiver_name in receiver_names:
+                    spec = plan.replicas.get(receiver_name)
+                    if spec is not None:
+                        receivers.append(ReplicaRouter(
+                            channels(receiver_name, group_name), spec.partition,
+                            spec.key, spec.ordered))
+                    elif stream_name in plan.stream_dtypes and not replicated:
+                        ring = SharedRing(ring_capacity,
+                                          plan.stream_dtypes[stream_name],
+                                          doorbell=channels(receiver_name, group_name)[0])
+                        input_rings[(receiver_name, 0)][stream_name] = ring
+                        receivers.append(ring)
+                        continue
                     else:
-                        big_dict[group]['agent_descriptor_dict'][comp].append(None)
-
-    # Iterate on the rest:
-    while groups_left != []:
-        print 'groups left:'
-        pprint(groups_left)
-
-        counter += 1
-        print 'counter:' + str(counter)
-        for group in groups_left:
-            print 'group: ' + group
-
-            input_streams = big_dict[group]['input_stream_names_tuple']
-            print 'input_streams: ', input_streams
-            print 'connecting_streams: ', connecting_streams
-            for in_name in input_streams:
-                if in_name in connecting_streams:
-                    output_dict = {}
-                    # Make the corresponding dict
-                    for out_name in big_dict[group]['output_stream_names_dict'].keys():
-                        big_dict[group]['output_stream_names_dict'][out_name] =\
-                         'queue_' + str(counter)
-
-
-                    # Keep track of this group
-                    connecting_streams += big_dict[group]['output_stream_names_dict'].keys()
-                    if group in groups_left:
-                        groups_left.remove(group)
-
-            # Mark this group with new key/val pair
-            big_dict[group]['queue'] = 'queue_' + str(counter)
-
-    return big_dict
-
-# Take in a big dict of needed data structures to run parallel processing
-# (aka execute "main" in MakeParallelNetwork.py)
-def run_parallel(big_dict):
-    # Create queue variables for each needed queue
-    # (each group needs a new queue as input)
-    queues = {}
-    queue_count = 1
-    for group in big_dict:
-        queues['queue_' + str(queue_count)] = Queue()
-        queue_count += 1
-    print '-------queues---------'
-    pprint(queues)
-
-    # Create processes from big dict
-    processes = {}
-    process_count = 1
-    for group in big_dict:
-        processes['process_' + str(process_count)] =\
-        Process(target= MakeParallelNetworkParallel.make_process,
-                args= (queues[big_dict[group]['queue']],
-                       big_dict[group]['all_stream_names_tuple'],
-                       big_dict[group]['input_stream_names_tuple'],
-                       big_dict[group]['output_stream_names_dict'],
-                       big_dict[group]['agent_descriptor_dict'])
-                       )
-        process_count += 1
-    print '---------all processes--------'
-    pprint(processes)
-
-    for p in processes:
-        print '------process starting------'
-        pprint(processes[p])
-        processes[p].start()
-
-    queues['queue_1'].put(('trigger', 0))
-
+                        receivers.append(channels(receiver_name, group_name)[0])
+                    is_credited = credited(group_name, receiver_name)
+                    if is_credited:
+                        # Credits are granted to the sender, or to the
+                        # replica of the sender named in the message.
+                        sender_channels = channels(group_name, receiver_name)
+                        if not replicated:
+                            sender_channels = sender_channels[0]
+                    for k in range(num_replicas(receiver_name)):
+                        if is_credited:
+                            credit_queues[(receiver_name, k)][stream_name] = \
+                              sender_channels
+                        if ordered:
+                            sequenced_stream_names[(receiver_name, k)].append(
+                                stream_name)
+                output_stream_names_dict[stream_name] = receivers
+            output_stream_names_dicts[(group_name, j)] = output_stream_names_dict
+
+    # The rings are made before any process is started so
+    # that every process inherits them.
+    if metrics_ports is None:
+        metrics_ports = dict()
+    processes = dict()
+    for group_name, group in plan.groups.iteritems():
+        spec = plan.replicas.get(group_name)
+        processes[group_name] = []
+        for j in range(num_replicas(group_name)):
+            metrics_port = metrics_ports.get(group_name)
+            processes[group_name].append(Process(
+                target=make_process,
+                args=(inboxes[(group_name, j)],
+                      group.all_stream_names_tuple,
+                      group.input_stream_names_tuple,
+                      output_stream_names_dicts[(group_name, j)],
+                      group.agent_descriptor_dict,
+                      batch_size, max_delay,
+                      input_rings[(group_name, j)]),
+                kwargs=dict(
+                    group_name=group_name,
+                    credit_window=credit_window,
+                    receiver_names=credited_receiver_names[group_name],
+                    credit_queues=credit_queues[(group_name, j)],
+                    metrics_port=None if metrics_port is None else metrics_port + j,
+                    replica_index=None if spec is None else j,
+                    sequenced=spec is not None and spec.ordered,
+                    sequenced_stream_names=sequenced_stream_names[(group_name, j)],
+                    stream_dtypes=plan.stream_dtypes)))
+    for group_processes in processes.itervalues():
+        for process in group_processes:
+            process.start()
+    queues = dict((group_name, channels(group_name, MAIN_CHANNEL_NAME))
+                  for group_name in plan.groups)
+    for group_name, group in plan.groups.iteritems():
+        if SOURCE_TRIGGER_STREAM_NAME in group.input_stream_names_tuple:
+            for queue in queues[group_name]:
+                queue.put((SOURCE_TRIGGER_STREAM_NAME, [0]))
+    return processes, queues
@@ -36,6 +36,8 @@ if __name__ == '__main__':
 from Agent import *
 from Stream import *
 from Stream import _no_value, _multivalue
+from WindowAggregators import IncrementalWindow
+from numpy.lib.stride_tricks import as_strided
 
 # ASSERTIONS USED IN FILE
 def assert_is_list_of_streams_or_None(x):
@@ -89,6 +91,28 @@ def remove_novalue_and_open_multivalue(l):
             return_list.append(v)
     return return_list
 
+def make_output_streams(inputs, num_outputs):
+    """ Returns a list of num_outputs new streams for the
+    outputs of a vector operator (vector_element, batch_window,
+    tumbling_window), whose f computes arrays, with input
+    streams inputs.
+    If there are input streams and every input stream is a
+    StreamArray of single numbers then the outputs are
+    StreamArrays of the common dtype of the inputs. So a
+    numeric stream stays a numpy array from producer to
+    consumer, and values are not converted to Python lists
+    on the way. The shape of the rows that f computes from
+    multi-column inputs is not known; so those outputs are
+    Streams.
+
+    """
+    if inputs and all(isinstance(s, StreamArray) and
+                      s.num_columns is None and s.dtype.names is None
+                      for s in inputs):
+        dtype = np.result_type(*[s.dtype for s in inputs])
+        return [StreamArray(dtype=dtype) for i in range(num_outputs)]
+    return [Stream() for i in range(num_outputs)]
+
 
 """PART 1 OF MODULE
 Functions that convert operations on non-streaming data structures
@@ -106,6 +130,10 @@ where:
    for window_func, f: list, state -> element, state
    for timed_func, f: timed list, state -> timed element, state
      where a timed element has a time field and a value field.
+   for vector_element_func, f: list of arrays, state -> list of arrays, state
+   for incremental_window_func, f: list of IncrementalWindow, state -> element, state
+   for batch_window_func, f: list of 2-D arrays, state -> list of arrays, state
+   for tumbling_window_func, f: list of 2-D arrays, state -> list of arrays, state
 
 """
 
@@ -138,8 +166,13 @@ def list_agent(f, inputs, outputs, state, call_streams,
     return Agent(inputs, outputs, transition, state, call_streams)
 
 def list_func(f, inputs, num_outputs, state, call_streams,
-              window_size, step_size):
-    outputs = [Stream() for i in range(num_outputs)]
+              window_size, step_size, dtype=None):
+    # f may return any values; the outputs are StreamArrays
+    # only if a dtype is given.
+    if dtype is None:
+        outputs = [Stream() for i in range(num_outputs)]
+    else:
+        outputs = [StreamArray(dtype=dtype) for i in range(num_outputs)]
     list_agent(f, inputs, outputs, state, call_streams,
               window_size, step_size)
     return outputs
@@ -222,6 +255,80 @@ def element_func(f, inputs, num_outputs, state, call_streams,
     return outputs
 
 
+def remove_missing_values(a):
+    """ The vector counterpart of remove_novalue_and_open_multivalue.
+    Returns the unmasked elements of a masked array, and the
+    elements of a floating-point array that are not NaN.
+
+    """
+    if isinstance(a, np.ma.MaskedArray):
+        return a.compressed()
+    a = np.asarray(a)
+    if a.dtype.kind in 'fc':
+        if a.ndim == 1:
+            return a[~np.isnan(a)]
+        # Drop rows that have a NaN.
+        return a[~np.isnan(a).any(axis=tuple(range(1, a.ndim)))]
+    return a
+
+
+def vector_element_agent(f, inputs, outputs, state, call_streams,
+                         window_size, step_size):
+    """
+    Like element_agent, except that f is called once per state
+    transition, not once per element: f gets a list with one
+    numpy array for each input stream, containing the new
+    elements of that stream, and returns a list with one array
+    for each output stream. The j-th element of the output
+    arrays is computed from the j-th elements of the input
+    arrays, so all the input arrays have the same length.
+
+    Instead of _no_value, f marks elements that are not
+    to be appended to output streams by masking them (with a
+    numpy masked array) or, for floating-point outputs, by
+    setting them to NaN.
+
+    """
+    assert_is_list_of_streams_or_None(call_streams)
+    num_outputs = len(outputs)
+
+    def apply_f(arrays, state):
+        if state is None:
+            output_arrays = f(arrays)
+        else:
+            output_arrays, state = f(arrays, state)
+        # A sink returns None.
+        if output_arrays is None:
+            output_arrays = []
+        return [remove_missing_values(a) for a in output_arrays], state
+
+    def transition(in_lists, state):
+        if not in_lists:
+            output_lists, state = apply_f([], state)
+            return (output_lists, state, [])
+
+        # Only the elements that are present in every input
+        # stream are processed.
+        num_elements = min(v.stop - v.start for v in in_lists)
+        if num_elements == 0:
+            return ([[]]*num_outputs, state, [v.start for v in in_lists])
+
+        arrays = [np.asarray(v.list[v.start:v.start+num_elements])
+                  for v in in_lists]
+        output_lists, state = apply_f(arrays, state)
+        return (output_lists, state, [v.start+num_elements for v in in_lists])
+
+    # Create agent
+    return Agent(inputs, outputs, transition, state, call_streams)
+
+def vector_element_func(f, inputs, num_outputs, state, call_streams,
+                        window_size, step_size):
+    outputs = make_output_streams(inputs, num_outputs)
+    vector_element_agent(f, inputs, outputs, state, call_streams,
+                         window_size, step_size)
+    return outputs
+
+
 ####################################################
 # OPERATIONS ON WINDOWS
 ####################################################
@@ -292,6 +399,246 @@ def window_func(f, inputs, num_outputs, state, call_streams,
     return outputs
 
 
+def window_views(in_list, num_steps, window_size, step_size):
+    """ Return a read-only array of shape (num_steps, window_size)
+    (or (num_steps, window_size, num_columns) for a multi-column
+    stream) whose i-th row is the i-th window of in_list. For a
+    StreamArray the rows are views of recent; no window is copied.
+
+    """
+    length = (num_steps - 1)*step_size + window_size
+    a = np.asarray(in_list.list[in_list.start : in_list.start + length])
+    return as_strided(
+        a, shape=(num_steps, window_size) + a.shape[1:],
+        strides=(a.strides[0]*step_size,) + a.strides, writeable=False)
+
+
+def batch_window_agent(f, inputs, outputs, state, call_streams,
+                       window_size, step_size):
+    """
+    Like window_agent, except that f is called once per state
+    transition for all the windows of the transition, not once
+    per window: f gets a list with an array of windows for each
+    input stream (see window_views), and returns a list with an
+    array for each output stream, whose i-th element is the
+    output for the i-th window; e.g. for a moving average f
+    returns [windows[0].mean(axis=1)].
+    As in vector_element_agent, masked or NaN outputs are not
+    appended to the output streams.
+
+    """
+    num_outputs = len(outputs)
+
+    def transition(in_lists, state=None):
+        smallest_list_length = min(v.stop - v.start for v in in_lists)
+        if window_size > smallest_list_length:
+            return ([ [] for _ in range(num_outputs) ], state,
+                    [in_list.start for in_list in in_lists])
+
+        num_steps = 1 + (smallest_list_length - window_size)/step_size
+        windows = [window_views(in_list, num_steps, window_size, step_size)
+                   for in_list in in_lists]
+        if state is None:
+            output_arrays = f(windows)
+        else:
+            output_arrays, state = f(windows, state)
+        if output_arrays is None:
+            output_arrays = []
+        output_lists = [remove_missing_values(a) for a in output_arrays]
+
+        in_lists_start_values = [in_list.start + num_steps*step_size for in_list in in_lists]
+        return (output_lists, state, in_lists_start_values)
+
+    return Agent(inputs, outputs, transition, state, call_streams)
+
+def batch_window_func(f, inputs, num_outputs, state, call_streams,
+                      window_size, step_size):
+    outputs = make_output_streams(inputs, num_outputs)
+    batch_window_agent(f, inputs, outputs, state, call_streams,
+                       window_size, step_size)
+    return outputs
+
+
+class _TumblingState(object):
+    """
+    The state of a tumbling window agent.
+
+    Attributes
+    ----------
+    tails: list
+          tails[j] is the array of values of the j-th input
+          stream that have been read but are not yet in a
+          window, or None.
+    state: object
+          The state of f (None if f has no state).
+
+    """
+    def __init__(self, tails, state):
+        self.tails = tails
+        self.state = state
+
+    def __repr__(self):
+        return '_TumblingState({0!r}, {1!r})'.format(self.tails, self.state)
+
+
+def tumbling_window_agent(f, inputs, outputs, state, call_streams,
+                          window_size, step_size, flush=False):
+    """
+    Like batch_window_agent for windows that do not overlap,
+    i.e., step_size is window_size: the new values of each input
+    stream are reshaped, in one operation, into an array of
+    shape (num_windows, window_size), and f is called once with
+    the list of these arrays. The agent reads all the new values
+    of its input streams; values that do not fill a window are
+    kept in the state of the agent, a _TumblingState (not by the
+    input streams), and are put in front of the next values. So
+    a checkpoint of the network (see Checkpoint.py) saves them.
+
+    If flush is True, then, when all the input streams are
+    closed, f is called once more with the partial windows,
+    i.e., arrays of shape (1, k) where 0 < k < window_size is
+    the number of values left over in each input stream. f is
+    not called with empty windows: if some input stream has no
+    values left over, there is no flush and the values left
+    over in the other input streams are discarded.
+
+    """
+    if step_size is not None and step_size != window_size:
+        raise ValueError(
+            'tumbling windows need step_size equal to window_size, not {0} and {1}'.\
+            format(step_size, window_size))
+    num_outputs = len(outputs)
+
+    def apply_f(windows, state):
+        if state is None:
+            output_arrays = f(windows)
+        else:
+            output_arrays, state = f(windows, state)
+        if output_arrays is None:
+            output_arrays = []
+        return [remove_missing_values(a) for a in output_arrays], state
+
+    def transition(in_lists, tumbling_state):
+        tails, state = tumbling_state.tails, tumbling_state.state
+        values = []
+        for j, in_list in enumerate(in_lists):
+            new_values = np.asarray(in_list.list[in_list.start:in_list.stop])
+            if tails[j] is None:
+                values.append(new_values)
+            else:
+                values.append(np.concatenate((tails[j], new_values)))
+        num_windows = min(len(v) for v in values) // window_size
+        output_lists = [ [] for _ in range(num_outputs) ]
+
+        if num_windows > 0:
+            length = num_windows*window_size
+            windows = [v[:length].reshape((num_windows, window_size) + v.shape[1:])
+                       for v in values]
+            output_lists, state = apply_f(windows, state)
+        else:
+            length = 0
+        # Copy the tails so that they do not keep recent alive.
+        for j, v in enumerate(values):
+            tails[j] = np.array(v[length:]) if len(v) > length else None
+
+        if flush and all(s.closed for s in inputs) and \
+          all(tail is not None for tail in tails):
+            windows = [tail[np.newaxis] for tail in tails]
+            for j in range(len(tails)): tails[j] = None
+            flushed_lists, state = apply_f(windows, state)
+            if num_windows > 0:
+                output_lists = [np.concatenate((a, b)) for a, b in
+                                zip(output_lists, flushed_lists)]
+            else:
+                output_lists = flushed_lists
+
+        tumbling_state.state = state
+        return (output_lists, tumbling_state, [in_list.stop for in_list in in_lists])
+
+    agent = Agent(inputs, outputs, transition,
+                  _TumblingState([None for s in inputs], state), call_streams)
+    if flush:
+        for s in inputs:
+            s.call_on_close(agent)
+    return agent
+
+def tumbling_window_func(f, inputs, num_outputs, state, call_streams,
+                         window_size, step_size, flush=False):
+    outputs = make_output_streams(inputs, num_outputs)
+    tumbling_window_agent(f, inputs, outputs, state, call_streams,
+                          window_size, step_size, flush)
+    return outputs
+
+
+def incremental_window_agent(f, inputs, outputs, state, call_streams,
+                             window_size, step_size):
+    """
+    Like window_agent, except that f gets a list with an
+    IncrementalWindow (see WindowAggregators.py) for each input
+    stream instead of a list with a new window for each input
+    stream. The same IncrementalWindow objects are passed at
+    every step: at each step the elements that enter the window
+    are pushed and the elements that leave it are evicted, so
+    that f can use the aggregates of the window, e.g.
+    windows[0].mean(), in O(1) amortized time per step.
+
+    """
+    num_outputs = len(outputs)
+    windows = [IncrementalWindow(window_size) for s in inputs]
+    # num_pushed_ahead[j] is the index, relative to the start of
+    # the j-th input stream, of the next element to be pushed
+    # into windows[j]. It is negative if the elements before the
+    # start are to be skipped (step_size > window_size).
+    num_pushed_ahead = [0 for s in inputs]
+
+    def transition(in_lists, state=None):
+        range_out = range((num_outputs))
+        range_in = range(len(in_lists))
+        output_lists = [ [] for _ in range_out ]
+
+        smallest_list_length = min(v.stop - v.start for v in in_lists)
+        if window_size > smallest_list_length:
+            return (output_lists, state, [in_list.start for in_list in in_lists])
+
+        num_steps = 1 + (smallest_list_length - window_size)/step_size
+        for i in range(num_steps):
+            for j in range_in:
+                window = windows[j]
+                window_start = i*step_size
+                if num_pushed_ahead[j] < window_start:
+                    # The window has moved past all its elements.
+                    window.clear()
+                    num_pushed_ahead[j] = window_start
+                lst = in_lists[j].list
+                list_start = in_lists[j].start
+                for k in range(num_pushed_ahead[j], window_start + window_size):
+                    window.push(lst[list_start + k])
+                num_pushed_ahead[j] = window_start + window_size
+                while len(window) > window_size:
+                    window.evict()
+            if state is None:
+                increments = f(windows)
+            else:
+                increments, state = f(windows, state)
+            for k in range_out:
+                output_lists[k].extend(
+                    remove_novalue_and_open_multivalue([increments[k]]))
+
+        for j in range_in:
+            num_pushed_ahead[j] -= num_steps*step_size
+        in_lists_start_values = [in_list.start + num_steps*step_size for in_list in in_lists]
+        return (output_lists, state, in_lists_start_values)
+
+    return Agent(inputs, outputs, transition, state, call_streams)
+
+def incremental_window_func(f, inputs, num_outputs, state, call_streams,
+                            window_size, step_size):
+    outputs = [Stream() for i in range(num_outputs)]
+    incremental_window_agent(f, inputs, outputs, state, call_streams,
+                             window_size, step_size)
+    return outputs
+
+
 ####################################################
 # OPERATIONS ON TIMED WINDOWS
 ####################################################
@@ -334,6 +681,78 @@ def list_index_for_timestamp(in_list, start_index, timestamp):
     return -1
 
 
+def timed_windows(times_list, window_start_time, window_size, step_size):
+    """ A helper function for timed operators on TimedColumns.
+    Computes all the complete time windows of a batch at once
+    by binary search on the arrays of times, with the same
+    result as the loop in timed_agent over list_index_for_timestamp.
+
+    Parameters
+    ----------
+    times_list: list of np.ndarray
+        times_list[j] is the (nondecreasing) array of times of
+        the new elements of the j-th input stream, i.e., of
+        in_list.list[in_list.start:in_list.stop].
+    window_start_time, window_size, step_size: numbers
+
+    Returns
+    -------
+    (window_end_times, start_indexes_list, end_indexes_list,
+     next_window_start_time, next_start_indexes)
+        Window k of input j is the slice
+            start_indexes_list[j][k] : end_indexes_list[j][k]
+        of the batch, and its output time is window_end_times[k].
+        next_window_start_time and next_start_indexes (indexes
+        into the batches) are the state after the windows.
+
+    """
+    num_in = len(times_list)
+    no_windows = (np.zeros(0), [np.zeros(0, dtype=int)]*num_in,
+                  [np.zeros(0, dtype=int)]*num_in,
+                  window_start_time, [0]*num_in)
+    if any(len(times) == 0 for times in times_list):
+        return no_windows
+    last_time = min(times[-1] for times in times_list)
+    first_end_time = window_start_time + window_size
+    if last_time < first_end_time:
+        return no_windows
+    # An upper bound on the number of windows; the masks
+    # below give the exact number.
+    bound = int((last_time - first_end_time) / step_size) + 2
+    ks = np.arange(bound)
+    window_start_times = window_start_time + step_size*ks
+    window_end_times = window_start_times + window_size
+    # Window k is computed if it ends at or before last_time
+    # and, for k > 0, the window before it was followed by a
+    # window start at or before last_time.
+    num_windows = int(np.count_nonzero(window_end_times <= last_time))
+    num_starts = int(np.count_nonzero(window_start_times[1:] <= last_time))
+    num_windows = min(num_windows, num_starts + 1)
+    window_end_times = window_end_times[:num_windows]
+
+    start_indexes_list = []
+    end_indexes_list = []
+    next_start_indexes = []
+    for times in times_list:
+        starts = np.searchsorted(times, window_start_times[:num_windows+1], 'left')
+        # The first window starts at the first new element.
+        starts[0] = 0
+        ends = np.maximum(
+            starts[:num_windows],
+            np.searchsorted(times, window_end_times, 'left'))
+        start_indexes_list.append(starts[:num_windows])
+        end_indexes_list.append(ends)
+        # If the start of the window after the last window is
+        # in the batch then the next transition starts there,
+        # otherwise it starts at the start of the last window.
+        next_start_indexes.append(
+            int(starts[num_windows]) if num_windows <= num_starts
+            else int(starts[num_windows-1]))
+    next_window_start_time = window_start_time + step_size*num_windows
+    return (window_end_times, start_indexes_list, end_indexes_list,
+            next_window_start_time, next_start_indexes)
+
+
 def timed_agent(f, inputs, outputs, state, call_streams,
                window_size, step_size):
     # inputs is a list of lists of TimeAndValue pairs.
@@ -343,6 +762,33 @@ def timed_agent(f, inputs, outputs, state, call_streams,
     window_start_time = 0
     combined_state = (window_start_time, state)
 
+    def columns_transition(in_lists, combined_state):
+        # Fast path for inputs that are StreamTimedArrays:
+        # find the boundaries of all complete windows of the
+        # batch by binary search, then call f on each window.
+        window_start_time, state = combined_state
+        output_lists = [ [] for _ in range_out]
+        batches = [v.list[v.start:v.stop] for v in in_lists]
+        (window_end_times, start_indexes_list, end_indexes_list,
+         window_start_time, next_start_indexes) = timed_windows(
+             [batch.time for batch in batches],
+             window_start_time, window_size, step_size)
+        for k in range(len(window_end_times)):
+            # windows[j] is TimedColumns; it can be used like
+            # a list of TimeAndValue objects.
+            windows = [batches[j][start_indexes_list[j][k]:end_indexes_list[j][k]]
+                       for j in range_in]
+            if state is None:
+                increments = f(windows)
+            else:
+                increments, state = f(windows, state)
+            for k_out in range_out:
+                output_lists[k_out].append(
+                    TimeAndValue(window_end_times[k], increments[k_out]))
+        combined_state = (window_start_time, state)
+        return (output_lists, combined_state,
+                [in_lists[j].start + next_start_indexes[j] for j in range_in])
+
     def transition(in_lists, combined_state):
         window_start_time, state = combined_state
         output_lists = [ [] for _ in range_out]
@@ -405,12 +851,19 @@ def timed_agent(f, inputs, outputs, state, call_streams,
         return (output_lists, combined_state, window_start_indexes)
     # Create agent
     combined_state = (window_start_time, state)
-    Agent(inputs, outputs, transition, combined_state)
+    if inputs and all(isinstance(s, StreamTimedArray) for s in inputs):
+        return Agent(inputs, outputs, columns_transition, combined_state)
+    return Agent(inputs, outputs, transition, combined_state)
 
 
 def timed_func(f, inputs, num_outputs, state, call_streams,
                 window_size, step_size):
-    outputs = [Stream() for i in range(num_outputs)]
+    # Keep timed outputs of columnar inputs columnar, so that
+    # downstream timed agents can also use the fast path.
+    if inputs and all(isinstance(s, StreamTimedArray) for s in inputs):
+        outputs = [StreamTimedArray(dtype=object) for i in range(num_outputs)]
+    else:
+        outputs = [Stream() for i in range(num_outputs)]
     timed_agent(f, inputs, outputs, state, call_streams,
                   window_size, step_size)
     return outputs
@@ -503,9 +956,13 @@ f, in_streams, state, call_streams, window_size, step_size)
 """
 
 ## Changed 'is' to '==' in h() and h_agent()
-def h(f_type, *args):
+def h(f_type, *args, **kwargs):
+    # kwargs: dtype of the outputs; only list functions have one.
     if f_type == 'list':
-        return list_func(*args)
+        return list_func(*args, **kwargs)
+    elif kwargs.get('dtype') is not None:
+        raise ValueError(
+            "Expected dtype only for f_type 'list', not '{0}'".format(f_type))
     elif f_type == 'element':
         return element_func(*args)
     elif f_type == 'window':
@@ -514,6 +971,16 @@ def h(f_type, *args):
         return timed_func(*args)
     elif f_type == 'asynch_element':
         return asynch_element_func(*args)
+    elif f_type == 'vector_element':
+        return vector_element_func(*args)
+    elif f_type == 'incremental_window':
+        return incremental_window_func(*args)
+    elif f_type == 'batch_window':
+        return batch_window_func(*args)
+    elif f_type == 'tumbling_window':
+        return tumbling_window_func(*args)
+    elif f_type == 'tumbling_window_flush':
+        return tumbling_window_func(*args, flush=True)
     else:
         return 'no match'
 
@@ -529,12 +996,22 @@ def h_agent(f_type, *args):
         return timed_agent(*args)
     elif f_type == 'asynch_element':
         return asynch_element_agent(*args)
+    elif f_type == 'vector_element':
+        return vector_element_agent(*args)
+    elif f_type == 'incremental_window':
+        return incremental_window_agent(*args)
+    elif f_type == 'batch_window':
+        return batch_window_agent(*args)
+    elif f_type == 'tumbling_window':
+        return tumbling_window_agent(*args)
+    elif f_type == 'tumbling_window_flush':
+        return tumbling_window_agent(*args, flush=True)
     else:
         return 'no match'
 
 
 def many_to_many(f_type, f, in_streams, num_outputs, state,
-                 call_streams, window_size, step_size):
+                 call_streams, window_size, step_size, dtype=None):
     def g(x, state=None):
         if state is None: return f(x)
         else:
@@ -542,7 +1019,7 @@ def many_to_many(f_type, f, in_streams, num_outputs, state,
             return (output, new_state)
 
     out_streams = h(f_type, g, in_streams, num_outputs, state,
-                    call_streams, window_size, step_size)
+                    call_streams, window_size, step_size, dtype=dtype)
     return out_streams
 
 def many_to_many_agent(f_type, f, f_args, in_streams, out_streams, state,
@@ -563,7 +1040,8 @@ def many_to_many_agent(f_type, f, f_args, in_streams, out_streams, state,
                    state, call_streams, window_size, step_size)
 
 
-def merge(f_type, f, in_streams, state, call_streams, window_size, step_size):
+def merge(f_type, f, in_streams, state, call_streams, window_size, step_size,
+          dtype=None):
     def g(x, state=None):
         if state is None: return [f(x)]
         else:
@@ -571,7 +1049,7 @@ def merge(f_type, f, in_streams, state, call_streams, window_size, step_size):
             return ([output], new_state)
 
     out_streams = h(f_type, g, in_streams, 1, state, call_streams,
-                    window_size, step_size)
+                    window_size, step_size, dtype=dtype)
     return out_streams[0]
 
 def merge_agent(f_type, f, f_args, in_streams, out_stream,
@@ -594,7 +1072,7 @@ def merge_agent(f_type, f, f_args, in_streams, out_stream,
 
     
 def split(f_type, f, in_stream, num_outputs,
-          state, call_streams, window_size, step_size):
+          state, call_streams, window_size, step_size, dtype=None):
     def g(x, state=None):
         if state is None: return f(x[0])
         else:
@@ -603,7 +1081,7 @@ def split(f_type, f, in_stream, num_outputs,
             return f(x[0], state)
 
     out_streams = h(f_type, g, [in_stream], num_outputs, state, call_streams,
-                    window_size, step_size)
+                    window_size, step_size, dtype=dtype)
     return out_streams
 
 def split_agent(f_type, f, f_args, in_stream, out_streams,
@@ -623,7 +1101,8 @@ def split_agent(f_type, f, f_args, in_stream, out_streams,
             state, call_streams, window_size, step_size)
 
 
-def op(f_type, f, in_stream, state, call_streams, window_size, step_size):
+def op(f_type, f, in_stream, state, call_streams, window_size, step_size,
+       dtype=None):
     def g(x, state=None):
         if state is None:
             return [f(x[0])]
@@ -632,7 +1111,7 @@ def op(f_type, f, in_stream, state, call_streams, window_size, step_size):
             return ([output], new_state)
 
     out_streams = h(f_type, g, [in_stream], 1, state, call_streams,
-                    window_size, step_size)
+                    window_size, step_size, dtype=dtype)
     return out_streams[0]
 
 def op_agent(f_type, f, f_args, in_stream, out_stream,
@@ -655,14 +1134,14 @@ def op_agent(f_type, f, f_args, in_stream, out_stream,
 
 
 def single_output_source(f_type, f, num_outputs, state, call_streams,
-                         window_size, step_size):
+                         window_size, step_size, dtype=None):
 
     def g(x, state=None):
         if state is None: return [f()]
         else: return [f(state)]
 
     out_streams = h(f_type, g, call_streams, num_outputs, state, call_streams,
-                    window_size, step_size)
+                    window_size, step_size, dtype=dtype)
     return out_streams[0]
 
 def single_output_source_agent(
@@ -685,7 +1164,7 @@ def single_output_source_agent(
         state, call_streams, window_size, step_size)
 
 def many_outputs_source(f_type, f, num_outputs, state, call_streams,
-                        window_size, step_size):
+                        window_size, step_size, dtype=None):
     def g(x, state=None):
         if state is None: return f()
         else:
@@ -693,7 +1172,7 @@ def many_outputs_source(f_type, f, num_outputs, state, call_streams,
             return f(state)
 
     out_streams = h(f_type, g, call_streams, num_outputs, state, call_streams,
-                    window_size, step_size)
+                    window_size, step_size, dtype=dtype)
     return out_streams
 
 def many_outputs_source_agent(f_type, f, f_args, outputs, state, call_streams,
@@ -742,13 +1221,15 @@ list of output streams.
 
 
 def stream_func(inputs, f_type, f, num_outputs, state=None, call_streams=None,
-                window_size=None, step_size=None):
+                window_size=None, step_size=None, dtype=None):
     """ Provides a common signature for converting functions f on standard
     Python data structures to streams.
 
     Parameters
     ----------
-    f_type : {'element', 'list', 'window', 'timed', 'asynch_element'}
+    f_type : {'element', 'list', 'window', 'timed', 'asynch_element',
+              'vector_element', 'incremental_window', 'batch_window',
+              'tumbling_window', 'tumbling_window_flush'}
        f_type identifies the type of function f where f is the next parameter.
     f : function
     inputs : {Stream, list of Streams}
@@ -769,13 +1250,20 @@ def stream_func(inputs, f_type, f, num_outputs, state=None, call_streams=None,
        This function is called when, and only when any stream in
        call_streams is modified.
     window_size : None or int
-       window_size must be a positive integer if f_type is 'window'
-       or 'timed'. window_size is the size of the moving window on
-       which the function operates.
+       window_size must be a positive integer if f_type is 'window',
+       'incremental_window', 'batch_window', 'tumbling_window',
+       'tumbling_window_flush' or 'timed'. window_size is the size of
+       the moving window on which the function operates.
     step_size : None or int
-       step_size must be a positive integer if f_type is 'window'
-       or 'timed'. step_size is the number of steps by which the
-       moving window moves on each execution of the function.
+       step_size must be a positive integer if f_type is 'window',
+       'incremental_window', 'batch_window' or 'timed'. step_size is the number of
+       steps by which the moving window moves on each execution of
+       the function. For tumbling windows step_size is None or
+       window_size.
+    dtype : None or numpy dtype
+       Used only if f_type is 'list'. If dtype is not None, the output
+       streams are StreamArrays of this dtype, and the arrays returned
+       by f are appended to them without conversion to lists.
 
     Returns
     -------
@@ -824,12 +1312,12 @@ def stream_func(inputs, f_type, f, num_outputs, state=None, call_streams=None,
             # No inputs. Single output stream.
             return single_output_source(f_type, f, num_outputs,
                                         state, call_streams,
-                                        window_size, step_size)
+                                        window_size, step_size, dtype)
         else:
             # No inputs. List of multiple output streams.
             return many_outputs_source(f_type, f, num_outputs,
                                        state, call_streams,
-                                       window_size, step_size)
+                                       window_size, step_size, dtype)
 
     elif isinstance(inputs, Stream) or isinstance(inputs, StreamArray):
         in_stream = inputs
@@ -839,11 +1327,12 @@ def stream_func(inputs, f_type, f, num_outputs, state=None, call_streams=None,
                         window_size, step_size)
         elif num_outputs == 1:
             # Single input stream. Single output stream.
-            return op(f_type, f, in_stream, state, call_streams, window_size, step_size)
+            return op(f_type, f, in_stream, state, call_streams, window_size, step_size,
+                      dtype)
         else:
             # Single input stream. List of multiple output streams.
             return split(f_type, f, in_stream, num_outputs, state, call_streams,
-                         window_size, step_size)
+                         window_size, step_size, dtype)
 
     else:
         # Multiple input streams
@@ -852,10 +1341,12 @@ def stream_func(inputs, f_type, f, num_outputs, state=None, call_streams=None,
             raise TypeError('A sink has exactly one input stream.')
         elif num_outputs == 1:
             # Multiple input streams, single output stream
-            return merge(f_type, f, inputs, state, call_streams, window_size, step_size)
+            return merge(f_type, f, inputs, state, call_streams, window_size, step_size,
+                         dtype)
         else:
             # Multiple input and output streams
-            return many_to_many(f_type, f, inputs, num_outputs, state, call_streams, window_size, step_size)
+            return many_to_many(f_type, f, inputs, num_outputs, state, call_streams,
+                                window_size, step_size, dtype)
 
 
 
@@ -867,7 +1358,9 @@ def stream_agent(inputs, outputs, f_type, f, f_args,
 
     Parameters
     ----------
-    f_type : {'element', 'list', 'window', 'timed', 'asynch_element'}
+    f_type : {'element', 'list', 'window', 'timed', 'asynch_element',
+              'vector_element', 'incremental_window', 'batch_window',
+              'tumbling_window', 'tumbling_window_flush'}
        f_type identifies the type of function f where f is the next parameter.
     f : function
     inputs : {Stream, list of Streams}
@@ -876,6 +1369,8 @@ def stream_agent(inputs, outputs, f_type, f, f_args,
           a single input Stream, inputs is a single Stream
           multiple input Streams, inputs is a list of Streams.
     outputs : list of Streams
+       Arrays returned by f are appended without conversion to
+       lists to outputs that are StreamArrays.
     state : object
        state is None or is an arbitrary object. The state captures
        all the information necessary to continue processing the input
@@ -886,13 +1381,16 @@ def stream_agent(inputs, outputs, f_type, f, f_args,
        This function is called when, and only when any stream in
        call_streams is modified.
     window_size : None or int
-       window_size must be a positive integer if f_type is 'window'
-       or 'timed'. window_size is the size of the moving window on
-       which the function operates.
+       window_size must be a positive integer if f_type is 'window',
+       'incremental_window', 'batch_window', 'tumbling_window',
+       'tumbling_window_flush' or 'timed'. window_size is the size of
+       the moving window on which the function operates.
     step_size : None or int
-       step_size must be a positive integer if f_type is 'window'
-       or 'timed'. step_size is the number of steps by which the
-       moving window moves on each execution of the function.
+       step_size must be a positive integer if f_type is 'window',
+       'incremental_window', 'batch_window' or 'timed'. step_size is the number of
+       steps by which the moving window moves on each execution of
+       the function. For tumbling windows step_size is None or
+       window_size.
 
     Returns
     -------
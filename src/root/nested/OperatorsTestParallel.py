@@ -36,6 +36,10 @@ if __name__ == '__main__':
 from Agent import *
 from Stream import *
 from Stream import _no_value, _multivalue
+from Operators import vector_element_agent, vector_element_func
+from Operators import incremental_window_agent, incremental_window_func
+from Operators import batch_window_agent, batch_window_func
+from Operators import tumbling_window_agent, tumbling_window_func
 
 # ASSERTIONS USED IN FILE
 def assert_is_list_of_streams_or_None(x):
@@ -533,6 +537,16 @@ def h(f_type, *args):
         return timed_func(*args)
     elif f_type is 'asynch_element':
         return asynch_element_func(*args)
+    elif f_type == 'vector_element':
+        return vector_element_func(*args)
+    elif f_type == 'incremental_window':
+        return incremental_window_func(*args)
+    elif f_type == 'batch_window':
+        return batch_window_func(*args)
+    elif f_type == 'tumbling_window':
+        return tumbling_window_func(*args)
+    elif f_type == 'tumbling_window_flush':
+        return tumbling_window_func(*args, flush=True)
     else:
         return 'no match'
 
@@ -548,6 +562,16 @@ def h_agent(f_type, *args):
         return timed_agent(*args)
     elif f_type is 'asynch_element':
         return asynch_element_agent(*args)
+    elif f_type == 'vector_element':
+        return vector_element_agent(*args)
+    elif f_type == 'incremental_window':
+        return incremental_window_agent(*args)
+    elif f_type == 'batch_window':
+        return batch_window_agent(*args)
+    elif f_type == 'tumbling_window':
+        return tumbling_window_agent(*args)
+    elif f_type == 'tumbling_window_flush':
+        return tumbling_window_agent(*args, flush=True)
     else:
         return 'no match'
 
@@ -0,0 +1,135 @@
+""" This module contains the RingBuffer class, a storage
+backend for the list recent of a Stream.
+
+A RingBuffer wraps a fixed-size list or numpy array (the
+backing store created by Stream._create_recent) and presents
+it with the same indexing interface as the list recent. The
+difference is that dropping elements from the front of a
+RingBuffer does not copy the remaining elements; it only moves
+the index of the first element. So once a stream is warm,
+appending values and discarding values that no reader needs
+require no allocation.
+
+"""
+
+import numpy as np
+
+
+def _concatenate(first, second):
+    """ Join two slices of a backing store. Lists are
+    joined with +, numpy arrays with np.concatenate, and
+    any other backing store must implement +.
+
+    """
+    if isinstance(first, np.ndarray):
+        return np.concatenate((first, second))
+    return first + second
+
+
+class RingBuffer(object):
+    """
+    A circular buffer with a list-like interface.
+
+    Logical index i of the buffer is stored at physical
+    index (head + i) % capacity of the backing store. A
+    slice of the buffer that does not wrap around the end
+    of the backing store is returned as a slice of the
+    backing store; so for numpy backing stores the slice is
+    a view and no values are copied. A slice that wraps
+    around is returned as the concatenation of its two
+    parts.
+
+    Parameters
+    ----------
+    backing: list or np.ndarray
+          The backing store. Its length is the capacity
+          of the buffer.
+
+    Attributes
+    ----------
+    _data: list or np.ndarray
+          The backing store.
+    _head: nonnegative integer
+          The physical index of logical index 0.
+
+    """
+    def __init__(self, backing):
+        self._data = backing
+        self._head = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _read(self, start, stop):
+        """ Return logical elements start, .., stop-1. """
+        if stop <= start:
+            return self._data[0:0]
+        capacity = len(self._data)
+        first = (self._head + start) % capacity
+        last = first + stop - start
+        if last <= capacity:
+            return self._data[first:last]
+        return _concatenate(self._data[first:capacity],
+                            self._data[0:last - capacity])
+
+    def _write(self, start, values):
+        """ Write values into logical elements start, .. """
+        capacity = len(self._data)
+        num_values = len(values)
+        if start + num_values > capacity:
+            raise IndexError('RingBuffer write past capacity: {0} > {1}'.\
+                             format(start + num_values, capacity))
+        first = (self._head + start) % capacity
+        last = first + num_values
+        if last <= capacity:
+            self._data[first:last] = values
+        else:
+            split = capacity - first
+            self._data[first:capacity] = values[:split]
+            self._data[0:last - capacity] = values[split:]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._data))
+            if step != 1:
+                return self._read(0, len(self._data))[index]
+            return self._read(start, stop)
+        if index < 0:
+            index += len(self._data)
+        if not 0 <= index < len(self._data):
+            raise IndexError('RingBuffer index out of range')
+        return self._data[(self._head + index) % len(self._data)]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._data))
+            if step != 1:
+                raise ValueError('RingBuffer does not support extended slices')
+            if stop - start != len(value):
+                raise ValueError(
+                    'RingBuffer cannot change size: slice of length {0}, value of length {1}'.\
+                    format(stop - start, len(value)))
+            self._write(start, value)
+            return
+        if index < 0:
+            index += len(self._data)
+        if not 0 <= index < len(self._data):
+            raise IndexError('RingBuffer index out of range')
+        self._data[(self._head + index) % len(self._data)] = value
+
+    def advance(self, n):
+        """
+        Drop the first n logical elements. Logical index
+        n becomes logical index 0. This is O(1): no element
+        is copied.
+        """
+        self._head = (self._head + n) % len(self._data)
+
+    def grow(self, backing, n):
+        """
+        Replace the backing store by a larger one, keeping
+        the first n logical elements.
+        """
+        backing[:n] = self._read(0, n)
+        self._data = backing
+        self._head = 0
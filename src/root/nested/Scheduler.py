@@ -0,0 +1,154 @@
+""" This module contains the Scheduler class which
+runs the state transitions of agents from a ready-queue.
+
+Without a scheduler, a stream calls next() of each of its
+subscribers as soon as the stream is modified; an agent that
+extends its output streams in next() then calls the agents
+downstream, and so on. A network therefore runs as one deep
+call stack, and an agent with several input streams executes
+a transition for every write to any of them.
+
+When a scheduler is installed in a stream (stream.scheduler),
+the stream only marks its subscribers as ready. The scheduler
+runs ready agents one at a time from its run loop. An agent
+that is already in the ready-queue is not added again, so an
+agent runs once for all the writes to its call streams that
+happen before its turn comes.
+
+"""
+
+from collections import deque
+import heapq
+
+
+class Scheduler(object):
+    """
+    A ready-queue of agents and a run loop that drains it.
+
+    Parameters
+    ----------
+    policy: {'fifo', 'topological'} (optional)
+          'fifo': agents run in the order in which they
+          became ready.
+          'topological': the ready agent with the smallest
+          rank runs first. Ranks are set by set_rank(), usually
+          from topological_ranks(); so upstream agents run
+          before downstream agents, and an agent downstream of
+          a fan-in runs after all its producers. Agents without
+          a rank run after agents with a rank.
+
+    Attributes
+    ----------
+    rank: dict
+          key = agent
+          value = rank of the agent (int)
+    running: boolean
+          True if and only if the run loop is executing.
+    _ready: deque of agents, or heap of (rank, count, agent)
+          The ready-queue.
+    _ready_set: set
+          The agents in the ready-queue.
+
+    """
+    def __init__(self, policy='fifo'):
+        if policy not in ('fifo', 'topological'):
+            raise ValueError(
+                "Expected policy to be 'fifo' or 'topological', not '{0}'".\
+                format(policy))
+        self.policy = policy
+        self.rank = dict()
+        self.running = False
+        self._ready = deque() if policy == 'fifo' else []
+        self._ready_set = set()
+        self._count = 0
+
+    def set_rank(self, agent, rank):
+        self.rank[agent] = rank
+
+    def schedule(self, agent):
+        """
+        Mark agent as ready. Does nothing if agent is
+        already in the ready-queue.
+        """
+        if agent in self._ready_set:
+            return
+        self._ready_set.add(agent)
+        if self.policy == 'fifo':
+            self._ready.append(agent)
+        else:
+            self._count += 1
+            heapq.heappush(self._ready,
+                           (self.rank.get(agent, float('inf')),
+                            self._count, agent))
+
+    def run(self):
+        """
+        Execute ready agents until the ready-queue is empty.
+        Agents that become ready while the loop runs are
+        executed by the same loop; so a call to run() from
+        within a state transition returns immediately.
+        """
+        if self.running:
+            return
+        self.running = True
+        try:
+            while self._ready:
+                if self.policy == 'fifo':
+                    agent = self._ready.popleft()
+                else:
+                    agent = heapq.heappop(self._ready)[2]
+                self._ready_set.discard(agent)
+                agent.next()
+        finally:
+            self.running = False
+
+
+def topological_ranks(agent_descriptor_dict):
+    """
+    Rank the agents of a network in topological order.
+
+    Parameters
+    ----------
+    agent_descriptor_dict: dict
+          The description of the network used by make_network.
+          value[0] is the list of names of input streams and
+          value[1] the list of names of output streams.
+
+    Returns
+    -------
+    ranks: dict
+          key = agent name
+          value = rank. If agent x writes a stream that agent
+          y reads then x has a smaller rank than y, unless x
+          and y are on a cycle. Agents on cycles are ranked
+          after all the other agents.
+
+    """
+    stream_to_reader_list = dict()
+    for agent_name, descriptor in agent_descriptor_dict.iteritems():
+        for stream_name in descriptor[0]:
+            stream_to_reader_list.setdefault(stream_name, []).append(agent_name)
+
+    num_producers = dict()
+    for agent_name in agent_descriptor_dict:
+        num_producers.setdefault(agent_name, 0)
+        for stream_name in agent_descriptor_dict[agent_name][1]:
+            for reader_name in stream_to_reader_list.get(stream_name, []):
+                num_producers[reader_name] = num_producers.get(reader_name, 0) + 1
+
+    ranks = dict()
+    ready = deque(sorted(
+        agent_name for agent_name, n in num_producers.iteritems() if n == 0))
+    while ready:
+        agent_name = ready.popleft()
+        ranks[agent_name] = len(ranks)
+        for stream_name in agent_descriptor_dict[agent_name][1]:
+            for reader_name in stream_to_reader_list.get(stream_name, []):
+                num_producers[reader_name] -= 1
+                if num_producers[reader_name] == 0:
+                    ready.append(reader_name)
+
+    for agent_name in sorted(agent_descriptor_dict):
+        if agent_name not in ranks:
+            ranks[agent_name] = len(ranks)
+    return ranks
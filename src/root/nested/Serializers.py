@@ -0,0 +1,192 @@
+""" This module contains the serializers of the values that
+are sent from one process to another (see
+MakeParallelNetworkParallel.py).
+
+A message (stream name, values) put on a multiprocessing.Queue
+is pickled as a whole with the name of the stream in every
+message, and a list of numbers is pickled number by number.
+A MessageSerializer replaces the name of the stream by an
+integer stream id, and the values by a string of bytes made by
+the codec of the stream:
+
+(1) 'pickle' (PickleCodec): the values are pickled with the
+    highest protocol. Any values that can be pickled can be
+    sent.
+(2) 'numeric' (NumericCodec): the values are numbers, or rows
+    of numbers; they are sent as the raw buffer of a numpy
+    array after a header of a few bytes with the dtype and the
+    shape of the array, and received as an array.
+
+The stream ids and the codecs of the streams are chosen when
+the processes are planned (see GroupPlanner.make_plan), before
+the processes are started, so that the process that encodes a
+message and the process that decodes it use the same table.
+Other codecs can be added with register_codec.
+
+"""
+
+import cPickle
+import struct
+
+import numpy as np
+
+DEFAULT_CODEC_NAME = 'pickle'
+
+
+class PickleCodec(object):
+    """ Encodes a list of values with cPickle, highest protocol. """
+    def encode(self, values):
+        return cPickle.dumps(values, cPickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data):
+        return cPickle.loads(data)
+
+
+class NumericCodec(object):
+    """
+    Encodes a list or array of numbers (or of rows of numbers)
+    as a header followed by the raw buffer of an array.
+
+    The header is: the length of the dtype string and the number
+    of dimensions (one byte each), the dtype string (e.g. '<f8'),
+    and the length of each dimension (8 bytes each, little-endian).
+
+    Parameters
+    ----------
+    dtype: numpy dtype (optional)
+          The values are converted to this dtype. By default,
+          the dtype is that of np.asarray(values). The header
+          of a structured dtype (e.g. '|V16') has no field
+          names; the values are decoded with this dtype.
+
+    """
+    def __init__(self, dtype=None):
+        self.dtype = None if dtype is None else np.dtype(dtype)
+
+    def encode(self, values):
+        array = np.ascontiguousarray(values, dtype=self.dtype)
+        if array.dtype.hasobject:
+            raise ValueError('NumericCodec cannot encode values of type object')
+        dtype_str = array.dtype.str
+        return ''.join([
+            struct.pack('<BB', len(dtype_str), array.ndim),
+            dtype_str,
+            struct.pack('<{0}q'.format(array.ndim), *array.shape),
+            array.tobytes()])
+
+    def decode(self, data):
+        dtype_length, ndim = struct.unpack_from('<BB', data)
+        offset = 2
+        dtype = np.dtype(data[offset:offset + dtype_length])
+        if self.dtype is not None and dtype.str == self.dtype.str:
+            dtype = self.dtype
+        offset += dtype_length
+        shape = struct.unpack_from('<{0}q'.format(ndim), data, offset)
+        offset += 8 * ndim
+        return np.frombuffer(data, dtype=dtype, offset=offset).reshape(shape)
+
+
+# key: codec name
+# value: function of the dtype of the stream (or None) that
+#        returns a codec
+_codec_factories = {
+    'pickle': lambda dtype: PickleCodec(),
+    'numeric': NumericCodec,
+    }
+
+
+def register_codec(name, factory):
+    """
+    Register a codec.
+
+    Parameters
+    ----------
+    name: str
+          The name of the codec in plans and JSON descriptions.
+    factory: function
+          factory(dtype) returns the codec of a stream whose
+          dtype (see GroupPlanner.make_plan) is dtype, or None.
+          A codec has methods encode(values), which returns a
+          str, and decode(data), which returns the values.
+
+    """
+    _codec_factories[name] = factory
+
+
+def is_codec(name):
+    """ True if name is the name of a registered codec. """
+    return name in _codec_factories
+
+
+def make_codec(name, dtype=None):
+    """ Return the codec called name for a stream with the
+    given dtype. Raises KeyError if there is no such codec.
+    """
+    if name not in _codec_factories:
+        raise KeyError('No codec called {0}'.format(name))
+    return _codec_factories[name](dtype)
+
+
+class MessageSerializer(object):
+    """
+    Encodes and decodes the messages (stream name, values) and
+    (stream name, values, tag) that are sent to a process.
+
+    An encoded message is (stream id, data) or (stream id, data,
+    tag), where data is the str made by the codec of the stream.
+    The values None (the doorbell of a SharedRing) are not
+    encoded. Messages of streams that have no id are not
+    changed.
+
+    Parameters
+    ----------
+    stream_ids: dict
+          key: stream name
+          value: integer stream id
+    codec_names: dict (optional)
+          key: stream name
+          value: codec name. The default is DEFAULT_CODEC_NAME.
+    stream_dtypes: dict (optional)
+          key: stream name
+          value: numpy dtype of the values of the stream, given
+          to the codec.
+
+    Attributes
+    ----------
+    stream_names: dict
+          key: stream id
+          value: stream name
+    codecs: dict
+          key: stream id
+          value: codec
+
+    """
+    def __init__(self, stream_ids, codec_names=None, stream_dtypes=None):
+        codec_names = codec_names or dict()
+        stream_dtypes = stream_dtypes or dict()
+        self.stream_ids = dict(stream_ids)
+        self.stream_names = dict(
+            (stream_id, stream_name)
+            for stream_name, stream_id in self.stream_ids.iteritems())
+        self.codecs = dict(
+            (stream_id, make_codec(codec_names.get(stream_name, DEFAULT_CODEC_NAME),
+                                   stream_dtypes.get(stream_name)))
+            for stream_name, stream_id in self.stream_ids.iteritems())
+
+    def encode(self, message):
+        stream_id = self.stream_ids.get(message[0])
+        if stream_id is None:
+            return message
+        data = message[1]
+        if data is not None:
+            data = self.codecs[stream_id].encode(data)
+        return (stream_id, data) + tuple(message[2:])
+
+    def decode(self, message):
+        stream_name = self.stream_names.get(message[0])
+        if stream_name is None:
+            return message
+        values = message[1]
+        if values is not None:
+            values = self.codecs[message[0]].decode(values)
+        return (stream_name, values) + tuple(message[2:])
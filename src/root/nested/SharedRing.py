@@ -0,0 +1,179 @@
+""" This module contains SharedRing, a transport of numbers
+from one process to another through shared memory.
+
+A value sent on a multiprocessing.Queue is pickled, written
+to a pipe by a feeder thread, read and unpickled. A SharedRing
+is a circular array of numbers of a fixed dtype in memory that
+is shared by two processes (an anonymous memory map made by
+multiprocessing.sharedctypes.RawArray, inherited by the
+processes that are started after it is made). The writer copies
+values into the array and the reader extends a StreamArray
+directly from views of the array; nothing is pickled.
+
+A ring has a single writer and a single reader. The writer
+only advances the write index and the reader only advances the
+read index, so no lock is needed. The two indices are on
+different cache lines so that the processes do not invalidate
+each other's cache when only one of them advances.
+
+A SharedRing can be used where a receiver channel is used in
+output_stream_names_dict (see MakeParallelNetworkParallel): its
+put((stream_name, values)) writes values into the ring and
+then puts the message (stream_name, None) on the doorbell, an
+input channel of the receiving process, which tells the receiver to read
+the ring of that stream.
+
+"""
+
+import ctypes
+import time
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+
+# Indices into the array of counters. They are 64 bytes
+# (a cache line) apart.
+_WRITE_INDEX = 0
+_READ_INDEX = 8
+
+# Seconds that a writer sleeps while the ring is full.
+_FULL_RING_SLEEP = 1E-4
+
+
+class SharedRing(object):
+    """
+    A single-producer single-consumer ring of numbers in
+    shared memory.
+
+    Parameters
+    ----------
+    capacity: positive integer
+          The number of elements in the ring.
+    dtype: numpy dtype (optional)
+          The type of the elements. The default is float.
+    num_columns: None or positive integer (optional)
+          If not None, each element is a row of num_columns
+          numbers, as in StreamArray.
+    doorbell: InputChannel or multiprocessing.Queue (optional)
+          The input channel of the receiving process.
+
+    Attributes
+    ----------
+    array: np.ndarray
+          The elements, a view of the shared memory.
+    _counters: RawArray of c_longlong
+          _counters[_WRITE_INDEX] and _counters[_READ_INDEX]
+          are the numbers of elements written and read since
+          the ring was made; element k is array[k % capacity].
+
+    """
+    def __init__(self, capacity, dtype=float, num_columns=None,
+                 doorbell=None):
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.num_columns = num_columns
+        self.doorbell = doorbell
+        shape = (capacity,) if num_columns is None else (capacity, num_columns)
+        num_bytes = int(np.prod(shape)) * self.dtype.itemsize
+        self._buffer = RawArray(ctypes.c_char, num_bytes)
+        self._counters = RawArray(ctypes.c_longlong, 2 * _READ_INDEX)
+        self.array = np.frombuffer(self._buffer, dtype=self.dtype).reshape(shape)
+
+    def __len__(self):
+        """ The number of elements that have been written and
+        not yet read.
+        """
+        return self._counters[_WRITE_INDEX] - self._counters[_READ_INDEX]
+
+    def free(self):
+        """ The number of elements that can be written without
+        waiting for the reader.
+        """
+        return self.capacity - len(self)
+
+    def write(self, values):
+        """
+        Write as many elements of values as fit in the ring
+        without waiting. Returns the number written.
+
+        Parameters
+        ----------
+        values: np.ndarray or list
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        n = min(len(values), self.free())
+        if n == 0:
+            return 0
+        write_index = self._counters[_WRITE_INDEX]
+        begin = write_index % self.capacity
+        first = min(n, self.capacity - begin)
+        self.array[begin:begin + first] = values[:first]
+        self.array[:n - first] = values[first:n]
+        # The elements are written before the index that
+        # makes them visible to the reader.
+        self._counters[_WRITE_INDEX] = write_index + n
+        return n
+
+    def put(self, message):
+        """
+        Write all the values of message, waiting while the
+        ring is full, and then ring the doorbell.
+
+        Parameters
+        ----------
+        message: tuple (stream_name, values)
+        """
+        stream_name, values = message
+        values = np.asarray(values, dtype=self.dtype)
+        while len(values):
+            n = self.write(values)
+            values = values[n:]
+            if len(values):
+                # Let the reader drain what has been written.
+                if n and self.doorbell is not None:
+                    self.doorbell.put((stream_name, None))
+                time.sleep(_FULL_RING_SLEEP)
+        if self.doorbell is not None:
+            self.doorbell.put((stream_name, None))
+
+    def _readable_views(self):
+        """ The elements that can be read, as at most two
+        views of the ring, oldest first.
+        """
+        read_index = self._counters[_READ_INDEX]
+        n = self._counters[_WRITE_INDEX] - read_index
+        begin = read_index % self.capacity
+        first = min(n, self.capacity - begin)
+        views = [self.array[begin:begin + first]]
+        if n > first:
+            views.append(self.array[:n - first])
+        return views
+
+    def read(self):
+        """ Return a copy of the elements that can be read,
+        and mark them as read.
+        """
+        views = self._readable_views()
+        values = np.concatenate(views) if len(views) > 1 else views[0].copy()
+        self._counters[_READ_INDEX] += len(values)
+        return values
+
+    def drain_into(self, stream):
+        """
+        Extend stream by the elements that can be read, straight
+        from the shared memory, and mark them as read. Returns
+        the number of elements read.
+
+        Parameters
+        ----------
+        stream: StreamArray
+        """
+        n = 0
+        for view in self._readable_views():
+            if len(view):
+                stream.extend(view)
+                # The elements are copied into the stream before
+                # the writer may overwrite them.
+                self._counters[_READ_INDEX] += len(view)
+                n += len(view)
+        return n
@@ -4,19 +4,149 @@ of PythonStreams.
 """
 
 from SystemParameters import DEFAULT_STREAM_SIZE, DEFAULT_BUFFER_SIZE_FOR_STREAM
+from SystemParameters import DEFAULT_STREAM_STORAGE
+from RingBuffer import RingBuffer
+from StreamHistory import SegmentedHistory
+import Metrics
 # Import numpy and pandas if StreamArray (numpy) and StreamSeries (Pandas)
 # are used.
 import numpy as np
 #import pandas as pd
 from collections import namedtuple
+import heapq
+import struct
 
 TimeAndValue = namedtuple('TimeAndValue', ['time', 'value'])
 _no_value = object
 
+
+class TimedColumns(object):
+    """
+    A sequence of TimeAndValue stored as two arrays: an array
+    of times and an array of values.
+
+    Indexing with an integer returns a TimeAndValue, and
+    iterating returns TimeAndValue objects; so a function
+    written for a list of TimeAndValue also works on
+    TimedColumns. Slicing returns TimedColumns whose arrays
+    are views. Functions that need speed can work on the
+    arrays time and value directly; for example the times are
+    nondecreasing, so np.searchsorted(columns.time, t) finds
+    the first element at or after time t.
+
+    Parameters
+    ----------
+    time: np.ndarray
+    value: np.ndarray
+          Arrays of the same length.
+
+    """
+    def __init__(self, time, value):
+        self.time = time
+        self.value = value
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TimedColumns(self.time[index], self.value[index])
+        return TimeAndValue(self.time[index], self.value[index])
+
+    def __setitem__(self, index, v):
+        if isinstance(index, slice):
+            if isinstance(v, TimedColumns):
+                self.time[index] = v.time
+                self.value[index] = v.value
+            else:
+                # v is a sequence of (time, value) pairs.
+                self.time[index] = [pair[0] for pair in v]
+                self.value[index] = [pair[1] for pair in v]
+        else:
+            self.time[index], self.value[index] = v
+
+    def __iter__(self):
+        for i in range(len(self.time)):
+            yield TimeAndValue(self.time[i], self.value[i])
+
+    def __add__(self, other):
+        return TimedColumns(np.concatenate((self.time, other.time)),
+                            np.concatenate((self.value, other.value)))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class StreamOverflowError(Exception):
+    """ Raised by a write that would take a stream with
+    overflow policy 'raise' past its capacity.
+
+    """
+    pass
+
+
 class _multivalue(object):
     def __init__(self, lst):
         self.lst = lst
-        
+
+
+class _ReaderIndex(object):
+    """
+    Keeps track of the slowest reader of a stream.
+
+    Positions are absolute indexes into the stream (i.e.,
+    offset + start) so that they do not change when the
+    list recent is compacted. The index is a heap with lazy
+    deletion: moving a reader pushes a new entry and leaves
+    the old entry in the heap; an entry at the top of the
+    heap that no longer matches its reader's position is
+    discarded when the minimum is requested. So moving a
+    reader costs O(log R) and finding the slowest reader
+    costs O(log R) amortized, for R readers.
+
+    Attributes
+    ----------
+    positions: dict
+          key = reader
+          value = absolute position of the reader
+    _heap: list of (position, count, reader)
+          count breaks ties so that readers are never
+          compared.
+
+    """
+    def __init__(self):
+        self.positions = dict()
+        self._heap = []
+        self._count = 0
+
+    def update(self, reader, position):
+        if self.positions.get(reader) == position:
+            return
+        self.positions[reader] = position
+        self._count += 1
+        heapq.heappush(self._heap, (position, self._count, reader))
+        # Stale entries that are not at the top of the heap
+        # are never popped; rebuild the heap if they pile up.
+        if len(self._heap) > 2*len(self.positions) + 16:
+            self._heap = [(p, c, r) for (p, c, r) in self._heap
+                          if self.positions.get(r) == p]
+            heapq.heapify(self._heap)
+
+    def remove(self, reader):
+        self.positions.pop(reader, None)
+
+    def slowest(self):
+        """
+        Return (position, reader) for the slowest reader, or
+        None if there are no readers.
+        """
+        while self._heap:
+            position, _, reader = self._heap[0]
+            if self.positions.get(reader) == position:
+                return (position, reader)
+            heapq.heappop(self._heap)
+        return None
+
 
 class Stream(object):
     """
@@ -103,6 +233,10 @@ class Stream(object):
     where next() executes a state-transition.
     An agent x unsubscribe from a stream s by executing
             s.delete_caller(x)
+    If a scheduler is installed in s (s.scheduler), then
+    when s is modified, s marks its subscribers as ready in
+    the scheduler instead of calling them, and the scheduler
+    calls x.next() from its run loop. See Scheduler.py.
 
     CLOSING A STREAM
     A stream can be closed or open (i.e., not closed).
@@ -132,10 +266,18 @@ class Stream(object):
     name: str (optional)
           name of the stream. Though the name is optional
           a named stream helps with debugging.
+    storage: {'list', 'ring'} (optional)
+          The storage backend for recent. With 'list',
+          recent is a list (or array) that is replaced by
+          a new, often larger, list when it fills up. With
+          'ring', recent is a RingBuffer: a circular buffer
+          from which values that no reader needs are dropped
+          in O(1) without copying or allocating.
+          The default is DEFAULT_STREAM_STORAGE.
     
     Attributes
     ----------
-    recent: list
+    recent: list or RingBuffer
           A list of the most recent values of the stream.
     stop:   index into the list recent.
           s.recent[:s.stop] contains the s.stop most recent
@@ -151,25 +293,71 @@ class Stream(object):
     subscribers_set: set
              the set of subscribers for this stream, agents to be notified when an
              element is added to the stream.
+    close_subscribers_set: set
+             agents to be notified when the stream is closed.
+    scheduler: Scheduler or None
+             If None, subscribers are called as soon as the stream is
+             modified. Otherwise subscribers are scheduled in, and run
+             by, this scheduler.
     closed: boolean
              True if and only if the stream is closed.
              A closed stream is not modified.
+    max_elements, max_bytes: positive integer or None
+             The capacity of the stream: the largest number
+             of values (and of bytes of values) that the
+             stream keeps for its readers. None means no
+             limit. See set_capacity.
+    overflow_policy: {'block', 'drop_oldest', 'raise'}
+             What to do when a write exceeds the capacity.
+             See set_capacity.
+    num_dropped: nonnegative integer
+             The number of values that were skipped for
+             lagging readers by the policy 'drop_oldest'.
+    high_water_elements: nonnegative integer
+             The largest number of values that the stream
+             has kept for its readers, i.e., the largest
+             value of stop - start[slowest_reader].
+    high_water_bytes: nonnegative integer (read-only)
+             high_water_elements times the size of a value.
+    history: SegmentedHistory or None
+             If None, values that no reader needs are deleted
+             from recent. Otherwise they are moved to history
+             (see keep_history), and the values of the stream
+             with indexes 0, .., offset-1 are history.read(0, offset).
     _buffer_size: nonnegative integer
             Used to manage the recent list.
     _begin: index into the list recent
             recent[_begin:] mqy be read by some reader.
             recent[:_begin] is not being accessed by any reader;
             therefore recent[:_begin] can be safely deleted.
+    _readers: _ReaderIndex
+            The positions of the readers, ordered so that the
+            slowest reader is found without scanning start.
+    slowest_reader: reader or None (read-only)
+            The reader with the smallest start.
+    slowest_reader_lag: nonnegative integer (read-only)
+            The number of values in the stream that the
+            slowest reader has not yet passed, i.e.,
+            stop - start[slowest_reader]; 0 if there are
+            no readers.
 
     """
-    def __init__(self, name="No Name", proc_name="Unkown Process"):
+    def __init__(self, name="No Name", proc_name="Unkown Process",
+                 storage=None):
         self.name = name
         # Name of the process in which this stream lives.
         self.proc_name = proc_name
+        self.storage = DEFAULT_STREAM_STORAGE if storage is None else storage
+        if self.storage not in ('list', 'ring'):
+            raise ValueError(
+                "Expected storage to be 'list' or 'ring', not '{0}'".\
+                format(self.storage))
         # Create the list recent and the parameters
         # associated with garbage collecting
         # elements in the list.
         self.recent = self._create_recent(DEFAULT_STREAM_SIZE)
+        if self.storage == 'ring':
+            self.recent = RingBuffer(self.recent)
         self._buffer_size = DEFAULT_BUFFER_SIZE_FOR_STREAM
         self._begin = 0
         # Initially, the stream has no entries, and so
@@ -178,8 +366,21 @@ class Stream(object):
         self.stop = 0
         # Initially the stream has no readers.
         self.start = dict()
+        self._readers = _ReaderIndex()
         # Initially the stream has no subscribers.
         self.subscribers_set = set()
+        self.close_subscribers_set = set()
+        self.scheduler = None
+        # Initially the stream has no capacity limit.
+        self.max_elements = None
+        self.max_bytes = None
+        self.overflow_policy = 'block'
+        self._capacity = None
+        self._waiting_writers = set()
+        self.num_dropped = 0
+        self.high_water_elements = 0
+        # Initially the stream has no history.
+        self.history = None
         # Initially the stream is open
         self.closed = False
 
@@ -194,12 +395,242 @@ class Stream(object):
         its start value is updated to the parameter in the call.
         """
         self.start[reader] = start
+        self._readers.update(reader, start + self.offset)
 
     def delete_reader(self, reader):
         """
         Delete this reader from this stream.
         """
-        if reader in start: del start[reader]
+        if reader in self.start: del self.start[reader]
+        self._readers.remove(reader)
+
+    @property
+    def slowest_reader(self):
+        slowest = self._readers.slowest()
+        return None if slowest is None else slowest[1]
+
+    @property
+    def slowest_reader_lag(self):
+        slowest = self._readers.slowest()
+        return 0 if slowest is None else self.offset + self.stop - slowest[0]
+
+    def _slowest_start(self):
+        """
+        Return the smallest start of any reader, or 0 if
+        the stream has no readers. A reader may start after
+        stop, e.g. a window agent whose step_size is larger
+        than its window_size skips values not yet appended;
+        values after stop cannot be dropped, so the result
+        is at most stop.
+        """
+        slowest = self._readers.slowest()
+        return 0 if slowest is None else min(slowest[0] - self.offset, self.stop)
+
+    def _num_unread(self):
+        """
+        Return the number of values that some reader has
+        not read; 0 if the stream has no readers, since then
+        no reader waits for the values.
+        """
+        if self._readers.slowest() is None: return 0
+        return self.stop - self._slowest_start()
+
+    def set_capacity(self, max_elements=None, max_bytes=None,
+                     overflow_policy='block'):
+        """
+        Limit the number of values (and bytes) that the
+        stream keeps for readers that have not yet read them.
+
+        Parameters
+        ----------
+        max_elements: positive integer or None (optional)
+        max_bytes: positive integer or None (optional)
+              The size of a value is _element_nbytes(). For a
+              Stream of arbitrary objects this only counts the
+              slot of the value in recent, not the object.
+        overflow_policy: {'block', 'drop_oldest', 'raise'}
+              'block': while the stream is full, an agent that
+              writes the stream does not execute its state
+              transitions; its next() is deferred until the
+              readers of the stream catch up. An agent writes
+              at most room values of a transition; it keeps the
+              other values and writes them when the readers
+              catch up (see Agent.next). So the stream does not
+              exceed its capacity.
+              'drop_oldest': readers that lag too far behind
+              skip the oldest values; num_dropped counts them.
+              'raise': a write that exceeds the capacity raises
+              StreamOverflowError and does not modify the stream.
+              A stream without readers has no unread values;
+              so it is never full and writes to it never block,
+              drop or raise.
+
+        """
+        if overflow_policy not in ('block', 'drop_oldest', 'raise'):
+            raise ValueError(
+                "Expected overflow_policy to be 'block', 'drop_oldest' or 'raise', not '{0}'".\
+                format(overflow_policy))
+        self.max_elements = max_elements
+        self.max_bytes = max_bytes
+        self.overflow_policy = overflow_policy
+        capacities = []
+        if max_elements is not None:
+            capacities.append(max_elements)
+        if max_bytes is not None:
+            capacities.append(max(1, max_bytes // self._element_nbytes()))
+        self._capacity = min(capacities) if capacities else None
+
+    def _element_nbytes(self):
+        """ The number of bytes that recent uses for a value. """
+        return struct.calcsize('P')
+
+    @property
+    def high_water_bytes(self):
+        return self.high_water_elements * self._element_nbytes()
+
+    @property
+    def full(self):
+        """
+        True if and only if the overflow policy is 'block'
+        and the stream holds at least its capacity of values
+        that some reader has not read.
+        """
+        return (self._capacity is not None and
+                self.overflow_policy == 'block' and
+                self._num_unread() >= self._capacity)
+
+    @property
+    def room(self):
+        """
+        The number of values that can be written before the
+        stream is full; None if the overflow policy is not
+        'block', the stream has no capacity or it has no
+        readers.
+        """
+        if (self._capacity is None or self.overflow_policy != 'block' or
+            self._readers.slowest() is None):
+            return None
+        return max(0, self._capacity - self._num_unread())
+
+    def wait(self, writer):
+        """
+        Defer writer, an agent, until the stream is no
+        longer full; then writer.next() is called.
+        """
+        self._waiting_writers.add(writer)
+
+    def release_writers(self):
+        """
+        If the stream is no longer full, resume the writers
+        that are waiting for it. Agent.next calls this for its
+        input streams after it has updated its starts.
+        """
+        if not self._waiting_writers or self.full:
+            return
+        writers, self._waiting_writers = self._waiting_writers, set()
+        if self.scheduler is None:
+            for a in writers: a.next()
+        else:
+            for a in writers: self.scheduler.schedule(a)
+            self.scheduler.run()
+
+    def _make_room(self, num_values):
+        """
+        Apply the overflow policy before num_values values
+        are written to the stream.
+        """
+        if self._capacity is None or self._readers.slowest() is None: return
+        excess = self._num_unread() + num_values - self._capacity
+        if excess <= 0: return
+        if self.overflow_policy == 'raise':
+            raise StreamOverflowError(
+                'Writing {0} values to stream {1} exceeds its capacity of {2} values'.\
+                format(num_values, self.name, self._capacity))
+        if self.overflow_policy == 'drop_oldest':
+            # Values that are not yet written cannot be skipped;
+            # _track_capacity drops the rest after the write.
+            self._drop_oldest(min(self._slowest_start() + excess, self.stop))
+
+    def _track_capacity(self):
+        """
+        Apply the overflow policy and update the high-water
+        mark after values are written to the stream.
+        """
+        num_live = self._num_unread()
+        if (self._capacity is not None and num_live > self._capacity and
+            self.overflow_policy == 'drop_oldest'):
+            self._drop_oldest(self.stop - self._capacity)
+            num_live = self._capacity
+        if num_live > self.high_water_elements:
+            self.high_water_elements = num_live
+
+    def _drop_oldest(self, new_start):
+        """
+        Move the start of every reader that is before
+        new_start to new_start.
+        """
+        slowest_start = self._slowest_start()
+        if new_start <= slowest_start: return
+        self.num_dropped += new_start - slowest_start
+        for reader, start in self.start.items():
+            if start < new_start:
+                self.set_start(reader, new_start)
+
+    def keep_history(self, directory, segment_size=None):
+        """
+        Move values that no reader needs from recent to
+        memory-mapped segment files in directory, instead
+        of deleting them. Only streams of numbers, i.e.,
+        instances of StreamArray, can keep a history.
+        Call keep_history before values are dropped from
+        recent, or after the stream is restored from a
+        checkpoint (see Checkpoint.py).
+
+        A history left in directory by an earlier stream with
+        the same name, e.g. before a restart, is reopened:
+        if this stream has not dropped any values then its
+        values follow those of the history, and offset is set
+        to the length of the history. If this stream has
+        dropped values, e.g. it was restored with offset > 0,
+        then the history must hold the values with indexes
+        below offset; values of the history after offset are
+        discarded, since they are in recent.
+
+        Parameters
+        ----------
+        directory: str
+              The directory for the segment files. The files
+              are named after the stream.
+        segment_size: positive integer (optional)
+              The number of values in a segment file.
+              The default is DEFAULT_HISTORY_SEGMENT_SIZE.
+
+        """
+        raise TypeError(
+            'Stream {0} is not a StreamArray and cannot keep a history'.\
+            format(self.name))
+
+    def get_range(self, i, j):
+        """
+        Return the values of the stream with indexes
+        i, .., j-1. Indexes are positions in the whole
+        stream, not in recent; values before offset are
+        read from the history.
+        """
+        if not 0 <= i <= j <= self.offset + self.stop:
+            raise IndexError(
+                'range [{0}, {1}) not in stream {2} of length {3}'.\
+                format(i, j, self.name, self.offset + self.stop))
+        if i >= self.offset:
+            return self.recent[i - self.offset : j - self.offset]
+        if self.history is None:
+            raise IndexError(
+                'values before index {0} of stream {1} have been deleted'.\
+                format(self.offset, self.name))
+        if j <= self.offset:
+            return self.history.read(i, j)
+        return np.concatenate((self.history.read(i, self.offset),
+                               self.recent[0 : j - self.offset]))
 
     def call(self, agent):
         """
@@ -207,6 +638,12 @@ class Stream(object):
         """
         self.subscribers_set.add(agent)
 
+    def call_on_close(self, agent):
+        """
+        Register agent to be called when this stream is closed.
+        """
+        self.close_subscribers_set.add(agent)
+
     def delete_caller(self, agent):
         """
         Delete a subscriber for this stream.
@@ -222,11 +659,16 @@ class Stream(object):
         ##     return
         if self.closed:
             raise Exception("Cannot write to a closed stream.")
+        self._make_room(1)
+        if self.storage == 'ring':
+            self._reserve(self.stop + 1)
         self.recent[self.stop] = value
         self.stop += 1
+        self._track_capacity()
+        if Metrics.enabled: Metrics.record_append(self, 1)
         # Inform subscribers that the stream has been
         # modified.
-        for a in self.subscribers_set: a.next()
+        self._notify()
                             
         # Manage the list recent.
         # Set up a new version of the list
@@ -256,17 +698,34 @@ class Stream(object):
         if len(value_list) == 0:
             return
 
+        self._make_room(len(value_list))
+        if self.storage == 'ring':
+            self._reserve(self.stop + len(value_list))
         self.new_stop = self.stop + len(value_list)
         self.recent[self.stop : self.new_stop] = value_list
         self.stop = self.new_stop
+        self._track_capacity()
+        if Metrics.enabled: Metrics.record_append(self, len(value_list))
         # Inform subscribers that the stream has been
         # modified.
-        for a in self.subscribers_set: a.next()
+        self._notify()
 
         # Manage the list recent in the same way as done
         # for the append() method.
         self._set_up_new_recent()
 
+    def _notify(self):
+        """
+        Inform subscribers that the stream has been modified:
+        call them directly, or mark them as ready and run the
+        scheduler.
+        """
+        if self.scheduler is None:
+            for a in self.subscribers_set: a.next()
+        else:
+            for a in self.subscribers_set: self.scheduler.schedule(a)
+            self.scheduler.run()
+
     def set_name(self, name):
         self.name = name
 
@@ -279,10 +738,17 @@ class Stream(object):
         """
         if self.closed:
             return
-        print "Stream " + self.name + " in " + self.proc_name + " closed"
+        print "Stream {0} in {1} closed".format(self.name, self.proc_name)
         self.closed = True
+        if self.history is not None:
+            self.history.flush()
         # signal subscribers that the stream has closed.
         #for a in self.subscribers_set: a.signal()
+        if self.scheduler is None:
+            for a in self.close_subscribers_set: a.next()
+        else:
+            for a in self.close_subscribers_set: self.scheduler.schedule(a)
+            self.scheduler.run()
         
     def set_start(self, reader, start):
         """ The reader tells the stream that it is only accessing
@@ -290,6 +756,7 @@ class Stream(object):
 
         """
         self.start[reader] = start
+        self._readers.update(reader, start + self.offset)
 
     def _set_up_new_recent(self):
         """
@@ -297,30 +764,135 @@ class Stream(object):
         by updating the list recent to delete elements of
         the list that are not accessed by any reader.
         """
-        self._begin = 0 if self.start == {} else min(self.start.itervalues())
         if self.stop < len(self.recent) - self._buffer_size: return
-        self.new_recent = self._create_recent(
-            len(self.recent) * (1 if self._begin > self._buffer_size else 2))
-        self.new_recent[:self.stop - self._begin] = \
-          self.recent[self._begin : self.stop]
-        self.recent, self.new_recent = self.new_recent, self.recent
-        del self.new_recent
+        self._begin = self._slowest_start()
+        if self.history is not None:
+            self.history.append(self.recent[:self._begin])
+        if self.storage == 'ring':
+            # Drop recent[:_begin] by moving the head of the
+            # ring; grow the ring only if that frees too little.
+            self.recent.advance(self._begin)
+            if self._begin <= self._buffer_size:
+                self.recent.grow(self._create_recent(2*len(self.recent)),
+                                 self.stop - self._begin)
+        else:
+            self.new_recent = self._create_recent(
+                len(self.recent) * (1 if self._begin > self._buffer_size else 2))
+            self.new_recent[:self.stop - self._begin] = \
+              self.recent[self._begin : self.stop]
+            self.recent, self.new_recent = self.new_recent, self.recent
+            del self.new_recent
+        self._drop_begin()
+
+    def _reserve(self, new_stop):
+        """
+        Make sure that recent can hold recent[:new_stop].
+        A list grows when a slice is assigned past its end, but
+        a ring buffer or a numpy array has a fixed size; so drop
+        the elements that no reader needs and, if that is not
+        enough, replace recent by a larger one.
+        """
+        if new_stop <= len(self.recent): return
+        self._begin = self._slowest_start()
+        if self.history is not None:
+            self.history.append(self.recent[:self._begin])
+        size = len(self.recent)
+        while size < new_stop - self._begin + self._buffer_size:
+            size *= 2
+        if self.storage == 'ring':
+            self.recent.advance(self._begin)
+            if size > len(self.recent):
+                self.recent.grow(self._create_recent(size),
+                                 self.stop - self._begin)
+        else:
+            self.new_recent = self._create_recent(size)
+            self.new_recent[:self.stop - self._begin] = \
+              self.recent[self._begin : self.stop]
+            self.recent, self.new_recent = self.new_recent, self.recent
+            del self.new_recent
+        self._drop_begin()
+
+    def _drop_begin(self):
+        """
+        Renumber the indexes into recent after the elements
+        recent[:_begin] have been dropped, so that the first
+        remaining element has index 0.
+        """
         self.offset += self._begin
         for key in self.start.iterkeys():
             self.start[key] -=  self._begin
         self.stop -= self._begin
         self._begin = 0
 
-
     def _create_recent(self, size): return [0] * size
 
 
 ##########################################################
 class StreamArray(Stream):
-    def __init__(self, name=None):
-        super(StreamArray, self).__init__(name)
+    """
+    A stream of numbers whose list recent is a numpy array.
 
-    def _create_recent(self, size): return np.zeros(size)
+    Slices of recent are views of the array; so the slices
+    that agents read from a StreamArray, and the arrays that
+    agents write to it, are not converted to or from Python
+    lists of numbers.
+
+    An element of a StreamArray can also be a row of several
+    numbers, stored contiguously: either a row of num_columns
+    numbers of type dtype, so that recent is a 2-D array and
+    slices of it are 2-D views, or a record of a numpy
+    structured dtype, e.g. np.dtype([('x', float), ('y', float)]),
+    so that slice['x'] is a column. A row can be appended as
+    a tuple, and a list of tuples can extend the stream.
+
+    Parameters
+    ----------
+    name: str (optional)
+    storage: {'list', 'ring'} (optional)
+          See Stream.
+    dtype: numpy dtype (optional)
+          The type of the elements of the stream. The default
+          is float.
+    num_columns: None or positive integer (optional)
+          If not None, each element of the stream is a row
+          of num_columns numbers.
+
+    """
+    def __init__(self, name=None, storage=None, dtype=float,
+                 num_columns=None):
+        self.dtype = np.dtype(dtype)
+        self.num_columns = num_columns
+        super(StreamArray, self).__init__(name, storage=storage)
+
+    def _element_nbytes(self):
+        return self.dtype.itemsize * (self.num_columns or 1)
+
+    def keep_history(self, directory, segment_size=None):
+        shape = () if self.num_columns is None else (self.num_columns,)
+        if segment_size is None:
+            self.history = SegmentedHistory(
+                directory, str(self.name), self.dtype, shape=shape)
+        else:
+            self.history = SegmentedHistory(
+                directory, str(self.name), self.dtype, segment_size, shape)
+        # The history holds the values with indexes below offset.
+        if self.offset == 0:
+            # Continue the history: the values in recent follow
+            # the values of the history.
+            self.offset = self.history.length
+            for reader, start in self.start.items():
+                self.set_start(reader, start)
+        elif self.history.length < self.offset:
+            raise ValueError(
+                'The history of stream {0} has {1} values, but the stream has deleted {2}'.\
+                format(self.name, self.history.length, self.offset))
+        elif self.history.length > self.offset:
+            self.history.truncate(self.offset)
+
+    def _create_recent(self, size):
+        if self.num_columns is None:
+            return np.zeros(size, dtype=self.dtype)
+        return np.zeros((size, self.num_columns), dtype=self.dtype)
 
     def extend(self, a):
         """
@@ -334,19 +906,25 @@ class StreamArray(Stream):
             raise Exception("Cannot write to a closed stream.")
 
         if isinstance(a, list):
-            a = np.array(a)
+            a = np.asarray(a, dtype=self.dtype)
         assert isinstance(a, np.ndarray),\
           "Expect extension of a numpy stream to be a numpy ndarray, not '{0}' ".format(a)
         
         if len(a) == 0:
             return
 
+        self._make_room(len(a))
+        # An array is not extended by assigning past its end,
+        # so make room for a first.
+        self._reserve(self.stop + len(a))
         self.new_stop = self.stop + len(a)
         self.recent[self.stop : self.new_stop] = a
         self.stop = self.new_stop
+        self._track_capacity()
+        if Metrics.enabled: Metrics.record_append(self, len(a))
         # Inform subscribers that the stream has been
         # modified.
-        for subscriber in self.subscribers_set: subscriber.next()
+        self._notify()
 
         # Manage the array 'recent' in the same way as done
         # for the append() method.
@@ -357,17 +935,79 @@ class StreamArray(Stream):
         
 
 class StreamSeries(Stream):
-    def __init__(self, name=None):
-        super(StreamSeries, self).__init__(name)
+    def __init__(self, name=None, storage=None):
+        super(StreamSeries, self).__init__(name, storage=storage)
 
     def _create_recent(self, size): return pd.Series([np.nan] *size)
 
 class StreamTimed(Stream):
-    def __init__(self, name=None):
-        super(StreamTimed, self).__init__(name)
+    def __init__(self, name=None, storage=None):
+        super(StreamTimed, self).__init__(name, storage=storage)
 
     def _create_recent(self, size):
         return [TimeAndValue(v, 0) for v in range(size)]
 
     
         
+
+
+class StreamTimedArray(Stream):
+    """
+    A timed stream stored as columns: recent is a TimedColumns
+    with an array of times and an array of values. Timed agents
+    find window boundaries in a StreamTimedArray by binary search
+    on the array of times (see Operators.timed_agent).
+
+    The times of the elements of the stream must be
+    nondecreasing.
+
+    Parameters
+    ----------
+    name: str (optional)
+    storage: {'list', 'ring'} (optional)
+          See Stream.
+    dtype: numpy dtype (optional)
+          The type of the values (not the times) of the stream.
+          The default is float; use object for arbitrary values.
+
+    """
+    def __init__(self, name=None, storage=None, dtype=float):
+        self.dtype = np.dtype(dtype)
+        super(StreamTimedArray, self).__init__(name, storage=storage)
+
+    def _create_recent(self, size):
+        return TimedColumns(np.zeros(size), np.zeros(size, dtype=self.dtype))
+
+    def _element_nbytes(self):
+        return np.dtype(float).itemsize + self.dtype.itemsize
+
+    def extend(self, value_list):
+        """
+        Extend the stream by a list of TimeAndValue (or of
+        (time, value) pairs) or by TimedColumns.
+
+        """
+        if self.closed:
+            raise Exception("Cannot write to a closed stream.")
+
+        assert isinstance(value_list, list) or isinstance(value_list, TimedColumns),\
+          "Expect extension of a timed stream to be a list or TimedColumns, not '{0}' ".\
+          format(value_list)
+
+        if len(value_list) == 0:
+            return
+
+        self._make_room(len(value_list))
+        # The arrays of recent are not extended by assigning
+        # past their end, so make room first.
+        self._reserve(self.stop + len(value_list))
+        self.new_stop = self.stop + len(value_list)
+        self.recent[self.stop : self.new_stop] = value_list
+        self.stop = self.new_stop
+        self._track_capacity()
+        if Metrics.enabled: Metrics.record_append(self, len(value_list))
+        # Inform subscribers that the stream has been
+        # modified.
+        self._notify()
+
+        self._set_up_new_recent()
@@ -0,0 +1,190 @@
+""" This module contains the SegmentedHistory class which
+keeps the history of a numeric stream on disk.
+
+A stream only keeps, in its list recent, the values that its
+readers may still read. When a stream has a history (see
+Stream.keep_history), the values that are dropped from recent
+are appended to a SegmentedHistory instead of being lost. The
+history is a sequence of segment files of segment_size elements
+each. Segments are memory-mapped; so appending writes into the
+page cache, and reading a range of the history only touches the
+pages of that range.
+
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from SystemParameters import DEFAULT_HISTORY_SEGMENT_SIZE
+
+# Number of segments that are kept mapped for reading.
+_NUM_MAPPED_SEGMENTS = 4
+
+
+class SegmentedHistory(object):
+    """
+    An append-only sequence of numbers (or of rows of numbers)
+    stored in memory-mapped segment files.
+
+    The files are directory/name.000000.seg, name.000001.seg, ..
+    and directory/name.meta which records the length of the
+    history; a history that is opened again with the same
+    directory and name continues where it left off, unless it
+    is truncated (see truncate).
+
+    Parameters
+    ----------
+    directory: str
+          The directory for the segment files.
+    name: str
+          The prefix of the segment file names.
+    dtype: numpy dtype (optional)
+          The type of the elements. The default is float.
+    segment_size: positive integer (optional)
+          The number of elements in a segment file.
+    shape: tuple (optional)
+          The shape of an element; () for single numbers,
+          (k,) for rows of k numbers.
+
+    Attributes
+    ----------
+    length: nonnegative integer
+          The number of elements in the history.
+    _write_segment: np.memmap or None
+          The segment that is being written.
+    _read_segments: OrderedDict
+          key = segment number
+          value = np.memmap of the segment opened for reading.
+          The least recently used segment is unmapped first.
+
+    """
+    def __init__(self, directory, name, dtype=float,
+                 segment_size=DEFAULT_HISTORY_SEGMENT_SIZE, shape=()):
+        self.directory = directory
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.segment_size = segment_size
+        self.shape = tuple(shape)
+        self.length = 0
+        self._write_segment = None
+        self._write_segment_number = None
+        self._read_segments = OrderedDict()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        if os.path.exists(self._meta_file_name()):
+            with open(self._meta_file_name()) as meta_file:
+                self.length = json.load(meta_file)['length']
+
+    def _meta_file_name(self):
+        return os.path.join(self.directory, self.name + '.meta')
+
+    def _segment_file_name(self, segment_number):
+        return os.path.join(self.directory,
+                            '{0}.{1:06d}.seg'.format(self.name, segment_number))
+
+    def _open_write_segment(self, segment_number):
+        if self._write_segment_number == segment_number:
+            return self._write_segment
+        if self._write_segment is not None:
+            self._write_segment.flush()
+        file_name = self._segment_file_name(segment_number)
+        mode = 'r+' if os.path.exists(file_name) else 'w+'
+        self._write_segment = np.memmap(
+            file_name, dtype=self.dtype, mode=mode,
+            shape=(self.segment_size,) + self.shape)
+        self._write_segment_number = segment_number
+        # A segment mapped for reading may be stale.
+        self._read_segments.pop(segment_number, None)
+        return self._write_segment
+
+    def _open_read_segment(self, segment_number):
+        if segment_number == self._write_segment_number:
+            return self._write_segment
+        if segment_number in self._read_segments:
+            segment = self._read_segments.pop(segment_number)
+        else:
+            segment = np.memmap(
+                self._segment_file_name(segment_number), dtype=self.dtype,
+                mode='r', shape=(self.segment_size,) + self.shape)
+            if len(self._read_segments) >= _NUM_MAPPED_SEGMENTS:
+                self._read_segments.popitem(last=False)
+        self._read_segments[segment_number] = segment
+        return segment
+
+    def append(self, values):
+        """
+        Append values (a list or array of elements) to the
+        end of the history.
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        written = 0
+        while written < len(values):
+            segment_number, position = divmod(self.length, self.segment_size)
+            segment = self._open_write_segment(segment_number)
+            n = min(len(values) - written, self.segment_size - position)
+            segment[position:position + n] = values[written:written + n]
+            written += n
+            self.length += n
+
+    def read(self, i, j):
+        """
+        Return the elements of the history with indexes
+        i, .., j-1 as a numpy array. A range in a single
+        segment is returned as a view of the mapped segment.
+        """
+        if not 0 <= i <= j <= self.length:
+            raise IndexError(
+                'history range [{0}, {1}) not in [0, {2})'.format(i, j, self.length))
+        parts = []
+        while i < j:
+            segment_number, position = divmod(i, self.segment_size)
+            n = min(j - i, self.segment_size - position)
+            parts.append(
+                self._open_read_segment(segment_number)[position:position + n])
+            i += n
+        if not parts:
+            return np.zeros((0,) + self.shape, dtype=self.dtype)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def truncate(self, length):
+        """
+        Discard the elements of the history with indexes length
+        or more, and delete the segment files that only held
+        such elements.
+        """
+        if not 0 <= length <= self.length:
+            raise IndexError(
+                'cannot truncate history of length {0} to {1}'.\
+                format(self.length, length))
+        self.length = length
+        self._read_segments.clear()
+        self._write_segment = None
+        self._write_segment_number = None
+        segment_number = -(-length // self.segment_size)
+        while os.path.exists(self._segment_file_name(segment_number)):
+            os.remove(self._segment_file_name(segment_number))
+            segment_number += 1
+        self.flush()
+
+    def flush(self):
+        """
+        Write the mapped pages and the length of the history
+        to disk.
+        """
+        if self._write_segment is not None:
+            self._write_segment.flush()
+        with open(self._meta_file_name(), 'w') as meta_file:
+            json.dump({'length': self.length,
+                       'dtype': self.dtype.str,
+                       'segment_size': self.segment_size}, meta_file)
+
+    def close(self):
+        self.flush()
+        self._write_segment = None
+        self._write_segment_number = None
+        self._read_segments.clear()
@@ -17,7 +17,7 @@ from Stream import Stream, _no_value, _multivalue
 from Agent import Agent
 from OperatorsTestParallel import stream_agent
 
-from components import *
+from ComponentRegistry import is_registered
 from helper import *
 
 
@@ -82,20 +82,16 @@ def unwrap_subgraph(my_json_file_name):
     with open(my_json_file_name) as json_file_original:
         j = json.load(json_file_original)
 
-    # Make array of functions in components.py
-    # (also includes elements like '__builtins__', '__doc__', '__file__')
-    comps_funcs = dir(components)
-
     # Make array of functions/components in JSON
     JSON_funcs = []
     for i in j['agent_descriptor_dict'].keys():
         JSON_funcs.append(j['agent_descriptor_dict'][i][2])
 
-    # If there are functions in the graph not in components.py...
+    # If there are functions in the graph that are not components...
     # they are most likely subgraphs, so collect them in 'unfound_comps'
     unfound_comps = []
     for f in JSON_funcs:
-        if f not in comps_funcs:
+        if not is_registered(f):
             unfound_comps.append(f)
 
     # Initialize new dictionary with values of the original graph.
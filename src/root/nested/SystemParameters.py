@@ -7,4 +7,31 @@ EPSILON = 1E-12
 DEFAULT_STREAM_SIZE = 2**12
 DEFAULT_BUFFER_SIZE_FOR_STREAM = DEFAULT_STREAM_SIZE / 4
 
+# Storage backend for the list recent of a stream: 'list' or 'ring'.
+DEFAULT_STREAM_STORAGE = 'list'
 
+# Number of elements in a segment file of a stream history.
+DEFAULT_HISTORY_SEGMENT_SIZE = 2**20
+
+# Values sent from one process to another are sent in batches:
+# a batch for a stream is sent when it has this many values,
+# or when its oldest value has waited this many seconds.
+DEFAULT_MESSAGE_BATCH_SIZE = 1024
+DEFAULT_MESSAGE_BATCH_DELAY = 0.01
+
+# Number of elements in a shared-memory ring between two processes.
+DEFAULT_SHARED_RING_CAPACITY = 2**16
+
+# Number of values of a stream that one process may send to
+# another before the receiver has applied them (see
+# MakeParallelNetworkParallel.OutputBatcher).
+DEFAULT_CREDIT_WINDOW = 16 * DEFAULT_MESSAGE_BATCH_SIZE
+
+# Number of steps for which a network is run in a single process
+# to measure its costs before it is partitioned (see AutoPartition).
+DEFAULT_PROFILE_STEPS = 100
+
+# Maximum number of values that the input manager of a process
+# takes from its input channels at once (see
+# MakeParallelNetworkParallel.Inbox.get_many).
+DEFAULT_INPUT_DRAIN_SIZE = 16 * DEFAULT_MESSAGE_BATCH_SIZE
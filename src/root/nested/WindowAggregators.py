@@ -0,0 +1,314 @@
+""" This module contains IncrementalWindow, the window
+passed to f by agents with f_type 'incremental_window'
+(see Operators.incremental_window_agent).
+
+A window agent with f_type 'window' gives f a new list of
+window_size elements at every step; so f takes time
+proportional to window_size at every step even if only
+step_size elements have changed. An IncrementalWindow is
+kept from step to step: the elements that enter the window
+are pushed into it and the elements that leave it are evicted.
+Aggregates of the window (sum, mean, variance, count, min,
+max and reductions with any associative operator) are updated
+as elements are pushed and evicted, in O(1) amortized time per
+element regardless of window_size.
+
+An aggregate is maintained from the first step at which f
+asks for it; that step takes time proportional to window_size.
+
+"""
+
+from collections import deque
+
+# Maximum number of reductions (see IncrementalWindow.reduce)
+# that a window maintains; the least recently used reduction is
+# dropped to make room for a new one.
+MAX_REDUCE_AGGREGATORS = 8
+
+
+class _SumAggregator(object):
+    def __init__(self):
+        self.total = 0
+
+    def push(self, index, value):
+        self.total += value
+
+    def evict(self, index, value):
+        self.total -= value
+
+
+class _MomentsAggregator(object):
+    """ Mean and sum of squared deviations from the mean
+    (Welford's method, with eviction).
+
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, index, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / float(self.n)
+        self.m2 += delta * (value - self.mean)
+
+    def evict(self, index, value):
+        self.n -= 1
+        if self.n == 0:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / float(self.n)
+        self.m2 -= delta * (value - self.mean)
+
+
+class _ExtremumAggregator(object):
+    """ The minimum (or maximum) of the window: a deque of
+    (index, value) whose values are increasing (decreasing).
+    The extremum is at the front of the deque.
+
+    """
+    def __init__(self, is_min):
+        self.is_min = is_min
+        self.candidates = deque()
+
+    def push(self, index, value):
+        candidates = self.candidates
+        if self.is_min:
+            while candidates and candidates[-1][1] >= value:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] <= value:
+                candidates.pop()
+        candidates.append((index, value))
+
+    def evict(self, index, value):
+        if self.candidates and self.candidates[0][0] == index:
+            self.candidates.popleft()
+
+
+class _InvertibleReduceAggregator(object):
+    """ op(x_1, .., x_n) for an op with an inverse:
+    inverse(op(a, b), a) == b.
+
+    """
+    def __init__(self, op, identity, inverse):
+        self.op = op
+        self.inverse = inverse
+        self.value = identity
+
+    def push(self, index, value):
+        self.value = self.op(self.value, value)
+
+    def evict(self, index, value):
+        self.value = self.inverse(self.value, value)
+
+
+class _TwoStackReduceAggregator(object):
+    """ op(x_1, .., x_n) for an associative op without an
+    inverse. New elements go on the back stack with the
+    reduction of the back stack. Elements are evicted from the
+    front stack, which holds, for each element, the reduction
+    of that element and the newer elements of the front stack;
+    when the front stack is empty the back stack is moved to it.
+
+    """
+    def __init__(self, op, identity):
+        self.op = op
+        self.identity = identity
+        self.front = []
+        self.back = []
+        self.back_value = None
+
+    def push(self, index, value):
+        self.back.append(value)
+        self.back_value = value if self.back_value is None else \
+          self.op(self.back_value, value)
+
+    def evict(self, index, value):
+        if not self.front:
+            op = self.op
+            accumulated = None
+            while self.back:
+                v = self.back.pop()
+                accumulated = v if accumulated is None else op(v, accumulated)
+                self.front.append(accumulated)
+            self.back_value = None
+        self.front.pop()
+
+    @property
+    def value(self):
+        if not self.front:
+            return self.identity if self.back_value is None else self.back_value
+        if self.back_value is None:
+            return self.front[-1]
+        return self.op(self.front[-1], self.back_value)
+
+
+class IncrementalWindow(object):
+    """
+    The elements of a sliding window and the aggregates of
+    the window that f has asked for.
+
+    Parameters
+    ----------
+    window_size: positive integer
+
+    Attributes
+    ----------
+    values: deque
+          The elements in the window, oldest first.
+    _num_evicted: nonnegative integer
+          The number of elements that have left the window;
+          the index of values[0] in the stream read by the
+          window.
+    _aggregators: dict
+          key: identifies an aggregate, e.g. 'sum' or
+               ('reduce', op, identity)
+          value: the aggregator that maintains it.
+    _reduce_keys: deque
+          The keys in _aggregators of the reductions, least
+          recently used first.
+
+    """
+    def __init__(self, window_size):
+        self.window_size = window_size
+        self.values = deque()
+        self._num_evicted = 0
+        self._aggregators = dict()
+        self._reduce_keys = deque()
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def push(self, value):
+        """ Add value to the end of the window. """
+        index = self._num_evicted + len(self.values)
+        self.values.append(value)
+        for aggregator in self._aggregators.itervalues():
+            aggregator.push(index, value)
+
+    def evict(self):
+        """ Remove the oldest element of the window. """
+        value = self.values.popleft()
+        for aggregator in self._aggregators.itervalues():
+            aggregator.evict(self._num_evicted, value)
+        self._num_evicted += 1
+
+    def clear(self):
+        while self.values:
+            self.evict()
+
+    def _aggregator(self, key, make_aggregator):
+        """ Return the aggregator for key, making it and
+        pushing the current window into it if necessary.
+        """
+        aggregator = self._aggregators.get(key)
+        if aggregator is None:
+            aggregator = make_aggregator()
+            for i, value in enumerate(self.values):
+                aggregator.push(self._num_evicted + i, value)
+            self._aggregators[key] = aggregator
+        return aggregator
+
+    def _reduce_aggregator(self, key, make_aggregator):
+        """ Like _aggregator, for a reduction. At most
+        MAX_REDUCE_AGGREGATORS reductions are kept, so that
+        an op made anew at every step, e.g. a lambda, does not
+        add an aggregator at every step.
+        """
+        if key in self._aggregators:
+            self._reduce_keys.remove(key)
+        elif len(self._reduce_keys) >= MAX_REDUCE_AGGREGATORS:
+            del self._aggregators[self._reduce_keys.popleft()]
+        self._reduce_keys.append(key)
+        return self._aggregator(key, make_aggregator)
+
+    def count(self):
+        return len(self.values)
+
+    def sum(self):
+        return self._aggregator('sum', _SumAggregator).total
+
+    def mean(self):
+        """ The mean of the window; nan if the window is
+        empty, as in numpy.mean.
+        """
+        moments = self._aggregator('moments', _MomentsAggregator)
+        if moments.n == 0:
+            return float('nan')
+        return moments.mean
+
+    def variance(self, ddof=0):
+        """ The variance of the window with ddof delta
+        degrees of freedom, as in numpy.var; nan if the window
+        has ddof elements or fewer.
+        """
+        moments = self._aggregator('moments', _MomentsAggregator)
+        if moments.n <= ddof:
+            return float('nan')
+        return moments.m2 / (moments.n - ddof)
+
+    def min(self):
+        """ The minimum of the window; raises ValueError if
+        the window is empty, as min() does.
+        """
+        aggregator = self._aggregator(
+            'min', lambda: _ExtremumAggregator(is_min=True))
+        if not aggregator.candidates:
+            raise ValueError('min() of an empty window')
+        return aggregator.candidates[0][1]
+
+    def max(self):
+        """ The maximum of the window; raises ValueError if
+        the window is empty, as max() does.
+        """
+        aggregator = self._aggregator(
+            'max', lambda: _ExtremumAggregator(is_min=False))
+        if not aggregator.candidates:
+            raise ValueError('max() of an empty window')
+        return aggregator.candidates[0][1]
+
+    def reduce(self, op, identity=None, inverse=None, name=None):
+        """
+        Return op(op(x_1, x_2), ..)) for the elements x_1, ..
+        of the window; identity if the window is empty.
+
+        The reduction is maintained from step to step for the
+        same op, identity and inverse objects, or for the same
+        name. Give a name if op is made anew at every step, e.g.
+        reduce(lambda a, b: a*b, 1, name='product'); otherwise
+        the reduction is recomputed from the whole window.
+
+        Parameters
+        ----------
+        op: function of two arguments
+              An associative operator.
+        identity: object (optional)
+              The identity of op.
+        inverse: function of two arguments (optional)
+              If given, inverse(op(a, b), a) == b. Evicting an
+              element then takes a single call to inverse;
+              otherwise the window keeps two stacks of partial
+              reductions. An inverse requires identity.
+        name: str (optional)
+              Identifies the reduction in place of op, identity
+              and inverse. Reductions with the same name must
+              compute the same thing.
+
+        """
+        if inverse is None:
+            key = ('reduce', op, identity) if name is None else ('reduce', name)
+            return self._reduce_aggregator(
+                key, lambda: _TwoStackReduceAggregator(op, identity)).value
+        if identity is None:
+            raise ValueError('reduce with an inverse requires an identity')
+        key = ('reduce', op, identity, inverse) if name is None else \
+          ('reduce', name)
+        return self._reduce_aggregator(
+            key, lambda: _InvertibleReduceAggregator(op, identity, inverse)).value
@@ -39,16 +39,17 @@ def main():
         print '---------In printer process. [', args, '] message = ', v
         return
 
-    # STEP 2 SPECIFY QUEUES, ONE FOR EACH PROCESS.
-    # Specify one multiprocessing.Queue for each process
-    # in the system, including the "__main__" process.
+    # STEP 2 SPECIFY INBOXES, ONE FOR EACH PROCESS.
+    # Specify one Inbox for each process in the system, with
+    # one input channel for each process that sends to it,
+    # including the "__main__" process.
     
-    # Input queue for the source_process
-    source_queue = Queue()
-    # Input queue for the split_process
-    split_queue = Queue()
-    # Input queue for the print_process
-    print_queue = Queue()
+    # Inbox of the source_process
+    source_inbox = Inbox([MAIN_CHANNEL_NAME])
+    # Inbox of the split_process
+    split_inbox = Inbox(['source_process'])
+    # Inbox of the print_process
+    print_inbox = Inbox(['split_process'])
 
     # STEP 3. SPECIFY THE NETWORK WITHIN EACH PROCESS
 
@@ -77,10 +78,11 @@ def main():
     # The output_stream_names_dict is a dict of stream names of
     # streams going from the network to outside the network. The
     # dict key is the stream name and its value is a
-    # list consisting of the multiprocessing.Queues to which
-    # the messages on this stream go.
+    # list consisting of the input channels (see Inbox) to
+    # which the messages on this stream go.
     # Note that every key must be in all_stream_names_tuple
-    source_output_stream_names_dict = {'source_stream': (split_queue,)}
+    source_output_stream_names_dict = {
+        'source_stream': (split_inbox.channel('source_process'),)}
  
     # STEP 3b. SPECIFY THE AGENTS:
     # Specify an agent_descriptor_dict for this network.
@@ -139,12 +141,12 @@ def main():
     # The output_stream_names_dict is a dict of stream names of
     # streams going from the network to outside the network. The
     # dict key is the stream name and its value is a
-    # list consisting of the multiprocessing.Queues to which
-    # the messages on this stream go.
+    # list consisting of the input channels (see Inbox) to
+    # which the messages on this stream go.
     # Note that every key must be in all_stream_names_tuple
     split_output_stream_names_dict = {
-        'multiples_of_even_stream': (print_queue,),
-        'multiples_of_odd_stream': (print_queue,)
+        'multiples_of_even_stream': (print_inbox.channel('split_process'),),
+        'multiples_of_odd_stream': (print_inbox.channel('split_process'),)
         }
  
     # STEP 3b. SPECIFY THE AGENTS:
@@ -219,8 +221,8 @@ def main():
     # The output_stream_names_dict is a dict of stream names of
     # streams going from the network to outside the network. The
     # dict key is the stream name and its value is a
-    # list consisting of the multiprocessing.Queues to which
-    # the messages on this stream go.
+    # list consisting of the input channels (see Inbox) to
+    # which the messages on this stream go.
     # Note that every key must be in all_stream_names_tuple
     print_output_stream_names_dict = {}
  
@@ -265,7 +267,7 @@ def main():
     source_process = Process(
         target=make_process,
         args= (
-            source_queue,
+            source_inbox,
             source_all_stream_names_tuple,
             source_input_stream_names_tuple,
             source_output_stream_names_dict,
@@ -275,7 +277,7 @@ def main():
     split_process = Process(
         target=make_process,
         args= (
-            split_queue,
+            split_inbox,
             split_all_stream_names_tuple,
             split_input_stream_names_tuple,
             split_output_stream_names_dict,
@@ -285,7 +287,7 @@ def main():
     print_process = Process(
         target=make_process,
         args= (
-            print_queue,
+            print_inbox,
             print_all_stream_names_tuple,
             print_input_stream_names_tuple,
             print_output_stream_names_dict,
@@ -298,8 +300,7 @@ def main():
     print_process.start()
 
     print'-----adding to queue-----'
-    source_queue.put(('trigger_stream', 0))
-    source_queue.put(('trigger_stream', 1))
+    source_inbox.channel(MAIN_CHANNEL_NAME).put(('trigger_stream', [0, 1]))
     
 if __name__ == '__main__':
     main()
@@ -0,0 +1,42 @@
+'''
+This module holds the components that draw with
+matplotlib. They are imported through ComponentRegistry
+only when a network uses them, so that networks without
+plotting do not import matplotlib.
+
+'''
+
+from random import randint
+import matplotlib.pyplot as plt
+
+
+# Tutorial
+def show(curr_num, stop_num):
+    if curr_num == int(stop_num[0]):
+        #plt.axes()
+        plt.xticks(())
+        plt.yticks(())
+        plt.axis('scaled')
+        plt.show()
+
+def make_circles(curr_num):
+    #j = curr_num * 0.1
+    j = randint(0, 9) * 0.1
+    k = randint(0, 9) * 0.1
+    circle = plt.Circle((j , k), radius=.1, fc='y')
+    plt.gca().add_patch(circle)
+    
+def make_rectangles(curr_num):
+    #j = curr_num * 0.1
+    j = randint(0, 9) * 0.1
+    k = randint(0, 9) * 0.1
+    rectangle = plt.Rectangle((j, k), .05, .1, fc='r')
+    plt.gca().add_patch(rectangle)
+    
+def make_triangles(curr_num):
+    j = randint(0, 9) * 0.1
+    k = randint(0, 9) * 0.1
+    points = [[1 * j, 1 * k], [0.05 + j, 0.05 + k], [j, 0.08 + k]]
+    polygon = plt.Polygon(points, fill='b')
+    plt.gca().add_patch(polygon)
+# End tutorial
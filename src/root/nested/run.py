@@ -10,9 +10,10 @@ import getpass
 
 from Subgraph import *
 from Multiprocessing import *
+from AutoPartition import auto_groups
 
 
-def dispatch(json_file_name):
+def dispatch(json_file_name, num_workers=None, stream_dtypes=None):
     '''
     Looks at input JSON file and determines
     which functions should be called to
@@ -22,10 +23,22 @@ def dispatch(json_file_name):
     ----------
     json_file_name : str
         Path to JSON file to be executed
+    num_workers : int, optional
+        If the JSON has no groups, profile the
+        network and partition it into this many
+        processes (see AutoPartition)
+    stream_dtypes : dict, optional
+        key: stream name, value: numpy dtype. Added to
+        the 'stream_dtypes' entry of the JSON file; these
+        streams are sent between processes through shared
+        memory (see GroupPlanner.plan_from_json)
 
     Returns
     -------
-    None
+    (processes, queues) returned by run_parallel if the JSON
+    has groups, with which the caller sends values of the
+    external input streams and stops the processes; None
+    otherwise
 
     '''
 
@@ -36,6 +49,10 @@ def dispatch(json_file_name):
     with open(agent_dict_json) as data_file:
         json_data = json.load(data_file)
 
+    # Choose the groups from measured costs of the network
+    if num_workers is not None and 'groups' not in json_data.keys():
+        json_data['groups'] = auto_groups(json_data, num_workers)
+
     # Case 1: No groups -> no parallel processing
     if 'groups' not in json_data.keys():
         # First expose nested subgraphs
@@ -46,9 +63,9 @@ def dispatch(json_file_name):
     # Case 2: Has groups -> parallel processing
     else:
         # Sort components into indicated processes
-        big_dict = parallel_dict(json_data)
+        plan = plan_from_json(json_data, stream_dtypes)
         # Then execute using multiprocessing
-        run_parallel(big_dict)
+        return run_parallel(plan)
 
 
 ###################################################
@@ -87,6 +104,8 @@ var5 = 'JSON/simplegroups.json'
 # If you're running from terminal:
 # Usage: navigate into the directory with this file
 #        type: python run.py NAME_OF_JSON_FILE
+#        or:   python run.py --workers N NAME_OF_JSON_FILE
+#              to run a JSON file without groups in N processes
 user_os = sys.platform
 user_name = getpass.getuser()
 
@@ -100,5 +119,9 @@ else:
     path = ''
 
 var = sys.argv
+workers = None
+if len(var) > 3 and var[1] == '--workers':
+    workers = int(var[2])
+    var = var[:1] + var[3:]
 fullpath = path + var[1]
-dispatch(fullpath)
+dispatch(fullpath, workers)
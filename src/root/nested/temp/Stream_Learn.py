@@ -24,7 +24,9 @@ def stream_learn(data_train, data_out, train_func, predict_func, window_size, st
     data_train : `Stream` or numpy.ndarray or other
         A `Stream` object or an `numpy` array containing data to be trained on. In the case of
         `Stream`, the `Stream` object contains tuples of values where each tuple represents a row
-        of data. Each tuple must have at least `num_features` values. In the case of an array,
+        of data. Each tuple must have at least `num_features` values. A `StreamArray` with
+        `num_columns` columns stores these rows contiguously, and its windows are passed to
+        `train_func` without conversion. In the case of an array,
         the array must have at least `num_features` columns. Any additional values / columns
         correspond to the output y data. If this is not a Stream or `numpy` array, the data will
         not be split into x and y.
@@ -155,7 +157,9 @@ def stream_learn(data_train, data_out, train_func, predict_func, window_size, st
 
 
     def train(lst):
-        data = np.array(lst)
+        # A window of a StreamArray with num_columns columns
+        # is already a 2-D array; do not copy it.
+        data = np.asarray(lst)
         x = data[:, 0:num_features]
         y = data[:, num_features:]
         model[0] = train_func(x, y, model[0])
@@ -0,0 +1,126 @@
+""" Tests of AutoPartition.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import json
+import os
+import unittest
+
+import ComponentRegistry
+from AutoPartition import auto_groups, partition_agents, cut_weight
+from AutoPartition import profile_network
+from GroupPlanner import plan_from_json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _heavy(v):
+    total = 0
+    for i in range(2000):
+        total += i
+    return v
+
+
+def _ignore(v):
+    return None
+
+
+def _chain(f_name):
+    """ A source s followed by agents h1, h2 and k that call
+    f_name; they read and write the streams x, y and z. """
+    return {
+        's': [[], ['x'], 'consecutive_ints', 'element', None, 1],
+        'h1': [['x'], ['y'], f_name, 'element', None, None],
+        'h2': [['y'], ['z'], f_name, 'element', None, None],
+        'k': [['z'], [], '_ignore', 'element', None, None]}
+
+
+class TestAutoPartition(unittest.TestCase):
+
+    def setUp(self):
+        ComponentRegistry.register_function('_heavy', _heavy)
+        ComponentRegistry.register_function('_ignore', _ignore)
+
+    def test_profile_network(self):
+        descriptors = _chain('_heavy')
+        agent_costs, stream_counts = profile_network(
+            ('x', 'y', 'z'), descriptors, 20)
+        # The source is called when it is made and at each step.
+        self.assertEqual(stream_counts, {'x': 21, 'y': 21, 'z': 21})
+        self.assertEqual(sorted(agent_costs), sorted(descriptors))
+        for agent_name in ('h1', 'h2'):
+            self.assertTrue(agent_costs[agent_name] >
+                            max(agent_costs['s'], agent_costs['k']))
+
+    def test_auto_groups_on_json_file(self):
+        with open(os.path.join(HERE, 'json_file.json')) as json_file:
+            json_data = json.load(json_file)
+        groups = auto_groups(json_data, 2, num_steps=5)
+        agent_names = sorted(name for names in groups.itervalues() for name in names)
+        self.assertEqual(agent_names, sorted(json_data['agent_descriptor_dict']))
+        self.assertTrue(1 <= len(groups) <= 2)
+        # The groups can be planned.
+        json_data['groups'] = groups
+        plan = plan_from_json(json_data)
+        self.assertEqual(sorted(plan.groups), sorted(groups))
+
+    def test_independent_chains_are_not_cut(self):
+        descriptors = dict()
+        for chain in 'ab':
+            descriptors[chain + '_source'] = \
+              [[], [chain + '1'], 'consecutive_ints', 'element', None, 1]
+            descriptors[chain + '_heavy'] = \
+              [[chain + '1'], [chain + '2'], '_heavy', 'element', None, None]
+            descriptors[chain + '_last'] = \
+              [[chain + '2'], [], '_ignore', 'element', None, None]
+        groups = auto_groups({'agent_descriptor_dict': descriptors}, 2, num_steps=20)
+        self.assertEqual(len(groups), 2)
+        for agent_names in groups.itervalues():
+            self.assertEqual(len(set(name[0] for name in agent_names)), 1)
+
+    def test_balance_before_cut(self):
+        descriptors = {
+            's': [[], ['x'], 'f', 'element', None, 1],
+            'h1': [['x'], ['y'], 'f', 'element', None, None],
+            'h2': [['y'], ['z'], 'f', 'element', None, None],
+            'k': [['z'], [], 'f', 'element', None, None]}
+        costs = {'s': 0.01, 'h1': 1.0, 'h2': 1.0, 'k': 0.01}
+        counts = {'x': 100, 'y': 10, 'z': 100}
+        groups = partition_agents(descriptors, costs, counts, 2)
+        # The two heavy agents are in different groups, and the
+        # lightest edge is the one that is cut.
+        self.assertEqual(cut_weight(groups, descriptors, counts), 10)
+
+    def test_one_worker(self):
+        descriptors = _chain('_heavy')
+        costs = {'s': 0.01, 'h1': 1.0, 'h2': 1.0, 'k': 0.01}
+        counts = {'x': 100, 'y': 10, 'z': 100}
+        groups = partition_agents(descriptors, costs, counts, 1)
+        self.assertEqual(groups, {'group_0': ['h1', 'h2', 'k', 's']})
+        self.assertEqual(cut_weight(groups, descriptors, counts), 0)
+
+    def test_groups_are_balanced(self):
+        descriptors = _chain('_heavy')
+        costs = dict((name, 1.0) for name in descriptors)
+        counts = {'x': 10, 'y': 10, 'z': 10}
+        groups = partition_agents(descriptors, costs, counts, 2)
+        self.assertEqual(sorted(len(names) for names in groups.itervalues()),
+                         [2, 2])
+        # The chain is cut once.
+        self.assertEqual(cut_weight(groups, descriptors, counts), 10)
+
+    def test_more_workers_than_agents(self):
+        descriptors = _chain('_heavy')
+        costs = dict((name, 1.0) for name in descriptors)
+        counts = {'x': 10, 'y': 10, 'z': 10}
+        groups = partition_agents(descriptors, costs, counts, 8)
+        agent_names = sorted(name for names in groups.itervalues() for name in names)
+        self.assertEqual(agent_names, sorted(descriptors))
+        self.assertTrue(all(groups.itervalues()))
+
+
+if __name__ == '__main__':
+    unittest.main()
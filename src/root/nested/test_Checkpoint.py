@@ -0,0 +1,147 @@
+""" Tests of Checkpoint.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import cPickle
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from Stream import Stream, StreamArray
+from Agent import Agent
+from Checkpoint import save_network, restore_network
+
+
+def _running_sum(in_lists, state):
+    """ Append the running sum of the values read. """
+    in_list = in_lists[0]
+    sums = []
+    for value in in_list.list[in_list.start:in_list.stop]:
+        state += value
+        sums.append(state)
+    return [sums], state, [in_list.stop]
+
+
+def _make_network(storage=None):
+    x, y = StreamArray('x', storage=storage), Stream('y')
+    agent = Agent([x], [y], _running_sum, 0)
+    return {'x': x, 'y': y}, {'sum': agent}
+
+
+def _recent(stream):
+    return list(stream.recent[:stream.stop])
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, 'checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _check_round_trip(self, storage):
+        stream_dict, agent_dict = _make_network(storage)
+        for value in range(10000):
+            stream_dict['x'].append(value)
+        save_network(self.file_name, stream_dict, agent_dict)
+
+        stream_dict, agent_dict = _make_network(storage)
+        restore_network(self.file_name, stream_dict, agent_dict)
+        self.assertEqual(agent_dict['sum'].state, sum(range(10000)))
+        stream_dict['x'].extend(np.arange(10000.0, 10003.0))
+        self.assertEqual(_recent(stream_dict['y'])[-3:],
+                         [sum(range(10000 + k)) for k in (1, 2, 3)])
+
+    def test_round_trip(self):
+        self._check_round_trip('list')
+
+    def test_round_trip_ring(self):
+        self._check_round_trip('ring')
+
+    def test_only_unread_values_are_saved(self):
+        stream_dict, agent_dict = _make_network()
+        for value in range(10000):
+            stream_dict['x'].append(value)
+        save_network(self.file_name, stream_dict, agent_dict)
+        with open(self.file_name, 'rb') as checkpoint_file:
+            checkpoint = cPickle.load(checkpoint_file)
+        window, offset, starts, capacity, history = checkpoint['streams']['x']
+        self.assertEqual(len(window), 0)
+        self.assertEqual(offset, 10000)
+        self.assertEqual(starts, {'sum': 0})
+        self.assertEqual(history, None)
+        self.assertFalse(os.path.exists(self.file_name + '.tmp'))
+
+    def test_reader_not_in_checkpoint(self):
+        stream_dict, agent_dict = _make_network()
+        stream_dict['x'].extend(np.arange(5.0))
+        save_network(self.file_name, stream_dict, agent_dict)
+
+        stream_dict, agent_dict = _make_network()
+        x = stream_dict['x']
+        other = object()
+        x.extend(np.arange(100.0))
+        x.reader(other, 50)
+        restore_network(self.file_name, stream_dict, agent_dict)
+        # The reader starts at the first restored value.
+        self.assertEqual(x.start[other], 0)
+        self.assertEqual(x.slowest_reader_lag, 0)
+
+    def test_capacity(self):
+        stream_dict, agent_dict = _make_network()
+        stream_dict['y'].set_capacity(max_elements=7,
+                                      overflow_policy='drop_oldest')
+        save_network(self.file_name, stream_dict, agent_dict)
+
+        stream_dict, agent_dict = _make_network()
+        restore_network(self.file_name, stream_dict, agent_dict)
+        y = stream_dict['y']
+        self.assertEqual((y.max_elements, y.max_bytes, y.overflow_policy),
+                         (7, None, 'drop_oldest'))
+        self.assertEqual(y._capacity, 7)
+
+    def test_history(self):
+        history_directory = os.path.join(self.directory, 'history')
+        stream_dict, agent_dict = _make_network()
+        x = stream_dict['x']
+        x.keep_history(history_directory, segment_size=1000)
+        for k in range(20):
+            x.extend(np.arange(800.0 * k, 800.0 * (k + 1)))
+        offset = x.offset
+        self.assertTrue(offset > 0)
+        save_network(self.file_name, stream_dict, agent_dict)
+        # The network runs on after the checkpoint and adds
+        # values to the history.
+        for k in range(20, 40):
+            x.extend(np.arange(800.0 * k, 800.0 * (k + 1)))
+        x.history.flush()
+        self.assertTrue(x.history.length > offset)
+
+        stream_dict, agent_dict = _make_network()
+        restore_network(self.file_name, stream_dict, agent_dict)
+        x = stream_dict['x']
+        self.assertEqual(x.offset, offset)
+        self.assertEqual(x.history.length, offset)
+        self.assertTrue(np.array_equal(x.get_range(0, 16000),
+                                       np.arange(16000.0)))
+        x.extend(np.arange(16000.0, 17000.0))
+        self.assertEqual(_recent(stream_dict['y'])[-1], sum(range(17000)))
+
+    def test_version(self):
+        with open(self.file_name, 'wb') as checkpoint_file:
+            cPickle.dump({'version': -1}, checkpoint_file)
+        stream_dict, agent_dict = _make_network()
+        self.assertRaises(ValueError, restore_network, self.file_name,
+                          stream_dict, agent_dict)
+
+
+if __name__ == '__main__':
+    unittest.main()
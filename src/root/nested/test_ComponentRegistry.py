@@ -0,0 +1,49 @@
+""" Tests of ComponentRegistry.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import sys
+import unittest
+
+from ComponentRegistry import is_registered, get_component, register
+from ComponentRegistry import registered_location, resolve_functions
+import components
+
+
+def triple(v):
+    return 3 * v
+
+
+class TestComponentRegistry(unittest.TestCase):
+
+    def test_functions_of_the_component_module(self):
+        self.assertTrue(is_registered('consecutive_ints'))
+        self.assertIs(get_component('multiply_elements'),
+                      components.multiply_elements)
+
+    def test_imported_names_are_not_components(self):
+        for name in ('randint', '_no_value', '_multivalue', 'no_such_name'):
+            self.assertFalse(is_registered(name))
+            self.assertRaises(KeyError, get_component, name)
+
+    def test_module_is_imported_on_first_use(self):
+        register('triple_value', 'test_ComponentRegistry', 'triple')
+        self.assertEqual(registered_location('triple_value'),
+                         ('test_ComponentRegistry', 'triple'))
+        self.assertTrue(is_registered('triple_value'))
+        descriptors = {'t': [['x'], ['y'], 'triple_value', 'element', None, None]}
+        resolve_functions(descriptors)
+        self.assertIs(descriptors['t'][2], triple)
+
+    def test_plot_components_are_registered_lazily(self):
+        self.assertEqual(registered_location('show')[0], 'plot_components')
+        if 'plot_components' not in sys.modules:
+            self.assertTrue(is_registered('show'))
+            self.assertNotIn('plot_components', sys.modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
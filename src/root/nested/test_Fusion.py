@@ -0,0 +1,120 @@
+""" Tests of Fusion.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import unittest
+
+from Fusion import fuse_element_chains, _FusedState
+from MakeNetworkParallel import make_network
+from Stream import _no_value, _multivalue
+from components import multiply_elements, split_into_even_odd
+
+STREAM_NAMES = ('x', 'a', 'b', 'even', 'odd')
+
+
+def _descriptors():
+    """ x -> times_2 -> a -> plus_one -> b -> parity -> even, odd """
+    return {
+        'times_2': [['x'], ['a'], multiply_elements, 'element', (2,), None, ['x']],
+        'plus_one': [['a'], ['b'], lambda v: v + 1, 'element', None, None, ['a']],
+        'parity': [['b'], ['even', 'odd'], split_into_even_odd, 'element',
+                   None, None, ['b']],
+    }
+
+
+def _recent(stream):
+    return list(stream.recent[:stream.stop])
+
+
+class TestFuseElementChains(unittest.TestCase):
+
+    def test_chain_is_fused(self):
+        stream_names, descriptors, fused_names = \
+          fuse_element_chains(STREAM_NAMES, _descriptors())
+        self.assertEqual(stream_names, ('x', 'even', 'odd'))
+        self.assertEqual(descriptors.keys(), ['times_2+plus_one+parity'])
+        descriptor = descriptors['times_2+plus_one+parity']
+        self.assertEqual(descriptor[0], ['x'])
+        self.assertEqual(descriptor[1], ['even', 'odd'])
+        self.assertEqual(descriptor[3], 'list')
+        self.assertIsInstance(descriptor[5], _FusedState)
+        self.assertEqual(set(fused_names), set(['times_2', 'plus_one', 'parity']))
+
+    def test_exposed_stream_is_kept(self):
+        stream_names, descriptors, fused_names = \
+          fuse_element_chains(STREAM_NAMES, _descriptors(), exposed_stream_names=['a'])
+        self.assertEqual(sorted(descriptors), ['plus_one+parity', 'times_2'])
+        self.assertIn('a', stream_names)
+        self.assertNotIn('b', stream_names)
+        self.assertNotIn('times_2', fused_names)
+
+    def test_agent_without_call_list_is_not_fused(self):
+        descriptors = _descriptors()
+        descriptors['plus_one'][6] = None
+        stream_names, descriptors, fused_names = \
+          fuse_element_chains(STREAM_NAMES, descriptors)
+        # plus_one is not called when a is modified; it may
+        # only start a chain, whose agent is not called either.
+        self.assertNotIn('times_2', fused_names)
+        self.assertIs(descriptors['plus_one+parity'][6], None)
+
+    def test_fused_network_computes_the_same_values(self):
+        results = []
+        for fuse in (False, True):
+            stream_dict, agent_dict = make_network(
+                STREAM_NAMES, _descriptors(), fuse=fuse)
+            stream_dict['x'].extend(range(10))
+            results.append((_recent(stream_dict['even']),
+                            _recent(stream_dict['odd'])))
+            self.assertIs(agent_dict['times_2'] is agent_dict['parity'], fuse)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], ([], [2 * v + 1 for v in range(10)]))
+
+    def test_states_no_value_and_multivalue(self):
+        def running_sum(v, state):
+            state += v
+            return state, state
+
+        def odd_only(v):
+            return v if v % 2 else _no_value
+
+        def twice(v):
+            return _multivalue([v, v])
+        descriptors = {
+            'sum': [['x'], ['a'], running_sum, 'element', None, 0, ['x']],
+            'odd': [['a'], ['b'], odd_only, 'element', None, None, ['a']],
+            'twice': [['b'], ['c'], twice, 'element', None, None, ['b']],
+        }
+        results = []
+        for fuse in (False, True):
+            stream_dict, agent_dict = make_network(
+                ('x', 'a', 'b', 'c'), descriptors, fuse=fuse)
+            stream_dict['x'].extend(range(6))
+            stream_dict['x'].extend(range(6))
+            results.append(_recent(stream_dict['c']))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1], [1, 1, 3, 3, 15, 15, 15, 15, 21, 21, 25, 25])
+        self.assertEqual(agent_dict['sum'].state.states, [30, None, None])
+
+    def test_stream_with_two_readers_is_kept(self):
+        descriptors = _descriptors()
+        descriptors['copy'] = [['a'], ['c'], lambda v: v, 'element',
+                               None, None, ['a']]
+        stream_names, descriptors, fused_names = \
+          fuse_element_chains(STREAM_NAMES + ('c',), descriptors)
+        self.assertIn('a', stream_names)
+        self.assertEqual(sorted(descriptors), ['copy', 'plus_one+parity', 'times_2'])
+
+    def test_timer_driven(self):
+        descriptors = _descriptors()
+        descriptors['plus_one'][6] = None
+        stream_names, descriptors, fused_names = \
+          fuse_element_chains(STREAM_NAMES, descriptors, timer_driven=True)
+        self.assertEqual(descriptors.keys(), ['times_2+plus_one+parity'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+""" Tests of GraphToProgram.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import json
+import os
+import unittest
+
+from GraphToProgram import compile_network, load_program, benchmark
+from MakeNetworkParallel import make_network
+from ComponentRegistry import resolve_functions, register
+from Scheduler import topological_ranks
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+STREAM_NAMES = ('a', 'b', 'multiples', 'others', 'even', 'odd')
+DESCRIPTORS = {
+    'source': [[], ['a'], 'consecutive_ints', 'element', None, 1],
+    'times_3': [['a'], ['b'], 'multiply_elements', 'element', (3,), None],
+    'by_4': [['b'], ['multiples', 'others'], 'split', 'element', (4,), None],
+    'parity': [['others'], ['even', 'odd'], 'split_into_even_odd', 'element',
+               None, None],
+}
+
+
+def _run_network(num_steps):
+    """ Run DESCRIPTORS with make_network, one step of every
+    agent, in topological order, per step.
+    """
+    descriptors = dict(
+        (name, list(descriptor) + [[name + ':timer']])
+        for name, descriptor in DESCRIPTORS.iteritems())
+    resolve_functions(descriptors)
+    ranks = topological_ranks(descriptors)
+    order = sorted(descriptors, key=lambda name: ranks[name])
+    stream_dict, agent_dict = make_network(
+        STREAM_NAMES + tuple(name + ':timer' for name in order), descriptors)
+    for step in range(num_steps):
+        for name in order:
+            stream_dict[name + ':timer'].append(step)
+    return stream_dict
+
+
+def count_from(state=None):
+    """ A source that works with and without a state. """
+    return 100 if state is None else state
+
+
+class TestGraphToProgram(unittest.TestCase):
+
+    def test_program_computes_what_the_network_computes(self):
+        program = load_program(compile_network(STREAM_NAMES, DESCRIPTORS))
+        collected = program.run(10, collect=STREAM_NAMES)
+        self.assertEqual(collected['b'], [6] * 10)
+        self.assertEqual(collected['others'], [6] * 10)
+        self.assertEqual(collected['even'], [6] * 10)
+        self.assertEqual(collected['multiples'], [])
+        self.assertEqual(collected['odd'], [])
+        # A source of the network produces one more value, when
+        # it is made; compare the values of the program.
+        stream_dict = _run_network(10)
+        for name in STREAM_NAMES:
+            stream = stream_dict[name]
+            self.assertEqual(list(stream.recent[:len(collected[name])]),
+                             collected[name])
+
+    def test_program_only_imports_components(self):
+        program = compile_network(STREAM_NAMES, DESCRIPTORS)
+        imports = [line for line in program.splitlines()
+                   if line.startswith('import ') or line.startswith('from ')]
+        self.assertEqual(imports, ['import components as components',
+                                   'from components import _no_value, _multivalue'])
+
+    def test_cycle_and_f_type_are_rejected(self):
+        cycle = {'f': [['y'], ['x'], 'multiply_elements', 'element', (2,), None],
+                 'g': [['x'], ['y'], 'multiply_elements', 'element', (2,), None]}
+        self.assertRaises(ValueError, compile_network, ('x', 'y'), cycle)
+        window = {'f': [['x'], ['y'], 'multiply_elements', 'window', (2,), None],
+                  's': [[], ['x'], 'consecutive_ints', 'element', None, 1]}
+        self.assertRaises(ValueError, compile_network, ('x', 'y'), window)
+
+    def test_benchmark_json_file(self):
+        with open(os.path.join(HERE, 'json_file.json')) as json_file:
+            json_data = json.load(json_file)
+        network_time, program_time = benchmark(
+            json_data['stream_names_tuple'], json_data['agent_descriptor_dict'], 5)
+        self.assertTrue(network_time > 0 and program_time > 0)
+
+    def test_source_with_false_state(self):
+        register('count_from', 'test_GraphToProgram')
+        descriptors = {
+            'zero': [[], ['z'], 'count_from', 'element', None, 0],
+            'seven': [[], ['s'], 'count_from', 'element', None, 7],
+        }
+        program = compile_network(('z', 's'), descriptors)
+        self.assertIn('import test_GraphToProgram as module_1', program)
+        module = load_program(program)
+        collected = module.run(2, collect=('z', 's'))
+        # element_agent calls a source with state 0 without it.
+        self.assertEqual(collected, {'z': [100, 100], 's': [7, 7]})
+
+    def test_registered_component_module(self):
+        descriptors = {
+            'source': [[], ['a'], 'consecutive_ints', 'element', None, 1],
+            'plot': [['a'], [], 'show', 'element', None, None],
+        }
+        program = compile_network(('a',), descriptors)
+        self.assertIn('import plot_components as module_1', program)
+        self.assertIn('= module_1.show', program)
+        self.assertIn('= components.consecutive_ints', program)
+
+
+if __name__ == '__main__':
+    unittest.main()
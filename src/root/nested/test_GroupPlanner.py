@@ -0,0 +1,149 @@
+""" Tests of GroupPlanner.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import cPickle
+import json
+import unittest
+
+import numpy as np
+
+from GroupPlanner import plan_from_json, make_plan, normalize_descriptor
+from GroupPlanner import FrozenDict, ReplicaSpec, LEFTOVER_GROUP_NAME
+from GroupPlanner import SOURCE_TRIGGER_STREAM_NAME, reachable_groups
+
+# Descriptors as they are read from JSON: unicode names, lists,
+# and no call lists.
+JSON_DATA = json.loads('''{
+    "agent_descriptor_dict": {
+        "source": [[], ["a"], "consecutive_ints", "element", null, 1],
+        "times_2": [["a"], ["b"], "multiply_elements", "element", [2], null],
+        "sink": [["b"], [], "print_value", "element", null, null]
+    },
+    "stream_names_tuple": ["a", "b"],
+    "groups": {"first": ["source"], "second": ["times_2", "sink"]},
+    "stream_dtypes": {"a": "int64"}
+}''')
+
+
+class TestNormalizeDescriptor(unittest.TestCase):
+
+    def test_json_values(self):
+        descriptor = JSON_DATA['agent_descriptor_dict']['times_2']
+        self.assertEqual(
+            normalize_descriptor(descriptor),
+            (('a',), ('b',), 'multiply_elements', 'element', (2,), None, None))
+        f_type = normalize_descriptor(descriptor)[3]
+        self.assertIs(f_type, 'element')
+        self.assertEqual(
+            normalize_descriptor([[], [], 'f', 'element', 'null', 'None', [u'x']])[4:],
+            (None, None, ('x',)))
+
+
+class TestMakePlan(unittest.TestCase):
+
+    def _plan(self, groups, **kwargs):
+        return make_plan(['a', 'b'], JSON_DATA['agent_descriptor_dict'],
+                         groups, **kwargs)
+
+    def test_groups(self):
+        plan = self._plan({'first': ['source'], 'second': ['times_2', 'sink']})
+        self.assertEqual(plan.group_of_agent['sink'], 'second')
+        self.assertEqual(plan.producer_of_stream['b'], 'times_2')
+        self.assertEqual(plan.consumers_of_stream['a'], ('times_2',))
+        first, second = plan.groups['first'], plan.groups['second']
+        # The source is called by the trigger stream, an external
+        # input of its group.
+        self.assertEqual(first.input_stream_names_tuple,
+                         (SOURCE_TRIGGER_STREAM_NAME,))
+        self.assertEqual(dict(first.output_stream_names_dict), {'a': ('second',)})
+        self.assertEqual(second.input_stream_names_tuple, ('a',))
+        self.assertEqual(second.all_stream_names_tuple, ('a', 'b'))
+        self.assertEqual(sorted(plan.stream_ids), ['a', SOURCE_TRIGGER_STREAM_NAME])
+        self.assertEqual(dict(plan.codecs),
+                         {'a': 'pickle', SOURCE_TRIGGER_STREAM_NAME: 'pickle'})
+        self.assertEqual(plan.external_input_stream_names,
+                         (SOURCE_TRIGGER_STREAM_NAME,))
+        self.assertRaises(TypeError, plan.groups.__setitem__, 'third', None)
+
+    def test_default_call_lists(self):
+        plan = self._plan({'first': ['source'], 'second': ['times_2', 'sink']})
+        descriptors = plan.groups['second'].agent_descriptor_dict
+        self.assertEqual(descriptors['times_2'][6], ('a',))
+        self.assertEqual(descriptors['sink'][6], ('b',))
+        descriptors = plan.groups['first'].agent_descriptor_dict
+        self.assertEqual(descriptors['source'][6], (SOURCE_TRIGGER_STREAM_NAME,))
+
+    def test_leftover_group(self):
+        plan = self._plan({'first': ['source']})
+        self.assertEqual(sorted(plan.groups), ['first', LEFTOVER_GROUP_NAME])
+        self.assertEqual(plan.group_of_agent['sink'], LEFTOVER_GROUP_NAME)
+
+    def test_errors(self):
+        self.assertRaises(ValueError, self._plan, {'first': ['no_such_agent']})
+        self.assertRaises(ValueError, self._plan,
+                          {'first': ['source'], 'second': ['source']})
+        self.assertRaises(ValueError, self._plan, {'first': ['source']},
+                          codecs={'b': 'pickle'})
+        self.assertRaises(ValueError, self._plan, {'first': ['source']},
+                          codecs={'a': 'no_such_codec'})
+
+    def test_replicas(self):
+        plan = self._plan({'first': ['source'], 'second': ['times_2', 'sink']},
+                          replicas={'second': {'replicas': 2, 'ordered': True}})
+        self.assertEqual(plan.replicas['second'],
+                         ReplicaSpec(2, 'round_robin', None, True))
+        # A replicated group may not have a source.
+        self.assertRaises(ValueError, self._plan, {'first': ['source']},
+                          replicas={'first': 2})
+        # Even one that is called by the input of the group.
+        descriptors = dict(JSON_DATA['agent_descriptor_dict'])
+        descriptors['source_2'] = [[], ['c'], 'consecutive_ints', 'element',
+                                   None, 1, ['b']]
+        self.assertRaisesRegexp(
+            ValueError, 'source agent', make_plan, ['a', 'b', 'c'], descriptors,
+            {'first': ['source', 'times_2'], 'second': ['sink', 'source_2']},
+            replicas={'second': 2})
+
+    def test_reachable_groups(self):
+        plan = self._plan({'first': ['source'], 'second': ['times_2'],
+                           'third': ['sink']})
+        self.assertEqual(reachable_groups(plan.groups),
+                         {'first': set(['second', 'third']),
+                          'second': set(['third']), 'third': set()})
+        # Groups that send streams to each other are in a cycle.
+        plan = self._plan({'first': ['source', 'sink'], 'second': ['times_2']})
+        self.assertEqual(reachable_groups(plan.groups),
+                         {'first': set(['first', 'second']),
+                          'second': set(['first', 'second'])})
+
+    def test_plan_can_be_pickled(self):
+        plan = self._plan({'first': ['source']})
+        copy = cPickle.loads(cPickle.dumps(plan, cPickle.HIGHEST_PROTOCOL))
+        self.assertIsInstance(copy.groups, FrozenDict)
+        self.assertEqual(copy, plan)
+
+
+class TestPlanFromJson(unittest.TestCase):
+
+    def test_stream_dtypes_are_read(self):
+        plan = plan_from_json(JSON_DATA)
+        self.assertEqual(dict(plan.stream_dtypes), {'a': np.dtype('int64')})
+        self.assertIs(type(plan.stream_dtypes.keys()[0]), str)
+        self.assertEqual(plan.codecs['a'], 'numeric')
+
+    def test_stream_dtypes_argument_is_added(self):
+        plan = plan_from_json(JSON_DATA, {'a': np.float32, 'b': np.float64})
+        self.assertEqual(dict(plan.stream_dtypes),
+                         {'a': np.float32, 'b': np.float64})
+
+    def test_unknown_dtype(self):
+        json_data = dict(JSON_DATA, stream_dtypes={'a': 'no_such_dtype'})
+        self.assertRaises(ValueError, plan_from_json, json_data)
+
+
+if __name__ == '__main__':
+    unittest.main()
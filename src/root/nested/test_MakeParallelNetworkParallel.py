@@ -0,0 +1,189 @@
+""" Tests of MakeParallelNetworkParallel.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import time
+import unittest
+
+from Stream import Stream, StreamArray
+from MakeParallelNetworkParallel import make_output_manager, CreditGrant
+from MakeParallelNetworkParallel import make_input_manager
+from MakeParallelNetworkParallel import Inbox, ReplicaRouter, MessageTag
+from Serializers import MessageSerializer
+
+
+class _Receiver(object):
+    """ Records the values of the messages put on it, as a
+    queue would when it pickles them.
+    """
+    def __init__(self):
+        self.messages = []
+
+    def put(self, message):
+        self.messages.append((message[0], list(message[1])) + message[2:])
+
+    def values(self):
+        return [v for message in self.messages for v in message[1]]
+
+
+class TestOutputBatcher(unittest.TestCase):
+
+    def _check_delayed_batch(self, stream, first_batch, second_batch):
+        receiver = _Receiver()
+        # The batch is not sent before flush.
+        output_batcher = make_output_manager(
+            {'x': stream}, {'x': [receiver]}, batch_size=10**6, max_delay=60)
+        for value in first_batch:
+            stream.append(value)
+        for value in second_batch:
+            stream.append(value)
+        output_batcher.flush()
+        # Not assertEqual: the diff of long lists is slow.
+        self.assertTrue(receiver.values() == list(first_batch) + list(second_batch))
+
+    def test_ring_storage_is_copied(self):
+        # The values of the first batch are overwritten in the
+        # ring by the second batch after the output manager
+        # has read them; the ring does not grow.
+        stream = StreamArray('x', storage='ring', dtype=int)
+        n = len(stream.recent)
+        self._check_delayed_batch(stream, range(n), range(n, 3 * n))
+        self.assertEqual(len(stream.recent), n)
+
+    def test_list_storage(self):
+        stream = Stream('x')
+        self._check_delayed_batch(stream, ['a', 'b'], ['c'])
+
+    def test_held_values_are_copied(self):
+        stream = StreamArray('x', storage='ring', dtype=int)
+        n = len(stream.recent)
+        receiver = _Receiver()
+        output_batcher = make_output_manager(
+            {'x': stream}, {'x': [receiver]}, batch_size=1, max_delay=60,
+            credit_window=2, receiver_names={'x': ['g']})
+        for value in range(3 * n):
+            stream.append(value)
+        self.assertEqual(receiver.values(), [0, 1])
+        self.assertTrue(output_batcher.blocked)
+        output_batcher.grant(CreditGrant('x', 'g', 3 * n))
+        self.assertTrue(receiver.values() == range(3 * n))
+
+
+def _get_batches(inbox, num_messages, max_size=100):
+    """ Call inbox.get_many until num_messages messages have
+    been received. Returns the lists of messages it returned.
+    """
+    batches = []
+    deadline = time.time() + 5
+    while sum(len(batch) for batch in batches) < num_messages and \
+      time.time() < deadline:
+        batches.append(inbox.get_many(max_size, timeout=5))
+    return batches
+
+
+class TestInbox(unittest.TestCase):
+
+    def test_channels_are_read_in_turn(self):
+        inbox = Inbox(['g', 'h'])
+        g, h = inbox.channel('g'), inbox.channel('h')
+        for k in range(3):
+            g.put(('x', [k]))
+        h.put(('y', [10]))
+        messages = sum(_get_batches(inbox, 4), [])
+        # The messages of each channel are in order.
+        self.assertEqual([m for m in messages if m[0] == 'x'],
+                         [('x', [0]), ('x', [1]), ('x', [2])])
+        self.assertEqual([m for m in messages if m[0] == 'y'], [('y', [10])])
+        self.assertEqual(inbox.get_many(100, timeout=0.01), [])
+
+    def test_max_size(self):
+        inbox = Inbox(['g'])
+        channel = inbox.channel('g')
+        for k in range(3):
+            channel.put(('x', [k, k]))
+        batches = _get_batches(inbox, 3, max_size=3)
+        # A batch ends with the message that reaches max_size.
+        self.assertTrue(all(1 <= len(batch) <= 2 for batch in batches))
+        self.assertEqual(sum(batches, []), [('x', [k, k]) for k in range(3)])
+
+    def test_serializer(self):
+        inbox = Inbox(['g'], MessageSerializer({'x': 0}, {'x': 'numeric'}))
+        inbox.channel('g').put(('x', [1.0, 2.0]))
+        inbox.channel('g').put(CreditGrant('x', 'g', 5))
+        messages = sum(_get_batches(inbox, 2), [])
+        self.assertEqual(messages[0][0], 'x')
+        self.assertEqual(list(messages[0][1]), [1.0, 2.0])
+        self.assertEqual(messages[1], CreditGrant('x', 'g', 5))
+
+
+class _StopInputManager(Exception):
+    pass
+
+
+class _ScriptedInbox(object):
+    """ An inbox whose get_many returns the given lists of
+    messages in turn, and then stops the input manager.
+    """
+    def __init__(self, batches):
+        self.batches = list(batches)
+
+    def get_many(self, max_size, timeout=None):
+        if not self.batches:
+            raise _StopInputManager()
+        return self.batches.pop(0)
+
+
+class TestInputManager(unittest.TestCase):
+
+    def test_no_messages_without_output_batcher(self):
+        # A process without outputs has no output batcher to
+        # flush when get_many returns no messages.
+        x = Stream('x')
+        inbox = _ScriptedInbox([[], [('x', [1, 2])], []])
+        self.assertRaises(_StopInputManager, make_input_manager,
+                          inbox, {'x': x})
+        self.assertEqual(x.recent[:x.stop], [1, 2])
+
+    def test_no_messages_flushes_output_batcher(self):
+        x, y = Stream('x'), Stream('y')
+        receiver = _Receiver()
+        output_batcher = make_output_manager(
+            {'y': y}, {'y': [receiver]}, batch_size=10**6, max_delay=60)
+        y.extend([3, 4])
+        inbox = _ScriptedInbox([[]])
+        self.assertRaises(_StopInputManager, make_input_manager,
+                          inbox, {'x': x}, output_batcher)
+        self.assertEqual(receiver.values(), [3, 4])
+
+
+class TestReplicaRouter(unittest.TestCase):
+
+    def test_round_robin_ordered(self):
+        replicas = [_Receiver(), _Receiver()]
+        router = ReplicaRouter(replicas, ordered=True)
+        for k in range(3):
+            router.put(('x', [k]))
+        self.assertEqual(replicas[0].messages,
+                         [('x', [0], MessageTag(0, None)),
+                          ('x', [2], MessageTag(2, None))])
+        self.assertEqual(replicas[1].messages, [('x', [1], MessageTag(1, None))])
+
+    def test_hash(self):
+        replicas = [_Receiver(), _Receiver(), _Receiver()]
+        router = ReplicaRouter(replicas, 'hash', key=lambda v: v % 10)
+        router.put(('x', range(30)))
+        # Values with the same key go to the same replica.
+        keys = [set(v % 10 for v in replica.values()) for replica in replicas]
+        self.assertEqual(sum(len(k) for k in keys), 10)
+        self.assertEqual(sorted(v for r in replicas for v in r.values()), range(30))
+
+    def test_errors(self):
+        self.assertRaises(ValueError, ReplicaRouter, [], 'random')
+        self.assertRaises(ValueError, ReplicaRouter, [], 'hash', ordered=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+""" Tests of Metrics.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import unittest
+import urllib2
+
+import Metrics
+from Stream import Stream, StreamArray
+from Agent import Agent
+
+
+def _copy(in_lists, state):
+    in_list = in_lists[0]
+    return [in_list.list[in_list.start:in_list.stop]], state, [in_list.stop]
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        Metrics.reset()
+        Metrics.enable()
+
+    def tearDown(self):
+        Metrics.disable()
+        Metrics.reset()
+
+    def test_counts(self):
+        x, y = Stream('x'), Stream('y')
+        Agent([x], [y], _copy, name='copy')
+        x.extend([1, 2, 3])
+        x.append(4)
+        metrics = Metrics.snapshot()
+        self.assertEqual(metrics['streams']['x']['num_appended'], 4)
+        self.assertEqual(metrics['streams']['y']['num_appended'], 4)
+        self.assertEqual(metrics['streams']['x']['reader_lag'], {'copy': 0})
+        # The agent is also called when it is made.
+        self.assertEqual(metrics['agents']['copy']['num_calls'], 3)
+        text = Metrics.format_text(metrics)
+        self.assertIn('stream_appended_total{stream="x"} 4\n', text)
+        self.assertIn('agent_calls_total{agent="copy"} 3\n', text)
+
+    def test_names_are_stable(self):
+        # Two streams called x and a stream without a name.
+        streams = [Stream('x'), Stream('x'), StreamArray()]
+        for i in range(3):
+            for stream in streams:
+                stream.append(i)
+            names = [Metrics._label(stream, 'stream') for stream in streams]
+            self.assertEqual(names, ['x', 'x#2', 'StreamArray'])
+            self.assertEqual(sorted(Metrics.snapshot()['streams']),
+                             ['StreamArray', 'x', 'x#2'])
+
+    def test_counters_and_gauges(self):
+        Metrics.increment('messages_total')
+        Metrics.increment('messages_total', 2)
+        Metrics.set_gauge('depth', 7)
+        text = Metrics.format_text()
+        self.assertIn('messages_total 3\n', text)
+        self.assertIn('depth 7\n', text)
+
+    def test_http_server(self):
+        Metrics.set_gauge('depth', 7)
+        server = Metrics.start_http_server(0, 'localhost')
+        try:
+            response = urllib2.urlopen(
+                'http://localhost:{0}/'.format(server.server_address[1]))
+            self.assertIn('depth 7\n', response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+""" Tests of Multiprocessing.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import itertools
+import os
+import random
+import time
+import unittest
+from multiprocessing import Queue
+from Queue import Empty
+
+from Stream import _multivalue
+from GroupPlanner import make_plan, SOURCE_TRIGGER_STREAM_NAME
+from Multiprocessing import run_parallel
+
+# The values that reach the sink, sent back to the test by the
+# process of the sink. Each test makes a new queue, since a
+# process that is terminated while it puts a value can leave the
+# queue locked.
+RESULTS = None
+
+TIMEOUT = 10.0
+
+# Numbers the values of the source in its process.
+_COUNTER = itertools.count()
+
+
+def _ten():
+    return 10
+
+
+def _count_to_1000():
+    return _multivalue(range(1000))
+
+
+def _next_ten():
+    return _multivalue([next(_COUNTER) for _ in range(10)])
+
+
+def _slow_times_2(value):
+    """ Return 2 * value and the process id of the replica,
+    after a random delay that lets the replicas finish their
+    batches out of order. """
+    time.sleep(0.005 * random.random())
+    return 2 * value, os.getpid()
+
+
+def _identity(value):
+    return value
+
+
+def _times_2(value):
+    return 2 * value
+
+
+def _collect(value):
+    RESULTS.put(value)
+
+
+AGENT_DESCRIPTOR_DICT = {
+    'source': ((), ('a',), _ten, 'element', None, None),
+    'times_2': (('a',), ('b',), _times_2, 'element', None, None),
+    'sink': (('b',), (), _collect, 'element', None, None),
+}
+
+
+class TestRunParallel(unittest.TestCase):
+
+    def setUp(self):
+        global RESULTS
+        RESULTS = Queue()
+        self.processes = dict()
+
+    def tearDown(self):
+        for group_processes in self.processes.itervalues():
+            for process in group_processes:
+                process.terminate()
+                process.join()
+
+    def _results(self, num_values):
+        return [RESULTS.get(timeout=TIMEOUT) for _ in range(num_values)]
+
+    def _run(self, stream_dtypes=None, **kwargs):
+        plan = make_plan(('a', 'b'), AGENT_DESCRIPTOR_DICT,
+                         {'first': ['source'], 'second': ['times_2', 'sink']},
+                         stream_dtypes)
+        self.processes, queues = run_parallel(plan, max_delay=0.01, **kwargs)
+        return queues
+
+    def test_output_arrives(self):
+        queues = self._run()
+        # The source is called when it is made and when
+        # run_parallel triggers it.
+        self.assertEqual(self._results(2), [20, 20])
+        queues['first'][0].put((SOURCE_TRIGGER_STREAM_NAME, [0]))
+        self.assertEqual(self._results(1), [20])
+        self.assertRaises(Empty, RESULTS.get, timeout=0.1)
+
+    def test_output_arrives_without_flow_control(self):
+        self._run(credit_window=None)
+        self.assertEqual(self._results(2), [20, 20])
+
+
+    def test_output_arrives_through_shared_ring(self):
+        # Stream a is sent from first to second through a SharedRing.
+        queues = self._run(stream_dtypes={'a': 'int64'})
+        self.assertEqual(self._results(2), [20, 20])
+        queues['first'][0].put((SOURCE_TRIGGER_STREAM_NAME, [0]))
+        self.assertEqual(self._results(1), [20])
+
+
+    def test_cycle_of_groups_with_flow_control(self):
+        # first sends a to second, which sends b back to first,
+        # which sends c to second. With credits on a and b, each
+        # process would wait for the credits of the other.
+        descriptors = {
+            'source': ((), ('a',), _count_to_1000, 'element', None, None),
+            'times_2': (('a',), ('b',), _times_2, 'element', None, None),
+            'echo': (('b',), ('c',), _identity, 'element', None, None),
+            'sink': (('c',), (), _collect, 'element', None, None),
+        }
+        plan = make_plan(('a', 'b', 'c'), descriptors,
+                         {'first': ['source', 'echo'],
+                          'second': ['times_2', 'sink']})
+        self.processes, queues = run_parallel(
+            plan, batch_size=10, max_delay=0.01, credit_window=10)
+        self.assertEqual(self._results(2000), 2 * [2 * i for i in range(1000)])
+
+
+    def _run_replicas(self, spec, num_batches):
+        descriptors = {
+            'source': ((), ('a',), _next_ten, 'element', None, None),
+            'times_2': (('a',), ('b',), _slow_times_2, 'element', None, None),
+            'sink': (('b',), (), _collect, 'element', None, None),
+        }
+        plan = make_plan(('a', 'b'), descriptors,
+                         {'first': ['source'], 'second': ['times_2'],
+                          'third': ['sink']},
+                         replicas={'second': spec})
+        self.processes, queues = run_parallel(plan, batch_size=10, max_delay=0.01)
+        # Each call of the source is a batch of 10 values; it is
+        # called when it is made, when run_parallel triggers it,
+        # and for each trigger put here.
+        for _ in range(num_batches - 2):
+            time.sleep(0.02)
+            queues['first'][0].put((SOURCE_TRIGGER_STREAM_NAME, [0]))
+        results = self._results(10 * num_batches)
+        values = [value for value, _ in results]
+        process_ids = set(process_id for _, process_id in results)
+        self.assertEqual(process_ids,
+                         set(p.pid for p in self.processes['second']))
+        return values
+
+    def test_ordered_replicas(self):
+        values = self._run_replicas(
+            {'replicas': 2, 'ordered': True}, num_batches=8)
+        self.assertEqual(values, [2 * i for i in range(80)])
+
+    def test_round_robin_replicas(self):
+        values = self._run_replicas(2, num_batches=8)
+        self.assertEqual(sorted(values), [2 * i for i in range(80)])
+
+    def test_hash_replicas(self):
+        values = self._run_replicas(
+            {'replicas': 3, 'partition': 'hash'}, num_batches=4)
+        self.assertEqual(sorted(values), [2 * i for i in range(40)])
+
+
+if __name__ == '__main__':
+    unittest.main()
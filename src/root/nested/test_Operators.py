@@ -0,0 +1,227 @@
+""" Tests of Operators.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from Stream import Stream, StreamArray, StreamTimed, StreamTimedArray
+from Stream import TimeAndValue, TimedColumns
+from Operators import stream_func, list_func, tumbling_window_agent
+from Operators import timed_windows, window_views
+from Checkpoint import save_network, restore_network
+from MakeNetworkParallel import make_network
+from Agent import InList
+
+
+def _recent(stream):
+    return list(stream.recent[:stream.stop])
+
+
+class TestListFunc(unittest.TestCase):
+
+    def test_non_numeric_output_of_stream_array(self):
+        a = StreamArray('a')
+        b = stream_func(a, 'list', lambda l: ['a' + str(int(v)) for v in l], 1)
+        a.extend([0, 1, 2])
+        self.assertIs(type(b), Stream)
+        self.assertEqual(_recent(b), ['a0', 'a1', 'a2'])
+
+    def test_dtype_requested(self):
+        a = StreamArray('a', dtype=np.float32)
+        b, = list_func(lambda lists: [lists[0] * 2], [a], 1, None, [a],
+                       None, None, dtype=np.float32)
+        a.extend(np.arange(4, dtype=np.float32))
+        self.assertIsInstance(b, StreamArray)
+        self.assertEqual(b.dtype, np.float32)
+        self.assertEqual(_recent(b), [0, 2, 4, 6])
+
+    def test_list_input_is_view_of_stream_array(self):
+        a = StreamArray('a')
+        shared = []
+
+        def f(l):
+            shared.append(np.shares_memory(l, a.recent))
+            return list(l)
+        stream_func(a, 'list', f, 1)
+        a.extend(np.arange(10.0))
+        self.assertTrue(all(shared))
+
+    def test_dtype_through_stream_func(self):
+        a = StreamArray('a', dtype=np.int64)
+        b = stream_func(a, 'list', lambda l: l * 2, 1, dtype=np.int64)
+        c, d = stream_func([a, b], 'list', lambda lists: [lists[0], lists[1]],
+                           2, dtype=np.int64)
+        a.extend(np.arange(4))
+        for s in (b, c, d):
+            self.assertIsInstance(s, StreamArray)
+            self.assertEqual(s.dtype, np.int64)
+        self.assertEqual(_recent(b), [0, 2, 4, 6])
+        self.assertEqual(_recent(d), [0, 2, 4, 6])
+
+    def test_dtype_only_for_list(self):
+        a = Stream('a')
+        self.assertRaises(ValueError, stream_func, a, 'element',
+                          lambda v: v, 1, dtype=float)
+
+    def test_dtype_through_descriptor(self):
+        descriptors = {
+            'double': [['a'], ['b'], lambda l: l * 2, 'list', None, None,
+                       ['a']]}
+        stream_dict, agent_dict = make_network(
+            ('a', 'b'), descriptors, stream_dtypes={'a': float, 'b': float})
+        a, b = stream_dict['a'], stream_dict['b']
+        self.assertIsInstance(b, StreamArray)
+        a.extend(np.arange(3.0))
+        self.assertEqual(_recent(b), [0.0, 2.0, 4.0])
+        # Appended without conversion to a list.
+        self.assertIsInstance(b.recent, np.ndarray)
+
+
+class TestTimed(unittest.TestCase):
+
+    TIMES = [0.5, 1.0, 1.2, 2.7, 2.9, 3.0, 4.4, 6.1, 6.2, 9.5]
+
+    def _sums(self, stream):
+        sums = stream_func(stream, 'timed',
+                           lambda window: sum(v.value for v in window), 1,
+                           window_size=2.0, step_size=1.0)
+        for i, t in enumerate(self.TIMES):
+            stream.append(TimeAndValue(t, i))
+        return [(v.time, v.value) for v in sums.recent[:sums.stop]]
+
+    def test_columns_agree_with_list(self):
+        columns = self._sums(StreamTimedArray('columns'))
+        self.assertEqual(columns, self._sums(StreamTimed('list')))
+        self.assertEqual(columns[:3], [(2.0, 3), (3.0, 10), (4.0, 12)])
+
+    def test_output_of_columns_is_columns(self):
+        x = StreamTimedArray('x')
+        y = stream_func(x, 'timed', lambda window: len(window), 1,
+                        window_size=1.0, step_size=1.0)
+        self.assertIsInstance(y, StreamTimedArray)
+
+    def test_timed_windows(self):
+        times = np.array(self.TIMES)
+        end_times, starts, ends, next_start_time, next_starts = \
+          timed_windows([times], 0.0, 2.0, 1.0)
+        self.assertEqual(end_times.tolist(),
+                         [2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0])
+        self.assertEqual(starts[0][:3].tolist(), [0, 1, 3])
+        self.assertEqual(ends[0][:3].tolist(), [3, 5, 6])
+        self.assertEqual(next_start_time, 8.0)
+        self.assertEqual(times[next_starts[0]], 9.5)
+
+    def test_timed_columns(self):
+        columns = TimedColumns(np.array([1.0, 2.0, 3.0]), np.array([4, 5, 6]))
+        self.assertEqual(columns[1], TimeAndValue(2.0, 5))
+        view = columns[1:]
+        self.assertTrue(np.shares_memory(view.time, columns.time))
+        self.assertEqual(list(view), [(2.0, 5), (3.0, 6)])
+
+
+class TestBatchWindow(unittest.TestCase):
+
+    def test_agrees_with_window(self):
+        x = StreamArray('x')
+        means = stream_func(x, 'batch_window', lambda w: w.mean(axis=1), 1,
+                            window_size=4, step_size=3)
+        expected = stream_func(x, 'window', np.mean, 1,
+                               window_size=4, step_size=3)
+        for k in range(5):
+            x.extend(np.arange(7.0 * k, 7.0 * (k + 1)) ** 2)
+        self.assertEqual(len(_recent(means)), 11)
+        self.assertTrue(np.allclose(_recent(means), _recent(expected)))
+
+    def test_windows_are_views(self):
+        x = StreamArray('x')
+        shared = []
+
+        def f(windows):
+            shared.append(np.shares_memory(windows, x.recent))
+            return windows[:, 0]
+        firsts = stream_func(x, 'batch_window', f, 1,
+                             window_size=3, step_size=2)
+        x.extend(np.arange(10.0))
+        self.assertEqual(_recent(firsts), [0, 2, 4, 6])
+        self.assertEqual(shared, [True])
+
+    def test_nan_outputs_are_not_appended(self):
+        x = StreamArray('x')
+        y = stream_func(x, 'batch_window',
+                        lambda w: np.where(w.sum(axis=1) > 5, w.sum(axis=1), np.nan),
+                        1, window_size=2, step_size=2)
+        x.extend(np.arange(8.0))
+        self.assertEqual(_recent(y), [9.0, 13.0])
+
+    def test_window_views(self):
+        x = StreamArray('x', num_columns=2)
+        x.extend(np.arange(12.0).reshape(6, 2))
+        windows = window_views(InList(x.recent, 1, x.stop), 2, 3, 2)
+        self.assertEqual(windows.shape, (2, 3, 2))
+        self.assertEqual(windows[1, 0].tolist(), [6.0, 7.0])
+        self.assertFalse(windows.flags.writeable)
+
+
+class TestTumblingWindow(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _make_network(self, flush=False):
+        x, y = StreamArray('x'), StreamArray('y')
+        agent = tumbling_window_agent(
+            lambda windows: [windows[0].sum(axis=1)], [x], [y], None, None,
+            3, 3, flush)
+        return {'x': x, 'y': y}, {'sums': agent}
+
+    def test_windows_and_flush(self):
+        stream_dict, agent_dict = self._make_network(flush=True)
+        stream_dict['x'].extend(np.arange(4.0))
+        stream_dict['x'].extend(np.arange(4.0, 8.0))
+        self.assertEqual(_recent(stream_dict['y']), [3, 12])
+        stream_dict['x'].close()
+        self.assertEqual(_recent(stream_dict['y']), [3, 12, 13])
+
+    def test_no_flush_without_tail(self):
+        x, y, z = StreamArray('x'), StreamArray('y'), StreamArray('z')
+        calls = []
+
+        def f(windows):
+            calls.append([w.shape for w in windows])
+            return [windows[0].sum(axis=1) + windows[1].sum(axis=1)]
+        tumbling_window_agent(f, [x, y], [z], None, None, 2, 2, True)
+        x.extend(np.arange(4.0))
+        y.extend(np.arange(5.0))
+        x.close()
+        y.close()
+        # y has a value left over but x has none: f is not
+        # called with an empty window.
+        self.assertEqual(calls, [[(2, 2), (2, 2)]])
+        self.assertEqual(_recent(z), [2, 10])
+
+    def test_tail_is_checkpointed(self):
+        stream_dict, agent_dict = self._make_network()
+        stream_dict['x'].extend(np.arange(5.0))
+        file_name = os.path.join(self.directory, 'checkpoint')
+        save_network(file_name, stream_dict, agent_dict)
+
+        stream_dict, agent_dict = self._make_network()
+        restore_network(file_name, stream_dict, agent_dict)
+        stream_dict['x'].extend(np.arange(5.0, 9.0))
+        # The windows after the checkpoint are 3, 4, 5 and 6, 7, 8.
+        self.assertEqual(_recent(stream_dict['y']), [3, 12, 21])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+""" Tests of RingBuffer.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import unittest
+
+import numpy as np
+
+from RingBuffer import RingBuffer
+from Stream import Stream, StreamArray
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_wrap_around(self):
+        ring = RingBuffer(np.zeros(5))
+        ring[0:4] = [1, 2, 3, 4]
+        ring.advance(3)
+        ring[1:4] = [5, 6, 7]
+        self.assertEqual(list(ring[0:4]), [4, 5, 6, 7])
+        self.assertEqual(ring[0], 4)
+        self.assertEqual(ring[-2], 7)
+        self.assertEqual(list(ring._data), [6, 7, 3, 4, 5])
+
+    def test_slice_that_does_not_wrap_is_view(self):
+        backing = np.arange(6.0)
+        ring = RingBuffer(backing)
+        ring.advance(1)
+        self.assertTrue(np.shares_memory(ring[0:3], backing))
+        # Logical elements 4 and 5 wrap around.
+        self.assertEqual(list(ring[4:6]), [5, 0])
+
+    def test_list_backing(self):
+        ring = RingBuffer([0] * 4)
+        ring.advance(2)
+        ring[0:3] = ['a', 'b', 'c']
+        self.assertEqual(ring[0:3], ['a', 'b', 'c'])
+        self.assertEqual(ring[::2], ['a', 'c'])
+
+    def test_grow(self):
+        ring = RingBuffer([0] * 4)
+        ring.advance(3)
+        ring[0:3] = [1, 2, 3]
+        ring.grow([0] * 8, 3)
+        self.assertEqual(len(ring), 8)
+        self.assertEqual(ring[0:3], [1, 2, 3])
+
+    def test_errors(self):
+        ring = RingBuffer([0] * 4)
+        self.assertRaises(IndexError, ring.__getitem__, 4)
+        self.assertRaises(IndexError, ring.__setitem__, -5, 1)
+        self.assertRaises(ValueError, ring.__setitem__, slice(0, 2), [1])
+        self.assertRaises(ValueError, ring.__setitem__, slice(0, 4, 2), [1, 2])
+
+
+class _Reader(object):
+    """ Reads all the values of a stream when it is told to. """
+    def __init__(self, stream):
+        self.stream = stream
+        self.values = []
+        stream.reader(self)
+
+    def read(self):
+        start, stop = self.stream.start[self], self.stream.stop
+        self.values.extend(self.stream.recent[start:stop])
+        self.stream.set_start(self, stop)
+
+
+class TestRingStorage(unittest.TestCase):
+
+    def _check_storage(self, stream, num_values):
+        reader = _Reader(stream)
+        size = len(stream.recent)
+        for value in range(num_values):
+            stream.append(value)
+            if value % 7 == 0:
+                reader.read()
+        reader.read()
+        self.assertTrue(list(reader.values) == range(num_values))
+        self.assertEqual(stream.offset + stream.stop, num_values)
+        return size
+
+    def test_ring_does_not_grow_when_readers_keep_up(self):
+        for stream in (Stream('x', storage='ring'),
+                       StreamArray('x', storage='ring', dtype=int)):
+            self.assertIsInstance(stream.recent, RingBuffer)
+            size = self._check_storage(stream, 5 * len(stream.recent))
+            self.assertEqual(len(stream.recent), size)
+
+    def test_ring_grows_for_lagging_reader(self):
+        stream = Stream('x', storage='ring')
+        lagging = _Reader(stream)
+        size = len(stream.recent)
+        stream.extend(range(2 * size))
+        self.assertTrue(len(stream.recent) > size)
+        lagging.read()
+        self.assertTrue(lagging.values == range(2 * size))
+
+    def test_list_and_ring_agree(self):
+        values = []
+        for storage in ('list', 'ring'):
+            stream = StreamArray('x', storage=storage)
+            reader = _Reader(stream)
+            for k in range(40):
+                stream.extend(np.arange(k * 300, (k + 1) * 300, dtype=float))
+                if k % 3:
+                    reader.read()
+            reader.read()
+            values.append(reader.values)
+        self.assertTrue(values[0] == values[1])
+
+    def test_unknown_storage(self):
+        self.assertRaises(ValueError, Stream, 'x', storage='deque')
+
+
+if __name__ == '__main__':
+    unittest.main()
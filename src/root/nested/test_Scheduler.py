@@ -0,0 +1,108 @@
+""" Tests of Scheduler.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import sys
+import unittest
+
+from Scheduler import Scheduler, topological_ranks
+from Stream import Stream
+from Operators import stream_func
+
+
+class _Agent(object):
+    """ Records its calls in log; calls on_next, if any, when
+    it is called.
+    """
+    def __init__(self, name, log, on_next=None):
+        self.name = name
+        self.log = log
+        self.on_next = on_next
+
+    def next(self):
+        self.log.append(self.name)
+        if self.on_next is not None:
+            self.on_next()
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_fifo_runs_each_ready_agent_once(self):
+        log = []
+        scheduler = Scheduler()
+        a, b = _Agent('a', log), _Agent('b', log)
+        for agent in (b, a, b, a):
+            scheduler.schedule(agent)
+        scheduler.run()
+        self.assertEqual(log, ['b', 'a'])
+
+    def test_topological(self):
+        log = []
+        scheduler = Scheduler('topological')
+        a, b, c = [_Agent(name, log) for name in 'abc']
+        scheduler.set_rank(a, 0)
+        scheduler.set_rank(b, 1)
+        for agent in (c, b, a):
+            scheduler.schedule(agent)
+        scheduler.run()
+        # c has no rank and runs last.
+        self.assertEqual(log, ['a', 'b', 'c'])
+
+    def test_run_from_a_transition_returns(self):
+        log = []
+        scheduler = Scheduler()
+        b = _Agent('b', log)
+
+        def schedule_b():
+            scheduler.schedule(b)
+            scheduler.run()
+            log.append('a returns')
+        scheduler.schedule(_Agent('a', log, schedule_b))
+        scheduler.run()
+        self.assertEqual(log, ['a', 'a returns', 'b'])
+        self.assertFalse(scheduler.running)
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, Scheduler, 'lifo')
+
+
+class TestDeepChain(unittest.TestCase):
+
+    def test_chain_deeper_than_the_recursion_limit(self):
+        # Without a scheduler, each agent would call the next one
+        # from its transition, and a chain this deep would exceed
+        # the recursion limit.
+        depth = sys.getrecursionlimit() + 100
+        scheduler = Scheduler()
+        source = Stream('source')
+        source.scheduler = scheduler
+        s = source
+        for _ in range(depth):
+            s = stream_func(
+                inputs=s, f_type='element', f=lambda v: v + 1,
+                num_outputs=1)
+            s.scheduler = scheduler
+        source.extend([0, 10])
+        self.assertEqual(s.recent[:s.stop], [depth, depth + 10])
+        self.assertFalse(scheduler.running)
+
+
+class TestTopologicalRanks(unittest.TestCase):
+
+    def test_chain_and_cycle(self):
+        descriptors = {
+            'source': [[], ['a'], None, 'element', None, None],
+            'f': [['a', 'c'], ['b'], None, 'element', None, None],
+            'g': [['b'], ['c'], None, 'element', None, None],
+        }
+        ranks = topological_ranks(descriptors)
+        self.assertEqual(set(ranks), set(descriptors))
+        self.assertTrue(ranks['source'] < ranks['f'])
+        self.assertTrue(ranks['source'] < ranks['g'])
+
+
+if __name__ == '__main__':
+    unittest.main()
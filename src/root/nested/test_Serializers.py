@@ -0,0 +1,108 @@
+""" Tests of Serializers.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import cPickle
+import unittest
+
+import numpy as np
+
+import Serializers
+from Serializers import NumericCodec, PickleCodec, MessageSerializer
+from Serializers import make_codec, register_codec, is_codec
+
+
+class TestCodecs(unittest.TestCase):
+
+    def test_pickle(self):
+        codec = PickleCodec()
+        values = ['a', (1, 2), None]
+        self.assertEqual(codec.decode(codec.encode(values)), values)
+
+    def test_numeric(self):
+        codec = NumericCodec()
+        for values in ([1.5, 2.5], np.arange(6, dtype=np.int16).reshape(3, 2)):
+            decoded = codec.decode(codec.encode(values))
+            self.assertTrue(np.array_equal(decoded, values))
+            self.assertEqual(decoded.dtype, np.asarray(values).dtype)
+
+    def test_numeric_dtype(self):
+        codec = make_codec('numeric', np.float32)
+        decoded = codec.decode(codec.encode([1, 2]))
+        self.assertEqual(decoded.dtype, np.float32)
+
+    def test_numeric_empty(self):
+        codec = make_codec('numeric', np.float64)
+        decoded = codec.decode(codec.encode([]))
+        self.assertEqual(decoded.shape, (0,))
+        self.assertEqual(decoded.dtype, np.float64)
+
+    def test_numeric_structured_dtype(self):
+        dtype = np.dtype([('time', np.float64), ('value', np.int64)])
+        codec = make_codec('numeric', dtype)
+        values = np.zeros(3, dtype)
+        values['time'] = [0.5, 1.5, 2.5]
+        values['value'] = [1, 2, 3]
+        decoded = codec.decode(codec.encode(values))
+        self.assertEqual(decoded.dtype, dtype)
+        self.assertTrue(np.array_equal(decoded['value'], [1, 2, 3]))
+
+    def test_numeric_is_compact(self):
+        values = np.arange(1000.0)
+        data = make_codec('numeric', np.float64).encode(values)
+        # The header is 2 bytes, the dtype string and one length.
+        self.assertEqual(len(data), 2 + len('<f8') + 8 + 8 * 1000)
+        self.assertTrue(len(data) < len(PickleCodec().encode(list(values))))
+
+    def test_numeric_rejects_objects(self):
+        self.assertRaises(ValueError, NumericCodec().encode, ['a', None])
+
+    def test_registry(self):
+        self.assertRaises(KeyError, make_codec, 'no_such_codec')
+        register_codec('test_codec', lambda dtype: PickleCodec())
+        try:
+            self.assertTrue(is_codec('test_codec'))
+            self.assertIsInstance(make_codec('test_codec'), PickleCodec)
+        finally:
+            del Serializers._codec_factories['test_codec']
+
+
+class TestMessageSerializer(unittest.TestCase):
+
+    def setUp(self):
+        self.serializer = MessageSerializer(
+            {'x': 0, 'y': 1}, {'x': 'numeric'}, {'x': np.int32})
+
+    def test_round_trip(self):
+        for message in (('x', [1, 2, 3]), ('y', ['a'], 'tag'), ('x', None)):
+            encoded = self.serializer.encode(message)
+            self.assertEqual(encoded[0], self.serializer.stream_ids[message[0]])
+            decoded = self.serializer.decode(encoded)
+            self.assertEqual(decoded[0], message[0])
+            self.assertEqual(decoded[2:], message[2:])
+            if message[1] is None:
+                self.assertIs(decoded[1], None)
+            else:
+                self.assertEqual(list(decoded[1]), message[1])
+        self.assertEqual(self.serializer.decode(
+            self.serializer.encode(('x', [1])))[1].dtype, np.int32)
+
+    def test_encoded_message_can_be_pickled(self):
+        # Encoded messages are put on multiprocessing queues.
+        encoded = self.serializer.encode(('x', [1, 2, 3]))
+        copy = cPickle.loads(cPickle.dumps(encoded, cPickle.HIGHEST_PROTOCOL))
+        self.assertEqual(list(self.serializer.decode(copy)[1]), [1, 2, 3])
+        # The stream name is not in the message.
+        self.assertEqual(copy[0], 0)
+
+    def test_stream_without_id(self):
+        message = ('z', [1])
+        self.assertIs(self.serializer.encode(message), message)
+        self.assertIs(self.serializer.decode(message), message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+""" Tests of SharedRing.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import unittest
+from multiprocessing import Process, Queue
+
+import numpy as np
+
+from SharedRing import SharedRing
+from Stream import StreamArray
+
+
+def _write(ring, num_values, batch_size):
+    for start in range(0, num_values, batch_size):
+        ring.put(('x', np.arange(start, min(start + batch_size, num_values))))
+
+
+class TestSharedRing(unittest.TestCase):
+
+    def test_write_and_read_wrap_around(self):
+        ring = SharedRing(5, dtype=int)
+        self.assertEqual(ring.write([1, 2, 3, 4]), 4)
+        self.assertEqual(list(ring.read()), [1, 2, 3, 4])
+        # Only 5 elements fit.
+        self.assertEqual(ring.write(range(5, 12)), 5)
+        self.assertEqual(len(ring), 5)
+        self.assertEqual(ring.free(), 0)
+        self.assertEqual(list(ring.read()), [5, 6, 7, 8, 9])
+        self.assertEqual(len(ring), 0)
+
+    def test_drain_into(self):
+        ring = SharedRing(4, num_columns=2)
+        ring.write(np.arange(6.0).reshape(3, 2))
+        ring.read()
+        ring.write(np.arange(6.0, 12.0).reshape(3, 2))
+        stream = StreamArray('x', num_columns=2)
+        self.assertEqual(ring.drain_into(stream), 3)
+        self.assertEqual(stream.recent[:stream.stop].tolist(),
+                         [[6, 7], [8, 9], [10, 11]])
+
+    def test_doorbell(self):
+        doorbell = Queue()
+        ring = SharedRing(8, doorbell=doorbell)
+        ring.put(('x', [1.0, 2.0]))
+        self.assertEqual(doorbell.get(timeout=5), ('x', None))
+        self.assertEqual(list(ring.read()), [1.0, 2.0])
+
+    def test_other_process(self):
+        # The writer waits while the ring is full.
+        doorbell = Queue()
+        ring = SharedRing(16, dtype=int, doorbell=doorbell)
+        writer = Process(target=_write, args=(ring, 1000, 7))
+        writer.start()
+        values = []
+        while len(values) < 1000:
+            doorbell.get(timeout=10)
+            values.extend(ring.read())
+        writer.join()
+        self.assertEqual(values, range(1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+""" Tests of Stream.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import unittest
+
+import numpy as np
+
+from Stream import Stream, StreamArray, StreamOverflowError, _ReaderIndex
+from Agent import Agent
+from Scheduler import Scheduler
+from Operators import stream_func
+
+
+def _burst(in_lists, state):
+    """ Write 30 values for every value read. """
+    in_list = in_lists[0]
+    values = [v for v in in_list.list[in_list.start:in_list.stop]
+              for _ in range(30)]
+    return [values], state, [in_list.stop]
+
+
+class _Reader(object):
+    """ A reader of a stream that reads when it is told to. """
+    def __init__(self, stream):
+        self.stream = stream
+        self.values = []
+        stream.reader(self)
+
+    def read(self, num_values):
+        start = self.stream.start[self]
+        stop = min(start + num_values, self.stream.stop)
+        self.values.extend(self.stream.recent[start:stop])
+        self.stream.set_start(self, stop)
+        self.stream.release_writers()
+
+
+class TestReaderIndex(unittest.TestCase):
+
+    def test_slowest(self):
+        index = _ReaderIndex()
+        self.assertEqual(index.slowest(), None)
+        index.update('a', 5)
+        index.update('b', 3)
+        self.assertEqual(index.slowest(), (3, 'b'))
+        index.update('b', 9)
+        self.assertEqual(index.slowest(), (5, 'a'))
+        index.remove('a')
+        self.assertEqual(index.slowest(), (9, 'b'))
+
+    def test_stale_entries_are_dropped(self):
+        index = _ReaderIndex()
+        for position in range(1000):
+            index.update('a', position)
+            index.update('b', position + 1)
+        self.assertEqual(index.slowest(), (999, 'a'))
+        self.assertTrue(len(index._heap) <= 2 * 2 + 16 + 1)
+
+    def test_stream_compaction(self):
+        # Positions are absolute, so they do not change when
+        # recent is compacted.
+        x = Stream('x')
+        reader = _Reader(x)
+        for value in range(3 * len(x.recent)):
+            x.append(value)
+            reader.read(1)
+        self.assertTrue(x.offset > 0)
+        self.assertEqual(x._readers.slowest(), (x.stop + x.offset, reader))
+        self.assertEqual(x._slowest_start(), x.stop)
+
+
+class TestSlowestReader(unittest.TestCase):
+
+    def test_many_readers(self):
+        x = Stream('x')
+        readers = [_Reader(x) for _ in range(100)]
+        x.extend(range(50))
+        for k, reader in enumerate(readers):
+            reader.read(k % 50 + 1)
+        self.assertIs(x.slowest_reader, readers[0])
+        self.assertEqual(x.slowest_reader_lag, 49)
+        x.delete_reader(readers[0])
+        x.delete_reader(readers[50])
+        self.assertIs(x.slowest_reader, readers[1])
+        self.assertEqual(x._slowest_start(), 2)
+
+    def test_no_readers(self):
+        x = Stream('x')
+        x.extend(range(5))
+        self.assertIs(x.slowest_reader, None)
+        self.assertEqual(x.slowest_reader_lag, 0)
+
+    def test_values_of_slowest_reader_are_kept(self):
+        x = Stream('x')
+        slow, fast = _Reader(x), _Reader(x)
+        num_values = 3 * len(x.recent)
+        for value in range(num_values):
+            x.append(value)
+            fast.read(1)
+        self.assertEqual(x.slowest_reader_lag, num_values)
+        slow.read(num_values)
+        self.assertTrue(slow.values == range(num_values))
+        self.assertTrue(fast.values == range(num_values))
+
+
+class TestRowsOfStreamArray(unittest.TestCase):
+
+    def test_num_columns(self):
+        s = StreamArray('s', num_columns=3)
+        s.append((1, 2, 3))
+        s.extend([(4, 5, 6), (7, 8, 9)])
+        s.extend(np.ones((2, 3)))
+        rows = s.recent[:s.stop]
+        self.assertEqual(rows.shape, (5, 3))
+        self.assertEqual(rows[:, 1].tolist(), [2, 5, 8, 1, 1])
+
+    def test_rows_are_kept_when_recent_grows(self):
+        s = StreamArray('s', dtype=np.int64, num_columns=2)
+        reader = _Reader(s)
+        num_rows = 3 * len(s.recent)
+        for i in range(num_rows):
+            s.append((i, -i))
+        reader.read(num_rows)
+        self.assertEqual([tuple(row) for row in reader.values],
+                         [(i, -i) for i in range(num_rows)])
+
+    def test_structured_dtype(self):
+        s = StreamArray('s', dtype=[('x', float), ('y', np.int32)])
+        s.append((0.5, 1))
+        s.extend([(1.5, 2), (2.5, 3)])
+        records = s.recent[:s.stop]
+        self.assertEqual(records['x'].tolist(), [0.5, 1.5, 2.5])
+        self.assertEqual(records['y'].dtype, np.int32)
+
+    def test_windows_are_views_of_rows(self):
+        s = StreamArray('s', num_columns=2)
+        views = []
+
+        def f(window):
+            views.append(np.shares_memory(window, s.recent))
+            return window.shape
+        shapes = stream_func(s, 'window', f, 1, window_size=2, step_size=1)
+        s.extend(np.arange(8.0).reshape(4, 2))
+        self.assertEqual(shapes.recent[:shapes.stop], [(2, 2)] * 3)
+        self.assertTrue(all(views))
+
+
+class TestBlock(unittest.TestCase):
+
+    def _make_network(self):
+        x, y = Stream('x'), Stream('y')
+        y.set_capacity(max_elements=10, overflow_policy='block')
+        writer = Agent([x], [y], _burst)
+        return x, y, writer
+
+    def test_write_is_split_for_subscribed_reader(self):
+        x, y, writer = self._make_network()
+        values = []
+
+        def read_all(in_lists, state):
+            in_list = in_lists[0]
+            values.extend(in_list.list[in_list.start:in_list.stop])
+            return [], state, [in_list.stop]
+        Agent([y], [], read_all)
+        x.append(1)
+        self.assertEqual(values, [1] * 30)
+        self.assertTrue(y.high_water_elements <= 10)
+
+    def test_values_wait_for_slow_reader(self):
+        x, y, writer = self._make_network()
+        reader = _Reader(y)
+        x.append(1)
+        x.append(2)
+        self.assertEqual(y.stop - y._slowest_start(), 10)
+        self.assertTrue(y.full)
+        # The second value is read by writer only after the
+        # values of the first are written.
+        self.assertEqual(x.start[writer], 1)
+        for _ in range(5):
+            reader.read(7)
+            self.assertTrue(y.stop - y._slowest_start() <= 10)
+        for _ in range(3):
+            reader.read(10)
+        self.assertEqual(reader.values, [1] * 30 + [2] * 30)
+        self.assertEqual(y.high_water_elements, 10)
+        self.assertEqual(writer._pending_out_lists, None)
+
+    def test_scheduler(self):
+        x, y, writer = self._make_network()
+        scheduler = Scheduler()
+        x.scheduler = y.scheduler = scheduler
+        values = []
+
+        def read_all(in_lists, state):
+            in_list = in_lists[0]
+            values.extend(in_list.list[in_list.start:in_list.stop])
+            return [], state, [in_list.stop]
+        Agent([y], [], read_all)
+        x.extend([1, 2])
+        self.assertEqual(values, [1] * 30 + [2] * 30)
+        self.assertTrue(y.high_water_elements <= 10)
+
+    def test_output_without_readers_is_never_full(self):
+        s = Stream('s')
+        s.set_capacity(max_elements=3)
+        t = stream_func(s, 'element', lambda v: v * 2, 1)
+        t.set_capacity(max_elements=3)
+        s.extend(range(10))
+        self.assertFalse(t.full)
+        self.assertEqual(t.room, None)
+        self.assertEqual(t.recent[:t.stop], range(0, 20, 2))
+        self.assertEqual(s.start.values(), [10])
+
+    def test_raise_without_readers(self):
+        s = Stream('s')
+        s.set_capacity(max_elements=3, overflow_policy='raise')
+        s.extend(range(10))
+        reader = _Reader(s)
+        self.assertRaises(StreamOverflowError, s.append, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
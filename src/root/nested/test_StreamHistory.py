@@ -0,0 +1,133 @@
+""" Tests of StreamHistory.py and of the history of a StreamArray.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from Stream import Stream, StreamArray
+from StreamHistory import SegmentedHistory
+
+
+def _fill(stream, first, num_batches, batch_size):
+    """ Extend stream by first, first+1, .. in batches that its
+    only reader reads at once, so that they move to the history.
+    """
+    reader = object()
+    stream.reader(reader)
+    value = first
+    for k in range(num_batches):
+        stream.extend(np.arange(value, value + batch_size, dtype=float))
+        value += batch_size
+        stream.set_start(reader, stream.stop)
+    return value
+
+
+class TestSegmentedHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_read_across_segments(self):
+        history = SegmentedHistory(self.directory, 'h', segment_size=10)
+        history.append(np.arange(35.0))
+        self.assertEqual(list(history.read(8, 23)), range(8, 23))
+        self.assertRaises(IndexError, history.read, 30, 36)
+
+    def test_reopen_and_truncate(self):
+        history = SegmentedHistory(self.directory, 'h', segment_size=10)
+        history.append(np.arange(35.0))
+        history.close()
+        history = SegmentedHistory(self.directory, 'h', segment_size=10)
+        self.assertEqual(history.length, 35)
+        self.assertEqual(list(history.read(30, 35)), range(30, 35))
+        history.truncate(12)
+        history.append([-1.0])
+        self.assertEqual(list(history.read(10, 13)), [10, 11, -1])
+        history.close()
+        history = SegmentedHistory(self.directory, 'h', segment_size=10)
+        self.assertEqual(history.length, 13)
+
+
+class TestStreamArrayHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_range(self):
+        for storage in ('list', 'ring'):
+            stream = StreamArray('x' + storage, storage=storage)
+            stream.keep_history(self.directory, segment_size=1000)
+            total = _fill(stream, 0, 50, 997)
+            self.assertTrue(stream.offset > 0)
+            self.assertEqual(stream.history.length, stream.offset)
+            self.assertTrue(np.array_equal(stream.get_range(0, total), np.arange(total)))
+            self.assertTrue(np.array_equal(
+                stream.get_range(stream.offset - 10, stream.offset + 10),
+                np.arange(stream.offset - 10, stream.offset + 10)))
+
+    def test_history_is_reopened_after_a_restart(self):
+        first = StreamArray('s')
+        first.keep_history(self.directory, segment_size=1000)
+        _fill(first, 0, 20, 800)
+        first.close()
+        length = first.offset
+        self.assertTrue(length > 0)
+        # A new stream with the same name continues the history.
+        second = StreamArray('s')
+        reader = object()
+        second.reader(reader)
+        second.keep_history(self.directory, segment_size=1000)
+        self.assertEqual(second.offset, length)
+        self.assertEqual(second.slowest_reader_lag, 0)
+        second.extend(np.array([-1.0, -2.0]))
+        self.assertEqual(list(second.get_range(length - 2, length + 2)),
+                         [length - 2, length - 1, -1, -2])
+        _fill(second, 0, 20, 800)
+        self.assertEqual(list(second.get_range(5, 8)), [5, 6, 7])
+        self.assertEqual(second.history.length, second.offset)
+
+    def test_history_of_a_restored_stream(self):
+        first = StreamArray('r')
+        first.keep_history(self.directory, segment_size=1000)
+        _fill(first, 0, 20, 800)
+        first.close()
+        # A stream restored with a smaller offset: the values of
+        # the history after offset are in recent.
+        restored = StreamArray('r')
+        restored.offset = first.offset - 10
+        restored.extend(np.arange(first.offset - 10, first.offset, dtype=float))
+        restored.keep_history(self.directory, segment_size=1000)
+        self.assertEqual(restored.history.length, restored.offset)
+        # A stream restored past the end of the history.
+        missing = StreamArray('r')
+        missing.offset = restored.offset + 1
+        self.assertRaises(ValueError, missing.keep_history, self.directory, 1000)
+
+    def test_close_flushes_history(self):
+        stream = StreamArray('c')
+        stream.keep_history(self.directory, segment_size=1000)
+        _fill(stream, 0, 20, 800)
+        stream.close()
+        history = SegmentedHistory(self.directory, 'c', segment_size=1000)
+        self.assertEqual(history.length, stream.offset)
+        self.assertEqual(list(history.read(0, 3)), [0, 1, 2])
+
+    def test_only_stream_arrays_keep_history(self):
+        self.assertRaises(TypeError, Stream('p').keep_history, self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
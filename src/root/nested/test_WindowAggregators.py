@@ -0,0 +1,111 @@
+""" Tests of WindowAggregators.py.
+
+Run from this directory:
+    python -m unittest discover -p 'test_*.py'
+
+"""
+
+import operator
+import unittest
+
+import numpy as np
+
+from WindowAggregators import IncrementalWindow, MAX_REDUCE_AGGREGATORS
+
+VALUES = [5, 3, 8, 1, 9, 2, 7, 4, 6, 0, 5, 5]
+WINDOW_SIZE = 4
+
+
+def _slide(window, values, check):
+    """ Push values into window, keeping at most window_size
+    elements, and call check(window, elements) after each push.
+    """
+    for i, value in enumerate(values):
+        window.push(value)
+        while len(window) > window.window_size:
+            window.evict()
+        check(window, values[max(0, i + 1 - window.window_size):i + 1])
+
+
+class TestIncrementalWindow(unittest.TestCase):
+
+    def test_aggregates(self):
+        def check(window, elements):
+            self.assertEqual(list(window), elements)
+            self.assertEqual(window.count(), len(elements))
+            self.assertEqual(window.sum(), sum(elements))
+            self.assertAlmostEqual(window.mean(), np.mean(elements))
+            self.assertAlmostEqual(window.variance(), np.var(elements))
+            self.assertEqual(window.min(), min(elements))
+            self.assertEqual(window.max(), max(elements))
+        _slide(IncrementalWindow(WINDOW_SIZE), VALUES, check)
+
+    def test_empty_window(self):
+        window = IncrementalWindow(WINDOW_SIZE)
+        window.push(3)
+        self.assertTrue(np.isnan(window.variance(ddof=1)))
+        self.assertEqual(window.variance(), 0.0)
+        window.evict()
+        self.assertEqual(window.count(), 0)
+        self.assertTrue(np.isnan(window.mean()))
+        self.assertTrue(np.isnan(window.variance()))
+        self.assertRaises(ValueError, window.min)
+        self.assertRaises(ValueError, window.max)
+
+    def test_reduce(self):
+        def check(window, elements):
+            self.assertEqual(window.reduce(max), max(elements))
+            self.assertEqual(
+                window.reduce(operator.add, 0, operator.sub), sum(elements))
+        _slide(IncrementalWindow(WINDOW_SIZE), VALUES, check)
+
+    def test_clear(self):
+        window = IncrementalWindow(WINDOW_SIZE)
+        window.push(1)
+        window.sum()
+        window.clear()
+        self.assertEqual(len(window), 0)
+        self.assertEqual(window.sum(), 0)
+        self.assertEqual(window.reduce(operator.mul, 1), 1)
+
+    def test_inverse_requires_identity(self):
+        window = IncrementalWindow(WINDOW_SIZE)
+        self.assertRaises(ValueError, window.reduce, operator.add,
+                          inverse=operator.sub)
+
+    def test_new_op_at_every_step(self):
+        window = IncrementalWindow(WINDOW_SIZE)
+
+        def check(window, elements):
+            self.assertEqual(window.reduce(lambda a, b: a * b, 1),
+                             np.prod(elements))
+            self.assertTrue(len(window._aggregators) <= MAX_REDUCE_AGGREGATORS)
+        _slide(window, VALUES * 3, check)
+
+    def test_named_reduction_is_kept(self):
+        window = IncrementalWindow(WINDOW_SIZE)
+        aggregators = set()
+
+        def check(window, elements):
+            self.assertEqual(window.reduce(lambda a, b: a * b, 1, name='product'),
+                             np.prod(elements))
+            aggregators.add(id(window._aggregators[('reduce', 'product')]))
+        _slide(window, VALUES, check)
+        self.assertEqual(len(aggregators), 1)
+
+    def test_least_recently_used_reduction_is_dropped(self):
+        window = IncrementalWindow(WINDOW_SIZE)
+        window.push(2)
+        for k in range(MAX_REDUCE_AGGREGATORS):
+            window.reduce(max, name=k)
+        window.reduce(max, name=0)
+        window.reduce(min, name='min')
+        keys = set(window._aggregators)
+        self.assertIn(('reduce', 0), keys)
+        self.assertIn(('reduce', 'min'), keys)
+        self.assertNotIn(('reduce', 1), keys)
+        self.assertEqual(len(keys), MAX_REDUCE_AGGREGATORS)
+
+
+if __name__ == '__main__':
+    unittest.main()